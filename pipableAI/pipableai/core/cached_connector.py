@@ -0,0 +1,242 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pandas import DataFrame
+
+from pipableai.core.dev_logger import dev_logger
+from pipableai.core.sql_lexer import (
+    SQLLexerError,
+    Token,
+    identifier_name,
+    is_read_only_query,
+    referenced_tables,
+    tokenize_sql,
+)
+from pipableai.interfaces.database_connector_interface import DatabaseConnectorInterface
+
+_EXTRACTS_TABLE = "_pipable_extracts"
+
+
+def _quote_identifier(name: str) -> str:
+    """Quote a table name, part by part for schema-qualified names, keeping its case."""
+    return ".".join('"' + part.replace('"', '""') + '"' for part in name.split("."))
+
+
+def _is_name(token: Token) -> bool:
+    return token.kind in ("word", "quoted_identifier")
+
+
+@dataclass
+class CachedTable:
+    """Data class describing a table which is mirrored into the local extract store.
+
+    Args:
+        name (str): The name of the table in the source database.
+        ttl_seconds (float, optional): How long an extract stays fresh. Stale extracts are
+            refreshed on the next query that reads them. If None, the extract is only
+            refreshed by an explicit call to `CachedConnector.refresh`.
+
+    Attributes:
+        name (str): The name of the table in the source database.
+        ttl_seconds (float, optional): How long an extract stays fresh.
+    """
+
+    name: str
+    ttl_seconds: Optional[float] = None
+
+
+class CachedConnector(DatabaseConnectorInterface):
+    """A connector which answers queries on slowly changing tables from a local extract store.
+
+    Selected tables of the source database are materialized into an embedded database
+    (DuckDB by default, or SQLite). A query is run locally when it only reads and every
+    table it references is cached; all other queries, and local queries which fail
+    because of dialect differences, are sent to the source connector unchanged.
+
+    Extracts are taken lazily, on the first query that needs them, and their timestamps are
+    stored in the local database. When the local database is a file, extracts therefore
+    survive restarts and are reused while they are fresh.
+
+    Args:
+        source_connector (DatabaseConnectorInterface): The connector to the authoritative database.
+        cached_tables (list): The `CachedTable` entries to mirror locally.
+        local_connector (DatabaseConnectorInterface, optional): The embedded store. It must provide
+            a `load_dataframe(table_name, df)` method, like `DuckDBConnector` and `SQLiteConnector`.
+            Defaults to an in-memory `DuckDBConnector`.
+
+    Attributes:
+        source_connector (DatabaseConnectorInterface): The connector to the authoritative database.
+        local_connector (DatabaseConnectorInterface): The embedded extract store.
+        cached_tables (dict): The cached tables keyed by lower-cased name.
+
+    Example:
+        .. code-block:: python
+
+            from pipableai.core.cached_connector import CachedConnector, CachedTable
+            from pipableai.core.duckdb_connector import DuckDBConfig, DuckDBConnector
+            from pipableai.core.postgresql_connector import PostgresConfig, PostgresConnector
+
+            connector = CachedConnector(
+                source_connector=PostgresConnector(postgres_config),
+                cached_tables=[CachedTable("country"), CachedTable("city", ttl_seconds=3600)],
+                local_connector=DuckDBConnector(DuckDBConfig(database="extracts.duckdb")),
+            )
+
+    """
+
+    def __init__(
+        self,
+        source_connector: DatabaseConnectorInterface,
+        cached_tables: List[CachedTable],
+        local_connector: Optional[DatabaseConnectorInterface] = None,
+    ):
+        """Initialize a CachedConnector instance.
+
+        Args:
+            source_connector (DatabaseConnectorInterface): The connector to the authoritative database.
+            cached_tables (list): The `CachedTable` entries to mirror locally.
+            local_connector (DatabaseConnectorInterface, optional): The embedded extract store.
+        """
+        if local_connector is None:
+            from pipableai.core.duckdb_connector import DuckDBConfig, DuckDBConnector
+
+            local_connector = DuckDBConnector(DuckDBConfig())
+        self.source_connector = source_connector
+        self.local_connector = local_connector
+        self.cached_tables: Dict[str, CachedTable] = {
+            table.name.lower(): table for table in cached_tables
+        }
+        self._refreshed_at: Dict[str, float] = {}
+        self.logger = dev_logger()
+
+    def connect(self):
+        """Connect to the source database and open the local extract store."""
+        self.source_connector.connect()
+        self.local_connector.connect()
+        self.local_connector.execute_query(
+            f"CREATE TABLE IF NOT EXISTS {_EXTRACTS_TABLE} "
+            "(table_name VARCHAR PRIMARY KEY, refreshed_at DOUBLE)"
+        )
+        extracts = self.local_connector.execute_query(
+            f"SELECT table_name, refreshed_at FROM {_EXTRACTS_TABLE}"
+        )
+        self._refreshed_at = {
+            row["table_name"]: float(row["refreshed_at"])
+            for _, row in extracts.iterrows()
+            if row["table_name"] in self.cached_tables
+        }
+
+    def disconnect(self):
+        """Close both the source connection and the local extract store."""
+        self.source_connector.disconnect()
+        self.local_connector.disconnect()
+
+    def refresh(self, table_names: Optional[Iterable[str]] = None):
+        """Re-materialize extracts from the source database.
+
+        Args:
+            table_names (list, optional): The cached tables to refresh. Defaults to all of them.
+
+        Raises:
+            ValueError: If a table is not configured for caching or cannot be extracted.
+        """
+        names = self.cached_tables if table_names is None else table_names
+        for name in names:
+            key = name.lower()
+            if key not in self.cached_tables:
+                raise ValueError(f"Table {name} is not configured for caching")
+            self.logger.info(f"refreshing local extract of {key}")
+            source_name = _quote_identifier(self.cached_tables[key].name)
+            df = self.source_connector.execute_query(f"SELECT * FROM {source_name}")
+            self.local_connector.load_dataframe(key, df)
+            refreshed_at = time.time()
+            escaped = key.replace("'", "''")
+            self.local_connector.execute_query(
+                f"DELETE FROM {_EXTRACTS_TABLE} WHERE table_name = '{escaped}'"
+            )
+            self.local_connector.execute_query(
+                f"INSERT INTO {_EXTRACTS_TABLE} VALUES ('{escaped}', {refreshed_at!r})"
+            )
+            self._refreshed_at[key] = refreshed_at
+
+    def _is_stale(self, name: str) -> bool:
+        refreshed_at = self._refreshed_at.get(name)
+        if refreshed_at is None:
+            return True
+        ttl_seconds = self.cached_tables[name].ttl_seconds
+        return ttl_seconds is not None and time.time() - refreshed_at > ttl_seconds
+
+    def _local_query(self, query: str) -> Optional[Tuple[List[str], str]]:
+        """Return the cached tables a query reads and the query to run on the local store,
+        or None if it must go to the source.
+
+        Extracts are stored under their lower-cased name as a single identifier, so
+        schema-qualified references such as ``sales.orders`` or ``"Sales"."Orders"`` are
+        rewritten to ``"sales.orders"``.
+        """
+        try:
+            tokens = tokenize_sql(query)
+        except SQLLexerError:
+            return None
+        if not is_read_only_query(tokens):
+            return None
+        tables = {name.lower() for name in referenced_tables(tokens)}
+        if not tables or not tables.issubset(self.cached_tables):
+            return None
+
+        parts = []
+        cursor = 0
+        for i in range(len(tokens) - 2):
+            first, dot, second = tokens[i : i + 3]
+            if not (_is_name(first) and dot.text == "." and _is_name(second)):
+                continue
+            if i >= 1 and tokens[i - 1].text == ".":
+                continue
+            key = f"{identifier_name(first)}.{identifier_name(second)}".lower()
+            if key not in tables or first.position < cursor:
+                continue
+            parts.append(query[cursor : first.position])
+            parts.append('"' + key.replace('"', '""') + '"')
+            cursor = second.position + len(second.text)
+        parts.append(query[cursor:])
+        return sorted(tables), "".join(parts)
+
+    def execute_query(
+        self, query: str, timeout: Optional[float] = None, result_format: str = "pandas"
+    ) -> DataFrame:
+        """Execute an SQL query locally when possible, otherwise on the source database.
+
+        Args:
+            query (str): The SQL query to execute.
+            timeout (float, optional): Seconds the query may run, passed on to the connector
+                which executes it. Defaults to None, no limit.
+            result_format (str, optional): "pandas", "arrow" or "polars", passed on to the
+                connector which executes the query. Defaults to "pandas".
+
+        Returns:
+            DataFrame: A Pandas DataFrame representing the query results, or the Arrow table or
+            Polars DataFrame requested by `result_format`.
+
+        Raises:
+            ValueError: If an error occurs during query execution on the source database.
+        """
+        kwargs = {} if timeout is None else {"timeout": timeout}
+        if result_format != "pandas":
+            kwargs["result_format"] = result_format
+        local = self._local_query(query)
+        if local is not None:
+            tables, local_query = local
+            try:
+                stale = [name for name in tables if self._is_stale(name)]
+                if stale:
+                    self.refresh(stale)
+                return self.local_connector.execute_query(local_query, **kwargs)
+            except ValueError as e:
+                self.logger.warning(
+                    f"Local extract query failed, falling back to source: {str(e)}"
+                )
+        return self.source_connector.execute_query(query, **kwargs)
+
+
+__all__ = ["CachedTable", "CachedConnector"]
@@ -0,0 +1,493 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, is_dataclass
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from pandas import DataFrame
+
+from pipableai.core.dev_logger import dev_logger
+from pipableai.interfaces.database_connector_interface import DatabaseConnectorInterface
+from pipableai.interfaces.llm_api_client_interface import LlmApiClientInterface
+from pipableai.pipable import Pipable
+
+
+def config_key(config: Any) -> Hashable:
+    """Return the key under which the state of a database configuration is cached.
+
+    Dataclass configurations such as `PostgresConfig` are keyed by their field values,
+    other configurations must be hashable.
+    """
+    if is_dataclass(config):
+        return (type(config).__name__,) + tuple(sorted(asdict(config).items()))
+    return config
+
+
+class ConnectionPool:
+    """A bounded pool of connectors to one database.
+
+    Connectors are created on demand, up to `max_size`, and kept open between requests.
+    Every new connector also needs one of the router's global connection slots; when
+    they are all taken, the router closes an idle connector of another database to
+    free one.
+
+    Args:
+        router (DatabaseRouter): The router enforcing the global connection cap.
+        connector_factory (callable): Creates an unconnected connector to the database.
+        max_size (int): The maximum number of connectors to this database.
+
+    Attributes:
+        max_size (int): The maximum number of connectors to this database.
+        size (int): The number of open connectors, idle or in use.
+    """
+
+    def __init__(
+        self,
+        router: "DatabaseRouter",
+        connector_factory: Callable[[], DatabaseConnectorInterface],
+        max_size: int,
+    ):
+        """Initialize a ConnectionPool instance.
+
+        Args:
+            router (DatabaseRouter): The router enforcing the global connection cap.
+            connector_factory (callable): Creates an unconnected connector to the database.
+            max_size (int): The maximum number of connectors to this database.
+        """
+        self.router = router
+        self.connector_factory = connector_factory
+        self.max_size = max_size
+        self.size = 0
+        self.closed = False
+        self._idle: "queue.LifoQueue[DatabaseConnectorInterface]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float) -> DatabaseConnectorInterface:
+        """Borrow a connected connector, opening a new one if the caps allow it.
+
+        Args:
+            timeout (float): Seconds to wait for a connector to become available.
+
+        Returns:
+            DatabaseConnectorInterface: A connected connector, to be given back with `release`.
+
+        Raises:
+            TimeoutError: If no connector became available within `timeout`.
+            ConnectionError: If a new connector cannot connect.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                grow = self.size < self.max_size
+                if grow:
+                    self.size += 1
+            if grow:
+                if self.router._reserve_connection(self):
+                    try:
+                        connector = self.connector_factory()
+                        connector.connect()
+                        return connector
+                    except Exception:
+                        self._forget()
+                        raise
+                with self._lock:
+                    self.size -= 1
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(
+                    f"No database connection became available within {timeout}s."
+                )
+            # Poll, a connection slot may also be freed by the pool of another database
+            try:
+                return self._idle.get(timeout=min(remaining, 0.05))
+            except queue.Empty:
+                pass
+
+    def release(self, connector: DatabaseConnectorInterface, broken: bool = False):
+        """Give back a connector borrowed with `acquire`.
+
+        Args:
+            connector (DatabaseConnectorInterface): The borrowed connector.
+            broken (bool, optional): Close the connector instead of keeping it. Defaults to False.
+        """
+        if broken or self.closed:
+            self._close(connector)
+        else:
+            self._idle.put(connector)
+
+    @property
+    def idle(self) -> int:
+        """The number of open connectors waiting to be borrowed."""
+        return self._idle.qsize()
+
+    def close_idle(self, keep: int = 0) -> int:
+        """Close idle connectors, keeping at most `keep` of them.
+
+        Returns:
+            int: The number of connectors closed.
+        """
+        closed = 0
+        while self._idle.qsize() > keep:
+            try:
+                connector = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(connector)
+            closed += 1
+        return closed
+
+    def close(self):
+        """Close the idle connectors, and the borrowed ones when they are given back."""
+        self.closed = True
+        self.close_idle()
+
+    def _close(self, connector: DatabaseConnectorInterface):
+        try:
+            connector.disconnect()
+        except Exception as e:
+            self.router.logger.warning(f"Failed to close a pooled connection: {str(e)}")
+        self._forget()
+
+    def _forget(self):
+        with self._lock:
+            self.size -= 1
+        self.router._release_connection()
+
+
+class PooledConnector(DatabaseConnectorInterface):
+    """A connector which runs every query on a connector borrowed from a `ConnectionPool`.
+
+    Several threads can share one `PooledConnector`; each query gets its own connection.
+
+    Args:
+        pool (ConnectionPool): The pool connectors are borrowed from.
+        acquire_timeout (float): Seconds a query waits for a free connection.
+    """
+
+    def __init__(self, pool: ConnectionPool, acquire_timeout: float):
+        """Initialize a PooledConnector instance.
+
+        Args:
+            pool (ConnectionPool): The pool connectors are borrowed from.
+            acquire_timeout (float): Seconds a query waits for a free connection.
+        """
+        self.pool = pool
+        self.acquire_timeout = acquire_timeout
+
+    def connect(self):
+        """Connections are opened by the pool when they are first needed."""
+
+    def disconnect(self):
+        """Connections are closed by the pool."""
+
+    def execute_query(
+        self, query: str, timeout: Optional[float] = None, result_format: str = "pandas"
+    ) -> DataFrame:
+        """Execute an SQL query on a pooled connection.
+
+        Args:
+            query (str): The SQL query to execute.
+            timeout (float, optional): Seconds the query may run. Defaults to None, no limit.
+            result_format (str, optional): "pandas", "arrow" or "polars". Defaults to "pandas".
+
+        Returns:
+            DataFrame: A Pandas DataFrame representing the query results, or the Arrow table or
+            Polars DataFrame requested by `result_format`.
+
+        Raises:
+            TimeoutError: If no connection became available in time, or the query timed out.
+            ValueError: If an error occurs during query execution.
+            ConnectionError: If the connection was lost; it is then closed instead of reused.
+        """
+        acquire_timeout = self.acquire_timeout
+        if timeout is not None:
+            acquire_timeout = min(acquire_timeout, timeout)
+        kwargs = {} if timeout is None else {"timeout": timeout}
+        if result_format != "pandas":
+            kwargs["result_format"] = result_format
+        connector = self.pool.acquire(acquire_timeout)
+        broken = False
+        try:
+            return connector.execute_query(query, **kwargs)
+        except ConnectionError:
+            broken = True
+            raise
+        except Exception:
+            # Connectors which report a lost connection as a query error
+            connection = getattr(connector, "connection", None)
+            broken = bool(getattr(connection, "closed", False))
+            raise
+        finally:
+            self.pool.release(connector, broken=broken)
+
+
+class _Tenant:
+    def __init__(self, key: Hashable, pipable: Pipable, pool: ConnectionPool):
+        self.key = key
+        self.pipable = pipable
+        self.pool = pool
+        self.active = 0
+        self.last_used = time.monotonic()
+        self.catalog_bytes = 0
+
+
+class DatabaseRouter:
+    """Serve many databases from one process, keeping warm state for each of them.
+
+    Each database configuration gets a `Pipable` with its own schema catalog and a
+    bounded connection pool, created on first use and reused by later requests. Idle
+    databases are evicted, least recently used first, to stay within `max_databases`,
+    `max_connections` open connections and `max_catalog_bytes` of cached CREATE TABLE
+    statements in total. Databases with requests in flight are never evicted.
+
+    Args:
+        connector_factory (callable): Creates an unconnected connector from a database
+            configuration, e.g. `PostgresConnector`.
+        llm_api_client (LlmApiClientInterface): The API client shared by all databases.
+        max_databases (int, optional): The maximum number of databases kept warm. Defaults to 64.
+        max_connections (int, optional): The maximum number of open connections over all
+            databases. Defaults to 128.
+        max_connections_per_database (int, optional): The maximum number of open connections to
+            one database. Defaults to 4.
+        max_catalog_bytes (int, optional): The memory budget of all schema catalogs. Defaults to 256 MB.
+        max_idle_seconds (float, optional): Databases unused for longer are evicted. Defaults to None,
+            databases are then only evicted to respect the other limits.
+        acquire_timeout (float, optional): Seconds a query waits for a free connection. Defaults to 30.
+        **pipable_kwargs: Passed to every `Pipable`, e.g. `validate_sql` or `schemas`.
+
+    Example:
+        .. code-block:: python
+
+            router = DatabaseRouter(PostgresConnector, PipLlmApiClient(api_base_url))
+
+            result_df = router.ask_and_execute(tenant_config, "List all employees.")
+
+            with router.session(tenant_config) as pipable:
+                sql_query = pipable.ask("How many employees are there?")
+    """
+
+    def __init__(
+        self,
+        connector_factory: Callable[[Any], DatabaseConnectorInterface],
+        llm_api_client: LlmApiClientInterface,
+        max_databases: int = 64,
+        max_connections: int = 128,
+        max_connections_per_database: int = 4,
+        max_catalog_bytes: int = 256 * 2**20,
+        max_idle_seconds: Optional[float] = None,
+        acquire_timeout: float = 30,
+        **pipable_kwargs,
+    ):
+        """Initialize a DatabaseRouter instance.
+
+        Args:
+            connector_factory (callable): Creates an unconnected connector from a database configuration.
+            llm_api_client (LlmApiClientInterface): The API client shared by all databases.
+            max_databases (int, optional): The maximum number of databases kept warm. Defaults to 64.
+            max_connections (int, optional): The maximum number of open connections. Defaults to 128.
+            max_connections_per_database (int, optional): The maximum open connections per database.
+                Defaults to 4.
+            max_catalog_bytes (int, optional): The memory budget of all schema catalogs. Defaults to 256 MB.
+            max_idle_seconds (float, optional): Databases unused for longer are evicted. Defaults to None.
+            acquire_timeout (float, optional): Seconds a query waits for a free connection. Defaults to 30.
+            **pipable_kwargs: Passed to every `Pipable`.
+        """
+        self.connector_factory = connector_factory
+        self.llm_api_client = llm_api_client
+        self.max_databases = max_databases
+        self.max_connections = max_connections
+        self.max_connections_per_database = max_connections_per_database
+        self.max_catalog_bytes = max_catalog_bytes
+        self.max_idle_seconds = max_idle_seconds
+        self.acquire_timeout = acquire_timeout
+        self.pipable_kwargs = pipable_kwargs
+        self.logger = dev_logger()
+        # config key -> tenant, in least recently used order
+        self._tenants: "OrderedDict[Hashable, _Tenant]" = OrderedDict()
+        # Serializes the creation of the state of one database
+        self._creating: Dict[Hashable, threading.Lock] = {}
+        self._connections = 0
+        self._evictions = 0
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def session(self, config: Any):
+        """Use the warm `Pipable` of a database, creating it on first use.
+
+        The database is not evicted while the session is open.
+
+        Args:
+            config: The database configuration, passed to `connector_factory`.
+
+        Yields:
+            Pipable: The Pipable instance of the database.
+        """
+        tenant = self._checkout(config)
+        try:
+            yield tenant.pipable
+        finally:
+            self._checkin(tenant)
+
+    def ask(self, config: Any, question: str, table_names=None, **kwargs) -> str:
+        """Generate an SQL query for a question about one database, see `Pipable.ask`."""
+        with self.session(config) as pipable:
+            return pipable.ask(question, table_names, **kwargs)
+
+    def ask_and_execute(
+        self, config: Any, question: str, table_names=None, **kwargs
+    ) -> DataFrame:
+        """Generate and execute an SQL query on one database, see `Pipable.ask_and_execute`."""
+        with self.session(config) as pipable:
+            return pipable.ask_and_execute(question, table_names, **kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of warm databases, open connections, catalog bytes and evictions."""
+        with self._lock:
+            return {
+                "databases": len(self._tenants),
+                "connections": self._connections,
+                "catalog_bytes": sum(t.catalog_bytes for t in self._tenants.values()),
+                "evictions": self._evictions,
+            }
+
+    def close(self):
+        """Close the state of every database."""
+        with self._lock:
+            tenants = list(self._tenants.values())
+            self._tenants.clear()
+        for tenant in tenants:
+            self._close_tenant(tenant)
+
+    def _checkout(self, config: Any) -> _Tenant:
+        key = config_key(config)
+        with self._lock:
+            tenant = self._tenants.get(key)
+            if tenant is not None:
+                tenant.active += 1
+                self._tenants.move_to_end(key)
+                return tenant
+            creating = self._creating.setdefault(key, threading.Lock())
+
+        # Databases are introspected outside the router lock, once per key
+        with creating:
+            with self._lock:
+                tenant = self._tenants.get(key)
+                if tenant is not None:
+                    tenant.active += 1
+                    self._tenants.move_to_end(key)
+                    return tenant
+            try:
+                tenant = self._create_tenant(key, config)
+            except Exception:
+                with self._lock:
+                    self._creating.pop(key, None)
+                raise
+            # Published in the same step as the creation lock is dropped, so a thread
+            # which missed the lock finds the tenant instead of creating another one
+            with self._lock:
+                self._creating.pop(key, None)
+                tenant.active += 1
+                self._tenants[key] = tenant
+                evicted = self._select_evictions()
+        self._close_tenants(evicted)
+        return tenant
+
+    def _create_tenant(self, key: Hashable, config: Any) -> _Tenant:
+        self.logger.info("warming up a new database")
+        pool = ConnectionPool(
+            self,
+            lambda: self.connector_factory(config),
+            self.max_connections_per_database,
+        )
+
+        def pooled_connector():
+            return PooledConnector(pool, self.acquire_timeout)
+
+        try:
+            pipable = Pipable(
+                database_connector=pooled_connector(),
+                llm_api_client=self.llm_api_client,
+                connector_factory=pooled_connector,
+                **self.pipable_kwargs,
+            )
+        except Exception:
+            pool.close()
+            raise
+        tenant = _Tenant(key, pipable, pool)
+        tenant.catalog_bytes = pipable.catalog.memory_bytes()
+        return tenant
+
+    def _checkin(self, tenant: _Tenant):
+        catalog_bytes = tenant.pipable.catalog.memory_bytes()
+        with self._lock:
+            tenant.active -= 1
+            tenant.last_used = time.monotonic()
+            tenant.catalog_bytes = catalog_bytes
+            evicted = self._select_evictions()
+        self._close_tenants(evicted)
+
+    def _select_evictions(self):
+        """Remove the idle databases beyond the limits from the router. Holds the lock."""
+        evicted = []
+        now = time.monotonic()
+        catalog_bytes = sum(t.catalog_bytes for t in self._tenants.values())
+        for tenant in list(self._tenants.values()):
+            if tenant.active:
+                continue
+            over_count = len(self._tenants) > self.max_databases
+            over_memory = catalog_bytes > self.max_catalog_bytes
+            expired = (
+                self.max_idle_seconds is not None
+                and now - tenant.last_used > self.max_idle_seconds
+            )
+            if not (over_count or over_memory or expired):
+                continue
+            del self._tenants[tenant.key]
+            catalog_bytes -= tenant.catalog_bytes
+            evicted.append(tenant)
+        self._evictions += len(evicted)
+        return evicted
+
+    def _close_tenants(self, tenants):
+        for tenant in tenants:
+            self.logger.info("evicting an idle database from the router")
+            self._close_tenant(tenant)
+
+    def _close_tenant(self, tenant: _Tenant):
+        try:
+            tenant.pipable.disconnect()
+        except Exception as e:
+            self.logger.warning(f"Failed to close an evicted database: {str(e)}")
+        tenant.pool.close()
+
+    def _reserve_connection(self, pool: ConnectionPool) -> bool:
+        """Take a global connection slot for `pool`, closing an idle connection of the least
+        recently used other database when they are all taken."""
+        with self._lock:
+            if self._connections < self.max_connections:
+                self._connections += 1
+                return True
+            victims = [t.pool for t in self._tenants.values() if t.pool is not pool]
+        for victim in victims:
+            # Closing releases the victim's slot, which is then taken below
+            if victim.idle and victim.close_idle(keep=victim.idle - 1):
+                with self._lock:
+                    if self._connections < self.max_connections:
+                        self._connections += 1
+                        return True
+        return False
+
+    def _release_connection(self):
+        with self._lock:
+            self._connections -= 1
+
+
+__all__ = ["ConnectionPool", "DatabaseRouter", "PooledConnector", "config_key"]
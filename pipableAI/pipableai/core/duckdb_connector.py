@@ -0,0 +1,193 @@
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from pandas import DataFrame
+
+from pipableai.core.result_materializer import check_result_format
+from pipableai.interfaces.database_connector_interface import DatabaseConnectorInterface
+
+
+@dataclass
+class DuckDBConfig:
+    """Data class for DuckDB connection configuration.
+
+    Args:
+        database (str): Path to the DuckDB database file, or ":memory:" for an in-memory database.
+        read_only (bool): Whether to open the database file in read-only mode.
+        threads (int, optional): The number of threads DuckDB may use. Defaults to DuckDB's own choice.
+
+    Attributes:
+        database (str): Path to the DuckDB database file, or ":memory:" for an in-memory database.
+        read_only (bool): Whether to open the database file in read-only mode.
+        threads (int, optional): The number of threads DuckDB may use.
+    """
+
+    database: str = ":memory:"
+    read_only: bool = False
+    threads: Optional[int] = None
+
+
+class DuckDBConnector(DatabaseConnectorInterface):
+    """A class for querying an embedded DuckDB database.
+
+    Results are fetched from DuckDB through Apache Arrow, so columns reach the
+    returned DataFrame without a per-row Python conversion. Pass
+    ``result_format="arrow"`` or ``"polars"`` to skip the pandas conversion entirely.
+
+    The `duckdb` package is an optional dependency, install it with
+    ``pip install pipableai[duckdb]``.
+
+    Args:
+        config (DuckDBConfig): The configuration for opening the DuckDB database.
+
+    Attributes:
+        config (DuckDBConfig): The configuration for opening the DuckDB database.
+        connection (duckdb.DuckDBPyConnection): The connection to the DuckDB database.
+
+    Raises:
+        ImportError: If the `duckdb` package is not installed.
+        ConnectionError: If the database cannot be opened.
+        ValueError: If an error occurs during query execution.
+
+    Example:
+        .. code-block:: python
+
+            from pipableai.core.duckdb_connector import DuckDBConfig, DuckDBConnector
+
+            connector = DuckDBConnector(DuckDBConfig(database="extracts.duckdb"))
+            connector.connect()
+            result = connector.execute_query("SELECT * FROM regions")
+
+    """
+
+    def __init__(self, config: DuckDBConfig):
+        """Initialize a DuckDBConnector instance.
+
+        Args:
+            config (DuckDBConfig): The configuration for opening the DuckDB database.
+        """
+        self.config = config
+        self.connection = None
+        self._duckdb = None
+
+    def connect(self):
+        """Open the DuckDB database."""
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError(
+                "DuckDBConnector requires the 'duckdb' package. "
+                "Install it with 'pip install pipableai[duckdb]'."
+            )
+        self._duckdb = duckdb
+        config = {}
+        if self.config.threads:
+            config["threads"] = self.config.threads
+        try:
+            self.connection = duckdb.connect(
+                self.config.database, read_only=self.config.read_only, config=config
+            )
+        except duckdb.Error as e:
+            raise ConnectionError(f"Failed to open the DuckDB database: {str(e)}")
+
+    def disconnect(self):
+        """Close the DuckDB database."""
+        if self.connection:
+            self.connection.close()
+
+    def execute_query(
+        self, query: str, timeout: Optional[float] = None, result_format: str = "pandas"
+    ) -> DataFrame:
+        """Execute an SQL query on the DuckDB database and return the result as
+        a Pandas DataFrame.
+
+        Args:
+            query (str): The SQL query to execute.
+            timeout (float, optional): Seconds the query may run before it is interrupted.
+                Defaults to None, no limit.
+            result_format (str, optional): "pandas", "arrow" for a `pyarrow.Table` or "polars"
+                for a `polars.DataFrame`, both built by DuckDB. Defaults to "pandas".
+
+        Returns:
+            DataFrame: A Pandas DataFrame representing the query results, or the Arrow table or
+            Polars DataFrame requested by `result_format`.
+
+        Raises:
+            ValueError: If an error occurs during query execution.
+            TimeoutError: If the query was interrupted because it ran longer than `timeout`.
+        """
+        check_result_format(result_format)
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, self.connection.interrupt)
+            timer.daemon = True
+            timer.start()
+        try:
+            result = self.connection.execute(query)
+            if result_format == "arrow":
+                return self._to_arrow_table(result)
+            if result_format == "polars":
+                return result.pl()
+            return result.df()
+        except self._duckdb.Error as e:
+            if timer is not None and timer.finished.is_set():
+                raise TimeoutError(f"SQL query exceeded its {timeout:.3f}s timeout")
+            raise ValueError(f"SQL query execution error: {e}")
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def execute_arrow(self, query: str):
+        """Execute an SQL query and return the result as an Arrow table.
+
+        Requires the `pyarrow` package.
+
+        Args:
+            query (str): The SQL query to execute.
+
+        Returns:
+            pyarrow.Table: The query results.
+
+        Raises:
+            ValueError: If an error occurs during query execution.
+        """
+        try:
+            return self._to_arrow_table(self.connection.execute(query))
+        except self._duckdb.Error as e:
+            raise ValueError(f"SQL query execution error: {e}")
+
+    @staticmethod
+    def _to_arrow_table(result):
+        to_arrow_table = getattr(result, "to_arrow_table", None)
+        if to_arrow_table is None:
+            # duckdb < 1.4
+            to_arrow_table = result.fetch_arrow_table
+        return to_arrow_table()
+
+    def load_dataframe(self, table_name: str, df: DataFrame):
+        """Create or replace a table with the contents of a DataFrame.
+
+        DuckDB scans the DataFrame in place, so the rows are not copied through Python.
+
+        Args:
+            table_name (str): The name of the table to (re)create.
+            df (DataFrame): The rows to store.
+
+        Raises:
+            ValueError: If the table cannot be written.
+        """
+        view_name = "_pipable_load_dataframe"
+        quoted_table = '"' + table_name.replace('"', '""') + '"'
+        try:
+            self.connection.register(view_name, df)
+            self.connection.execute(
+                f"CREATE OR REPLACE TABLE {quoted_table} AS SELECT * FROM {view_name}"
+            )
+        except self._duckdb.Error as e:
+            raise ValueError(f"Failed to load table {table_name}: {e}")
+        finally:
+            self.connection.unregister(view_name)
+
+
+__all__ = ["DuckDBConfig", "DuckDBConnector"]
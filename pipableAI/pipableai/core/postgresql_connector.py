@@ -1,10 +1,24 @@
+import math
+from collections import OrderedDict
 from dataclasses import dataclass
+from typing import Optional
 
 import psycopg2
+from psycopg2 import errorcodes, errors
 from pandas import DataFrame
 
+from pipableai.core.result_materializer import check_result_format, materialize
+from pipableai.core.sql_parameterizer import parameterize_query
 from pipableai.interfaces.database_connector_interface import DatabaseConnectorInterface
 
+# Savepoint around the statement cache's own statements inside a transaction.
+_SAVEPOINT = "pipable_statement_cache"
+# Errors raised when a prepared statement no longer matches the schema or no longer exists.
+_STALE_STATEMENT_ERRORS = {
+    errorcodes.FEATURE_NOT_SUPPORTED,
+    errorcodes.INVALID_SQL_STATEMENT_NAME,
+}
+
 
 @dataclass
 class PostgresConfig:
@@ -16,6 +30,14 @@ class PostgresConfig:
         database (str): The name of the PostgreSQL database.
         user (str): The username for connecting to the PostgreSQL server.
         password (str): The password for the specified username.
+        statement_cache_size (int): The maximum number of server-side prepared statements kept
+            per connection. Set to 0 to disable prepared statements.
+        categorical_threshold (float, optional): Text columns whose ratio of distinct values to rows
+            is at most this are returned as categoricals. Defaults to None, never.
+        downcast (bool): Whether to downcast numeric result columns to the smallest dtype
+            holding their values.
+        numeric_as_float (bool): Whether to return NUMERIC columns as floats instead of exact
+            `Decimal` values.
 
     Attributes:
         host (str): The hostname or IP address of the PostgreSQL server.
@@ -23,6 +45,12 @@ class PostgresConfig:
         database (str): The name of the PostgreSQL database.
         user (str): The username for connecting to the PostgreSQL server.
         password (str): The password for the specified username.
+        statement_cache_size (int): The maximum number of server-side prepared statements kept
+            per connection.
+        categorical_threshold (float, optional): The distinct value ratio under which text columns
+            become categoricals.
+        downcast (bool): Whether numeric result columns are downcast.
+        numeric_as_float (bool): Whether NUMERIC columns are returned as floats.
     """
 
     host: str
@@ -30,6 +58,10 @@ class PostgresConfig:
     database: str
     user: str
     password: str
+    statement_cache_size: int = 100
+    categorical_threshold: Optional[float] = None
+    downcast: bool = False
+    numeric_as_float: bool = False
 
 
 class PostgresConnector(DatabaseConnectorInterface):
@@ -53,6 +85,19 @@ class PostgresConnector(DatabaseConnectorInterface):
     Note:
         The `execute_query` method returns the query results as a Pandas DataFrame.
 
+        Read-only queries are normalized by replacing their literals with parameters and run
+        through server-side prepared statements, so queries that only differ in literal
+        values share one plan. The least recently used statements are deallocated once
+        `PostgresConfig.statement_cache_size` is exceeded. Queries which PostgreSQL refuses
+        to prepare are remembered and executed as plain statements.
+
+        Result columns get dtypes from the PostgreSQL types reported by the cursor, so numbers,
+        booleans and timestamps are not kept as Python objects. See
+        :func:`~pipableai.core.result_materializer.materialize`.
+
+        A query `timeout` is applied as the session's `statement_timeout`, so PostgreSQL
+        cancels the query itself once the caller's deadline has passed.
+
     Warning:
         Ensure to disconnect from the database using the `disconnect` method after executing queries
         to release resources.
@@ -91,6 +136,9 @@ class PostgresConnector(DatabaseConnectorInterface):
         self.config = config
         self.connection = None
         self.cursor = None
+        self._statement_cache = OrderedDict()
+        self._statement_counter = 0
+        self._statement_timeout_ms = None
 
     def connect(self):
         """Establish a connection to the PostgreSQL server."""
@@ -103,6 +151,8 @@ class PostgresConnector(DatabaseConnectorInterface):
                 password=self.config.password,
             )
             self.cursor = self.connection.cursor()
+            self._statement_cache.clear()
+            self._statement_timeout_ms = None
         except psycopg2.Error as e:
             raise ConnectionError(
                 f"Failed to connect to the PostgreSQL server: {str(e)}"
@@ -114,27 +164,162 @@ class PostgresConnector(DatabaseConnectorInterface):
             self.cursor.close()
         if self.connection:
             self.connection.close()
+        self._statement_cache.clear()
 
-    def execute_query(self, query: str) -> DataFrame:
+    def _rollback(self):
+        """Roll back the current transaction, which also reverts its SET statements."""
+        self.connection.rollback()
+        self._statement_timeout_ms = None
+
+    def _set_statement_timeout(self, timeout: Optional[float]):
+        """Make the session's `statement_timeout` match the timeout of the next query.
+
+        Args:
+            timeout (float, optional): Seconds the query may run, None for no limit.
+        """
+        timeout_ms = None if timeout is None else max(1, math.ceil(timeout * 1000))
+        if timeout_ms == self._statement_timeout_ms:
+            return
+        if timeout_ms is None:
+            self.cursor.execute("SET statement_timeout TO DEFAULT")
+        else:
+            self.cursor.execute(f"SET statement_timeout = {timeout_ms}")
+        self._statement_timeout_ms = timeout_ms
+
+    def _prepare(self, shape: str):
+        """Return the name of the prepared statement for a parameterized query.
+
+        Returns:
+            str: The statement name, or None if PostgreSQL cannot prepare the query.
+        """
+        if shape in self._statement_cache:
+            self._statement_cache.move_to_end(shape)
+            return self._statement_cache[shape]
+
+        name = f"pipable_stmt_{self._statement_counter}"
+        self._statement_counter += 1
+        if not self._execute_isolated(f"PREPARE {name} AS {shape}"):
+            # e.g. a parameter whose type cannot be inferred; don't try again
+            name = None
+
+        self._statement_cache[shape] = name
+        if len(self._statement_cache) > self.config.statement_cache_size:
+            _, evicted = self._statement_cache.popitem(last=False)
+            if evicted is not None:
+                # May fail when already gone with a reset session, which is harmless
+                self._execute_isolated(f"DEALLOCATE {evicted}")
+        return name
+
+    def _execute_isolated(self, statement: str) -> bool:
+        """Run a statement whose failure must not abort the session's transaction.
+
+        Inside a transaction the statement runs in a savepoint, so a failure is undone
+        without rolling back the uncommitted work of the session.
+
+        Returns:
+            bool: Whether the statement succeeded.
+        """
+        if self.connection.autocommit:
+            try:
+                self.cursor.execute(statement)
+                return True
+            except psycopg2.Error:
+                return False
+        self.cursor.execute(f"SAVEPOINT {_SAVEPOINT}")
+        try:
+            self.cursor.execute(statement)
+            succeeded = True
+        except psycopg2.Error:
+            self.cursor.execute(f"ROLLBACK TO SAVEPOINT {_SAVEPOINT}")
+            succeeded = False
+        self.cursor.execute(f"RELEASE SAVEPOINT {_SAVEPOINT}")
+        return succeeded
+
+    def _execute_prepared(self, query: str, timeout: Optional[float]) -> bool:
+        """Run a query through a cached prepared statement.
+
+        Args:
+            query (str): The SQL query to execute.
+            timeout (float, optional): Seconds the query may run, None for no limit.
+
+        Returns:
+            bool: False if the query is not eligible and must be executed directly.
+        """
+        if self.config.statement_cache_size <= 0:
+            return False
+        parameterized = parameterize_query(query)
+        if parameterized is None:
+            return False
+        shape, params = parameterized
+        name = self._prepare(shape)
+        if name is None:
+            return False
+
+        self._set_statement_timeout(timeout)
+        try:
+            if params:
+                placeholders = ", ".join(["%s"] * len(params))
+                self.cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+            else:
+                self.cursor.execute(f"EXECUTE {name}")
+            return True
+        except psycopg2.Error as e:
+            if e.pgcode not in _STALE_STATEMENT_ERRORS:
+                raise
+            # The statement was invalidated by a schema change; prepare it again next time
+            self._rollback()
+            del self._statement_cache[shape]
+            try:
+                self.cursor.execute(f"DEALLOCATE {name}")
+            except psycopg2.Error:
+                self._rollback()
+            return False
+
+    def execute_query(
+        self, query: str, timeout: Optional[float] = None, result_format: str = "pandas"
+    ) -> DataFrame:
         """Execute an SQL query on the connected PostgreSQL server and return the result as
         a Pandas DataFrame.
 
         Args:
             query (str): The SQL query to execute.
+            timeout (float, optional): Seconds the query may run before PostgreSQL cancels it.
+                Defaults to None, no limit.
+            result_format (str, optional): "pandas", "arrow" for a `pyarrow.Table` or "polars"
+                for a `polars.DataFrame`. Defaults to "pandas".
 
         Returns:
-            DataFrame: A Pandas DataFrame representing the query results.
+            DataFrame: A Pandas DataFrame representing the query results, or the Arrow table or
+            Polars DataFrame requested by `result_format`.
 
         Raises:
             ValueError: If an error occurs during query execution.
+            TimeoutError: If the query was cancelled because it ran longer than `timeout`.
+            ConnectionError: If the connection to the server was lost.
         """
+        check_result_format(result_format)
         try:
-            self.cursor.execute(query)
-            columns = [desc[0] for desc in self.cursor.description]
+            if not self._execute_prepared(query, timeout):
+                self._set_statement_timeout(timeout)
+                self.cursor.execute(query)
             data = self.cursor.fetchall()
-            df = DataFrame(data, columns=columns)
-            return df
+            return materialize(
+                data,
+                self.cursor.description,
+                result_format,
+                categorical_threshold=self.config.categorical_threshold,
+                downcast=self.config.downcast,
+                numeric_as_float=self.config.numeric_as_float,
+            )
         except psycopg2.Error as e:
+            if self.connection.closed or isinstance(e, psycopg2.InterfaceError):
+                raise ConnectionError(
+                    f"Lost the connection to the PostgreSQL server: {e}"
+                )
+            # Don't leave the connection in an aborted transaction
+            self._rollback()
+            if isinstance(e, errors.QueryCanceled) and timeout is not None:
+                raise TimeoutError(f"SQL query exceeded its {timeout:.3f}s timeout")
             raise ValueError(f"SQL query execution error: {e}")
 
 
@@ -0,0 +1,227 @@
+import math
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+RESULT_FORMATS = ("pandas", "arrow", "polars")
+
+# PostgreSQL type OIDs, as reported in cursor.description
+_INT_OIDS = {20: "int64", 21: "int16", 23: "int32", 26: "int64"}
+_FLOAT_OIDS = {700: "float32", 701: "float64"}
+_NUMERIC_OID = 1700
+_BOOL_OID = 16
+_DATE_OID = 1082
+_TIMESTAMP_OID = 1114
+_TIMESTAMPTZ_OID = 1184
+_STRING_OIDS = {18, 19, 25, 1042, 1043}
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "Arrow results require the 'pyarrow' package. "
+            "Install it with 'pip install pipableai[arrow]'."
+        )
+    return pyarrow
+
+
+def _import_polars():
+    try:
+        import polars
+    except ImportError:
+        raise ImportError(
+            "Polars results require the 'polars' package. "
+            "Install it with 'pip install pipableai[polars]'."
+        )
+    return polars
+
+
+def check_result_format(result_format: str):
+    """Raise ValueError unless `result_format` is one of `RESULT_FORMATS`."""
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(
+            f"result_format must be one of {RESULT_FORMATS}, not {result_format!r}"
+        )
+
+
+def _type_code(column) -> Optional[int]:
+    type_code = getattr(column, "type_code", None)
+    if type_code is None and len(column) > 1:
+        type_code = column[1]
+    return type_code
+
+
+def _is_low_cardinality(values: Sequence[Any], threshold: Optional[float]) -> bool:
+    return (
+        threshold is not None
+        and len(values) > 0
+        and len(set(values)) / len(values) <= threshold
+    )
+
+
+def _pandas_column(
+    values: Sequence[Any],
+    type_code: Optional[int],
+    categorical_threshold: Optional[float],
+    downcast: bool,
+    numeric_as_float: bool,
+):
+    """Convert the values of one column to the pandas array matching its PostgreSQL type."""
+    has_nulls = None in values
+    if type_code in _INT_OIDS:
+        dtype = _INT_OIDS[type_code]
+        if has_nulls:
+            column = pd.array(values, dtype=dtype.capitalize())
+        else:
+            column = np.fromiter(values, dtype=dtype, count=len(values))
+        return pd.to_numeric(column, downcast="integer") if downcast else column
+
+    if type_code in _FLOAT_OIDS or (type_code == _NUMERIC_OID and numeric_as_float):
+        # NUMERIC arrives as Decimal, which is kept unless floats are asked for
+        dtype = _FLOAT_OIDS.get(type_code, "float64")
+        column = np.fromiter(
+            (math.nan if value is None else float(value) for value in values),
+            dtype=dtype,
+            count=len(values),
+        )
+        return pd.to_numeric(column, downcast="float") if downcast else column
+
+    if type_code == _BOOL_OID:
+        if has_nulls:
+            return pd.array(values, dtype="boolean")
+        return np.fromiter(values, dtype=bool, count=len(values))
+
+    if type_code in (_DATE_OID, _TIMESTAMP_OID, _TIMESTAMPTZ_OID):
+        try:
+            return pd.to_datetime(list(values), utc=type_code == _TIMESTAMPTZ_OID)
+        except (pd.errors.OutOfBoundsDatetime, OverflowError, ValueError):
+            # e.g. year 1 or 9999, which datetime64[ns] cannot hold
+            pass
+
+    if type_code in _STRING_OIDS and _is_low_cardinality(values, categorical_threshold):
+        return pd.Categorical(values)
+
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def _arrow_type(pyarrow, type_code: Optional[int], numeric_as_float: bool):
+    """Return the Arrow type of a PostgreSQL type, or None to infer it from the values."""
+    if type_code in _INT_OIDS:
+        return getattr(pyarrow, _INT_OIDS[type_code])()
+    if type_code in _FLOAT_OIDS:
+        return getattr(pyarrow, _FLOAT_OIDS[type_code])()
+    if type_code == _BOOL_OID:
+        return pyarrow.bool_()
+    if type_code == _DATE_OID:
+        return pyarrow.date32()
+    if type_code == _TIMESTAMP_OID:
+        return pyarrow.timestamp("us")
+    if type_code == _TIMESTAMPTZ_OID:
+        return pyarrow.timestamp("us", tz="UTC")
+    if type_code in _STRING_OIDS:
+        return pyarrow.string()
+    if type_code == _NUMERIC_OID and numeric_as_float:
+        return pyarrow.float64()
+    # NUMERIC is otherwise inferred as an exact decimal128
+    return None
+
+
+def materialize(
+    rows: List[tuple],
+    description: Sequence[Any],
+    result_format: str = "pandas",
+    categorical_threshold: Optional[float] = None,
+    downcast: bool = False,
+    numeric_as_float: bool = False,
+):
+    """Build a query result from the fetched rows, with column types taken from the cursor.
+
+    Integer, floating point, boolean and date/time columns get native dtypes instead of
+    Python objects, including when they hold NULLs (nullable integer and boolean dtypes, NaN
+    and NaT). NUMERIC columns keep their exact value, as `Decimal` objects in pandas and
+    decimals in Arrow, unless `numeric_as_float` is set.
+
+    Args:
+        rows (list): The rows returned by `cursor.fetchall()`.
+        description (list): `cursor.description`, whose `type_code` are PostgreSQL type OIDs.
+            Columns without a known type keep Python objects.
+        result_format (str, optional): "pandas", "arrow" or "polars". Defaults to "pandas".
+        categorical_threshold (float, optional): Text columns whose ratio of distinct values to rows
+            is at most this become categorical (dictionary encoded in Arrow and Polars).
+            Defaults to None, no categorical conversion.
+        downcast (bool, optional): Downcast numeric pandas columns to the smallest dtype holding
+            their values. Defaults to False.
+        numeric_as_float (bool, optional): Return NUMERIC columns as float64, which may round
+            their values, instead of exact decimals. Defaults to False.
+
+    Returns:
+        pandas.DataFrame, pyarrow.Table or polars.DataFrame: The query result.
+
+    Raises:
+        ValueError: If `result_format` is unknown.
+        ImportError: If the package of the requested format is not installed.
+    """
+    check_result_format(result_format)
+    names = [column[0] for column in description]
+    type_codes = [_type_code(column) for column in description]
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+
+    if result_format == "pandas":
+        df = DataFrame(
+            {
+                index: _pandas_column(
+                    values, type_code, categorical_threshold, downcast, numeric_as_float
+                )
+                for index, (values, type_code) in enumerate(zip(columns, type_codes))
+            }
+        )
+        # Assigned afterwards, result columns may share a name
+        df.columns = names
+        return df
+
+    pyarrow = _import_pyarrow()
+    arrays = []
+    for values, type_code in zip(columns, type_codes):
+        if type_code == _NUMERIC_OID and numeric_as_float:
+            values = [None if value is None else float(value) for value in values]
+        array = pyarrow.array(
+            values, type=_arrow_type(pyarrow, type_code, numeric_as_float)
+        )
+        if type_code in _STRING_OIDS and _is_low_cardinality(
+            values, categorical_threshold
+        ):
+            array = array.dictionary_encode()
+        arrays.append(array)
+    table = pyarrow.Table.from_arrays(arrays, names=names)
+    if result_format == "arrow":
+        return table
+    return _import_polars().from_arrow(table)
+
+
+def convert_dataframe(df: DataFrame, result_format: str):
+    """Convert a pandas query result to the requested format.
+
+    Used by the connectors whose drivers do not report column types.
+
+    Args:
+        df (DataFrame): The query result.
+        result_format (str): "pandas", "arrow" or "polars".
+
+    Returns:
+        pandas.DataFrame, pyarrow.Table or polars.DataFrame: The query result.
+    """
+    check_result_format(result_format)
+    if result_format == "pandas":
+        return df
+    if result_format == "arrow":
+        return _import_pyarrow().Table.from_pandas(df, preserve_index=False)
+    return _import_polars().from_pandas(df)
+
+
+__all__ = ["RESULT_FORMATS", "check_result_format", "convert_dataframe", "materialize"]
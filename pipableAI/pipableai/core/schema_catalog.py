@@ -0,0 +1,398 @@
+import queue
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pipableai.core.dev_logger import dev_logger
+from pipableai.interfaces.database_connector_interface import DatabaseConnectorInterface
+
+DEFAULT_SCHEMA = "public"
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def qualified_name(schema: str, table: str) -> str:
+    """Return the name under which a table appears in CREATE TABLE statements.
+
+    Tables of the default ``public`` schema keep their bare name, all other tables are
+    qualified with their schema.
+    """
+    return table if schema == DEFAULT_SCHEMA else f"{schema}.{table}"
+
+
+class SchemaCatalog:
+    """A bounded, lazily populated cache of CREATE TABLE statements per database schema.
+
+    A schema is introspected the first time one of its tables is needed. When several
+    schemas are requested at once and a `connector_factory` is given, they are introspected
+    in parallel, each on a connector borrowed from a small pool. At most `max_schemas`
+    schemas are kept; the least recently used ones are evicted first, except for the
+    pinned schemas, which are never evicted.
+
+    Args:
+        database_connector (DatabaseConnectorInterface): The connector used for sequential introspection.
+        connector_factory (callable, optional): Creates additional connectors to the same database for
+            parallel introspection. Without it, schemas are introspected one after another.
+        max_schemas (int): The maximum number of schemas kept in memory.
+        max_workers (int): The maximum number of schemas introspected concurrently, which is also the
+            size of the connector pool.
+        pinned_schemas (list, optional): Schemas which are never evicted.
+
+    Attributes:
+        database_connector (DatabaseConnectorInterface): The connector used for sequential introspection.
+        connector_factory (callable): Creates additional connectors for parallel introspection.
+        max_schemas (int): The maximum number of schemas kept in memory.
+        max_workers (int): The maximum number of schemas introspected concurrently.
+        pinned_schemas (set): Schemas which are never evicted.
+    """
+
+    def __init__(
+        self,
+        database_connector: DatabaseConnectorInterface,
+        connector_factory: Optional[Callable[[], DatabaseConnectorInterface]] = None,
+        max_schemas: int = 32,
+        max_workers: int = 4,
+        pinned_schemas: Optional[Iterable[str]] = None,
+    ):
+        """Initialize a SchemaCatalog instance.
+
+        Args:
+            database_connector (DatabaseConnectorInterface): The connector used for sequential introspection.
+            connector_factory (callable, optional): Creates additional connectors for parallel introspection.
+            max_schemas (int): The maximum number of schemas kept in memory.
+            max_workers (int): The maximum number of schemas introspected concurrently.
+            pinned_schemas (list, optional): Schemas which are never evicted.
+        """
+        self.database_connector = database_connector
+        self.connector_factory = connector_factory
+        self.max_schemas = max_schemas
+        self.max_workers = max_workers
+        self.pinned_schemas = set(pinned_schemas or [])
+        self.logger = dev_logger()
+        # schema -> {table: CREATE TABLE statement}, in least recently used order
+        self._schemas: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+        # schema -> {table: fingerprint}, see `refresh`
+        self._fingerprints: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+        self._pool: "queue.Queue[DatabaseConnectorInterface]" = queue.Queue(
+            maxsize=max_workers
+        )
+
+    @property
+    def loaded_schemas(self) -> List[str]:
+        """The schemas currently held in memory, least recently used first."""
+        with self._lock:
+            return list(self._schemas)
+
+    def memory_bytes(self) -> int:
+        """Estimate the memory held by the cached CREATE TABLE statements, in bytes."""
+        with self._lock:
+            return sum(
+                sys.getsizeof(table) + sys.getsizeof(statement)
+                for tables in self._schemas.values()
+                for table, statement in tables.items()
+            )
+
+    def statements(self, schemas: Iterable[str]) -> List[str]:
+        """Return the CREATE TABLE statements of every table in the given schemas.
+
+        Args:
+            schemas (list): The schemas to describe. Missing schemas are introspected first.
+
+        Returns:
+            list: CREATE TABLE statements ordered by schema, then table name.
+        """
+        schemas = list(schemas)
+        tables = self.load(schemas)
+        return [tables[schema][table] for schema in schemas for table in tables[schema]]
+
+    def table_statements(
+        self, table_names: Iterable[str], search_path: Iterable[str]
+    ) -> List[str]:
+        """Return the CREATE TABLE statements of specific tables.
+
+        Args:
+            table_names (list): Table names, optionally qualified as ``schema.table``.
+            search_path (list): The schemas searched, in order, for unqualified names.
+
+        Returns:
+            list: The CREATE TABLE statements of the tables which exist, ordered by name.
+        """
+        search_path = list(search_path)
+        references: List[Tuple[Optional[str], str]] = []
+        for name in table_names:
+            schema, _, table = name.rpartition(".")
+            references.append((schema or None, table))
+        needed = list(search_path)
+        needed += [
+            schema for schema, _ in references if schema and schema not in needed
+        ]
+        tables = self.load(needed)
+
+        found = {}
+        for schema, table in references:
+            for candidate in [schema] if schema else search_path:
+                statement = tables[candidate].get(table)
+                if statement is not None:
+                    found[qualified_name(candidate, table)] = statement
+                    break
+        return [found[name] for name in sorted(found)]
+
+    def load(self, schemas: Iterable[str]) -> Dict[str, Dict[str, str]]:
+        """Make sure the given schemas are in memory, introspecting missing ones.
+
+        Args:
+            schemas (list): The schemas to load.
+
+        Returns:
+            dict: The tables of each requested schema, as ``{table: statement}`` mappings.
+        """
+        schemas = list(dict.fromkeys(schemas))
+        while True:
+            with self._lock:
+                missing = [schema for schema in schemas if schema not in self._schemas]
+
+            if len(missing) > 1 and self.connector_factory is not None:
+                with ThreadPoolExecutor(
+                    max_workers=min(self.max_workers, len(missing))
+                ) as executor:
+                    loaded = list(
+                        executor.map(self._introspect_with_pooled_connector, missing)
+                    )
+            else:
+                loaded = [
+                    self._introspect_schema(schema, self.database_connector)
+                    for schema in missing
+                ]
+
+            with self._lock:
+                for schema, (tables, fingerprints) in zip(missing, loaded):
+                    self._schemas[schema] = tables
+                    if fingerprints is not None:
+                        self._fingerprints[schema] = fingerprints
+                # Another thread may have evicted a schema while we were loading
+                if all(schema in self._schemas for schema in schemas):
+                    result = {}
+                    for schema in schemas:
+                        self._schemas.move_to_end(schema)
+                        result[schema] = self._schemas[schema]
+                    self._evict()
+                    return result
+
+    def _evict(self):
+        """Drop least recently used, unpinned schemas beyond `max_schemas`. Holds the lock."""
+        for schema in list(self._schemas):
+            if len(self._schemas) <= self.max_schemas:
+                break
+            if schema in self.pinned_schemas:
+                continue
+            self.logger.info(f"evicting schema {schema} from the catalog")
+            del self._schemas[schema]
+            self._fingerprints.pop(schema, None)
+
+    def _introspect_schema(
+        self, schema: str, database_connector: DatabaseConnectorInterface
+    ) -> Tuple[Dict[str, str], Optional[Dict[str, str]]]:
+        """Introspect a whole schema together with the fingerprints of its tables.
+
+        The fingerprints are fetched first, so a table altered while the schema is introspected
+        is introspected again by the next `refresh`. They are None when they cannot be fetched.
+        """
+        try:
+            fingerprints = self._fetch_fingerprints([schema], database_connector)[
+                schema
+            ]
+        except Exception as e:
+            self.logger.warning(
+                f"could not fetch the fingerprints of schema {schema}: {e}"
+            )
+            fingerprints = None
+        return (
+            self.introspect(schema, database_connector=database_connector),
+            fingerprints,
+        )
+
+    def _introspect_with_pooled_connector(
+        self, schema: str
+    ) -> Tuple[Dict[str, str], Optional[Dict[str, str]]]:
+        try:
+            connector = self._pool.get_nowait()
+        except queue.Empty:
+            connector = self.connector_factory()
+            connector.connect()
+        try:
+            return self._introspect_schema(schema, connector)
+        finally:
+            try:
+                self._pool.put_nowait(connector)
+            except queue.Full:
+                connector.disconnect()
+
+    def introspect(
+        self,
+        schema: str,
+        table_names: Optional[List[str]] = None,
+        database_connector: Optional[DatabaseConnectorInterface] = None,
+    ) -> Dict[str, str]:
+        """Generate CREATE TABLE statements for the tables of one schema.
+
+        Args:
+            schema (str): The schema to introspect.
+            table_names (list, optional): Restrict introspection to these tables.
+            database_connector (DatabaseConnectorInterface, optional): The connector to query.
+                Defaults to `database_connector`.
+
+        Returns:
+            dict: CREATE TABLE statements keyed by table name, ordered by table name.
+
+        Raises:
+            ValueError: If the catalog query fails.
+        """
+        if database_connector is None:
+            database_connector = self.database_connector
+        where_clause = f"WHERE table_schema = {_quote_literal(schema)}"
+        if table_names is not None and len(table_names) > 0:
+            tables_to_fetch = ",".join([_quote_literal(table) for table in table_names])
+            where_clause += f" AND table_name IN ({tables_to_fetch})"
+
+        # SQL query to extract column names and data types
+        column_info_query = f"""
+        SELECT table_name, column_name, data_type
+        FROM information_schema.columns
+        {where_clause};
+        """
+
+        try:
+            # Execute the SQL query using the database connector and get the result as DataFrame
+            column_info_df = database_connector.execute_query(column_info_query)
+
+            if column_info_df.shape[0] == 0:
+                return {}
+
+            # Group column info by table name using Pandas groupby
+            grouped_columns = column_info_df.groupby("table_name").apply(
+                lambda x: ", ".join(
+                    [
+                        f"{row['column_name']} {row['data_type']}"
+                        for _, row in x.iterrows()
+                    ]
+                )
+            )
+
+            # Generate CREATE TABLE statements in Python
+            return {
+                table_name: f"CREATE TABLE {qualified_name(schema, table_name)} ({columns})"
+                for table_name, columns in grouped_columns.items()
+            }
+
+        except Exception as e:
+            self.logger.error(f"Error generating CREATE TABLE statements: {str(e)}")
+            raise ValueError(f"Error generating CREATE TABLE statements: {str(e)}")
+
+    def _fetch_fingerprints(
+        self, schemas: List[str], database_connector: DatabaseConnectorInterface
+    ) -> Dict[str, Dict[str, str]]:
+        """Fetch a fingerprint of the definition of every table in the given schemas.
+
+        The fingerprint hashes the transaction ids (xmin) of the table's `pg_class` row and of
+        its `pg_attribute` rows. Any DDL which changes the table or its columns rewrites those
+        rows, so a changed fingerprint means the table must be introspected again.
+        """
+        schema_list = ", ".join(_quote_literal(schema) for schema in schemas)
+        fingerprint_query = f"""
+        SELECT n.nspname AS table_schema, c.relname AS table_name,
+               md5(c.xmin::text || ':' || string_agg(
+                   a.attnum::text || ':' || a.xmin::text, ',' ORDER BY a.attnum
+               )) AS fingerprint
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+        WHERE n.nspname IN ({schema_list}) AND c.relkind IN ('r', 'v', 'f', 'p')
+        GROUP BY n.nspname, c.relname, c.xmin;
+        """
+        fingerprint_df = database_connector.execute_query(fingerprint_query)
+        fingerprints = {schema: {} for schema in schemas}
+        for schema, table, fingerprint in zip(
+            fingerprint_df["table_schema"],
+            fingerprint_df["table_name"],
+            fingerprint_df["fingerprint"],
+        ):
+            fingerprints[schema][table] = fingerprint
+        return fingerprints
+
+    def refresh(
+        self, database_connector: Optional[DatabaseConnectorInterface] = None
+    ) -> List[str]:
+        """Bring the loaded schemas up to date, re-introspecting only the tables that changed.
+
+        Changes are detected against the fingerprints recorded when the schema was loaded. When
+        those could not be fetched, the first refresh of the schema records them and only picks up
+        tables created or dropped since the schema was loaded.
+
+        Args:
+            database_connector (DatabaseConnectorInterface, optional): The connector used for the
+                catalog queries. Defaults to `database_connector`.
+
+        Returns:
+            list: The qualified names of the tables which were added, altered or dropped.
+        """
+        if database_connector is None:
+            database_connector = self.database_connector
+        with self._lock:
+            snapshot = {schema: tables for schema, tables in self._schemas.items()}
+            previous_fingerprints = dict(self._fingerprints)
+        if not snapshot:
+            return []
+
+        fingerprints = self._fetch_fingerprints(list(snapshot), database_connector)
+        updated = {}
+        changed_names = []
+        for schema, tables in snapshot.items():
+            current = fingerprints[schema]
+            previous = previous_fingerprints.get(schema)
+            if previous is not None:
+                changed = [t for t, f in current.items() if previous.get(t) != f]
+            else:
+                changed = [t for t in current if t not in tables]
+            dropped = [t for t in tables if t not in current]
+            if not changed and not dropped:
+                continue
+
+            self.logger.info(
+                f"refreshing schema {schema}, changed: {changed}, dropped: {dropped}"
+            )
+            statements = {
+                table: statement
+                for table, statement in tables.items()
+                if table not in changed and table not in dropped
+            }
+            if changed:
+                statements.update(self.introspect(schema, changed, database_connector))
+            updated[schema] = dict(sorted(statements.items()))
+            changed_names += [qualified_name(schema, t) for t in changed + dropped]
+
+        with self._lock:
+            for schema, tables in updated.items():
+                # Swap a whole schema at once so readers never see a partial update,
+                # unless it was evicted in the meantime.
+                if schema in self._schemas:
+                    self._schemas[schema] = tables
+            for schema, current in fingerprints.items():
+                if schema in self._schemas:
+                    self._fingerprints[schema] = current
+        return sorted(changed_names)
+
+    def close(self):
+        """Disconnect the pooled connectors used for parallel introspection."""
+        while True:
+            try:
+                self._pool.get_nowait().disconnect()
+            except queue.Empty:
+                break
+
+
+__all__ = ["DEFAULT_SCHEMA", "SchemaCatalog", "qualified_name"]
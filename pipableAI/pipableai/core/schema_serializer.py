@@ -0,0 +1,198 @@
+import math
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+# Single-word names of the multi-word information_schema data types. The server only
+# keeps the first word of a type, so these are also the names the model sees.
+TYPE_ALIASES = {
+    "bit varying": "varbit",
+    "character varying": "varchar",
+    "character": "char",
+    "double precision": "float8",
+    "time with time zone": "timetz",
+    "time without time zone": "time",
+    "timestamp with time zone": "timestamptz",
+    "timestamp without time zone": "timestamp",
+}
+
+_CREATE_TABLE_PATTERN = re.compile(
+    r"CREATE TABLE\s+([\w.\"]+)\s*\((.*)\)\s*;?\s*$", re.IGNORECASE | re.DOTALL
+)
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text, about four characters per token."""
+    return math.ceil(len(text) / 4)
+
+
+@lru_cache(maxsize=16384)
+def compact_statement(statement: str) -> Tuple[Optional[str], str]:
+    """Shorten the column list of a CREATE TABLE statement.
+
+    Columns are separated by "," alone and their types replaced by `TYPE_ALIASES`.
+
+    Args:
+        statement (str): A CREATE TABLE statement as generated by `Pipable`.
+
+    Returns:
+        tuple: The table name and the compact column list, or None and the unchanged
+        statement if it is not a CREATE TABLE statement.
+    """
+    match = _CREATE_TABLE_PATTERN.match(statement.strip())
+    if not match:
+        return None, statement
+    columns = []
+    for column in match.group(2).split(","):
+        name, _, data_type = column.strip().partition(" ")
+        data_type = data_type.strip()
+        data_type = TYPE_ALIASES.get(data_type.lower(), data_type)
+        columns.append(f"{name} {data_type}" if data_type else name)
+    return match.group(1), ",".join(columns)
+
+
+def _words(text: str) -> set:
+    """Return the lower-cased words of a text, without a plural "s"."""
+    return {
+        word[:-1] if len(word) > 3 and word.endswith("s") else word
+        for word in _WORD_PATTERN.findall(text.lower())
+    }
+
+
+def _relevance(name: str, columns: str, question_words: set) -> int:
+    """Score a table by the words of the question found in its name and column names."""
+    name_words = _words(name)
+    column_words = _words(columns)
+    return 2 * len(name_words & question_words) + len(column_words & question_words)
+
+
+class SchemaSerializer:
+    """Serialize CREATE TABLE statements into a compact, token-budgeted query context.
+
+    Types are shortened to `TYPE_ALIASES`. With `deduplicate`, a table with the same columns
+    as an earlier table of the context is sent as ``CREATE TABLE name (LIKE earlier)``, which
+    shrinks schemas with many partitions or per-period copies of a table. Only servers which
+    expand the LIKE column lists back before rendering the prompt understand it.
+
+    With `max_tokens`, tables are added in order of relevance to the question, the words
+    of the question found in their name and columns, until the budget is used up. They
+    keep their original order in the context. Token counts are cached per table.
+
+    Args:
+        max_tokens (int, optional): The maximum number of context tokens. Defaults to None, no limit.
+        token_counter (callable, optional): Counts the tokens of a text, e.g. with the tokenizer
+            of the model. Defaults to `estimate_tokens`.
+        cache_size (int, optional): The number of table token counts kept. Defaults to 16384.
+        deduplicate (bool, optional): Send repeated column lists as LIKE. Defaults to False.
+
+    Attributes:
+        max_tokens (int, optional): The maximum number of context tokens.
+        token_counter (callable): Counts the tokens of a text.
+        deduplicate (bool): Whether repeated column lists are sent as LIKE.
+
+    Example:
+        .. code-block:: python
+
+            from transformers import AutoTokenizer
+
+            tokenizer = AutoTokenizer.from_pretrained(model_path)
+            serializer = SchemaSerializer(
+                max_tokens=2048,
+                token_counter=lambda text: len(tokenizer.encode(text, add_special_tokens=False)),
+            )
+            context = serializer.serialize(create_table_statements, "Total sales per store?")
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        token_counter: Optional[Callable[[str], int]] = None,
+        cache_size: int = 16384,
+        deduplicate: bool = False,
+    ):
+        """Initialize a SchemaSerializer instance.
+
+        Args:
+            max_tokens (int, optional): The maximum number of context tokens. Defaults to None.
+            token_counter (callable, optional): Counts the tokens of a text. Defaults to `estimate_tokens`.
+            cache_size (int, optional): The number of table token counts kept. Defaults to 16384.
+            deduplicate (bool, optional): Send repeated column lists as LIKE. Defaults to False.
+        """
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter or estimate_tokens
+        self.cache_size = cache_size
+        self.deduplicate = deduplicate
+        # compact statement -> token count, in least recently used order
+        self._token_counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def token_count(self, statement: str) -> int:
+        """Return the number of tokens of a compact statement, counting it once."""
+        with self._lock:
+            count = self._token_counts.get(statement)
+            if count is not None:
+                self._token_counts.move_to_end(statement)
+                return count
+        count = self.token_counter(statement)
+        with self._lock:
+            self._token_counts[statement] = count
+            if len(self._token_counts) > self.cache_size:
+                self._token_counts.popitem(last=False)
+        return count
+
+    def _within_budget(
+        self, tables: List[Tuple[Optional[str], str]], question: str
+    ) -> List[int]:
+        """Return the indexes of the most relevant tables which fit in `max_tokens`."""
+        question_words = _words(question)
+        ranked = sorted(
+            range(len(tables)),
+            key=lambda i: -_relevance(tables[i][0] or "", tables[i][1], question_words),
+        )
+        selected = []
+        used = 0
+        for index in ranked:
+            name, columns = tables[index]
+            statement = columns if name is None else f"CREATE TABLE {name} ({columns})"
+            # One more token for the ";" separator
+            cost = self.token_count(statement) + 1
+            if used + cost <= self.max_tokens:
+                selected.append(index)
+                used += cost
+        return sorted(selected)
+
+    def serialize(self, statements: List[str], question: str = "") -> str:
+        """Build the query context of a question from CREATE TABLE statements.
+
+        Args:
+            statements (list): CREATE TABLE statements as generated by `Pipable`.
+            question (str, optional): The question, used to rank the tables when the budget
+                does not fit all of them. Defaults to "".
+
+        Returns:
+            str: The ";" separated compact statements.
+        """
+        tables = [compact_statement(statement) for statement in statements]
+        indexes = range(len(tables))
+        if self.max_tokens is not None:
+            indexes = self._within_budget(tables, question)
+
+        parts = []
+        # column list -> first table with it
+        seen = {}
+        for index in indexes:
+            name, columns = tables[index]
+            if name is None:
+                parts.append(columns)
+                continue
+            like = seen.setdefault(columns, name)
+            if self.deduplicate and like != name and len(f"LIKE {like}") < len(columns):
+                columns = f"LIKE {like}"
+            parts.append(f"CREATE TABLE {name} ({columns})")
+        return ";".join(parts)
+
+
+__all__ = ["TYPE_ALIASES", "SchemaSerializer", "compact_statement", "estimate_tokens"]
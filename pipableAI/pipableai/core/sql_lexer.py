@@ -0,0 +1,365 @@
+import re
+from dataclasses import dataclass
+from typing import List, Set, Union
+
+
+class SQLLexerError(ValueError):
+    """Raised when an SQL string cannot be split into tokens.
+
+    Attributes:
+        position (int): The character offset at which tokenization failed.
+    """
+
+    def __init__(self, message: str, position: int):
+        super().__init__(f"{message} at position {position}")
+        self.position = position
+
+
+@dataclass(frozen=True)
+class Token:
+    """A single lexical token of a PostgreSQL statement.
+
+    Attributes:
+        kind (str): One of ``word``, ``quoted_identifier``, ``string``, ``number``,
+            ``parameter``, ``operator`` or ``punctuation``.
+        text (str): The raw source text of the token.
+        position (int): The character offset of the token in the statement.
+    """
+
+    kind: str
+    text: str
+    position: int
+
+    @property
+    def upper(self) -> str:
+        """The token text in upper case, handy for keyword comparisons."""
+        return self.text.upper()
+
+
+_WHITESPACE = re.compile(r"\s+")
+_NUMBER = re.compile(r"(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_PARAMETER = re.compile(r"\$\d+")
+_DOLLAR_TAG = re.compile(r"\$(?:[^\W\d]\w*)?\$")
+_WORD = re.compile(r"[^\W\d]\w*\$?\w*")
+_OPERATOR = re.compile(r"::|[+\-*/<>=~!@#%^&|`?]+")
+_PUNCTUATION = "(),;.[]:"
+_STRING_PREFIXES = ("E", "B", "X", "N")
+
+# Keywords that introduce a table reference.
+_TABLE_KEYWORDS = {"FROM", "JOIN"}
+
+# Words that may appear between FROM/JOIN and the actual relation name.
+_TABLE_MODIFIERS = {"ONLY", "LATERAL"}
+
+# Keywords which end a FROM list.
+_CLAUSE_KEYWORDS = {
+    "WHERE",
+    "GROUP",
+    "HAVING",
+    "ORDER",
+    "LIMIT",
+    "OFFSET",
+    "UNION",
+    "INTERSECT",
+    "EXCEPT",
+    "WINDOW",
+    "FETCH",
+    "FOR",
+    "RETURNING",
+}
+
+# Leading keywords of statements which never modify data.
+_READ_ONLY_STATEMENTS = {"SELECT", "WITH", "VALUES", "TABLE"}
+
+# Keywords which make a statement write to the database.
+_WRITE_KEYWORDS = {
+    "INSERT",
+    "UPDATE",
+    "DELETE",
+    "MERGE",
+    "CREATE",
+    "DROP",
+    "ALTER",
+    "TRUNCATE",
+    "GRANT",
+    "REVOKE",
+    "COPY",
+    "INTO",
+    "CALL",
+    "DO",
+    "LOCK",
+}
+
+
+def _scan_quoted(sql: str, start: int, quote: str, backslash_escapes: bool = False):
+    """Return the offset just after the closing quote of a quoted token."""
+    i = start + 1
+    length = len(sql)
+    while i < length:
+        char = sql[i]
+        if backslash_escapes and char == "\\":
+            i += 2
+            continue
+        if char == quote:
+            if i + 1 < length and sql[i + 1] == quote:
+                i += 2
+                continue
+            return i + 1
+        i += 1
+    kind = "identifier" if quote == '"' else "string literal"
+    raise SQLLexerError(f"Unterminated quoted {kind}", start)
+
+
+def tokenize_sql(sql: str) -> List[Token]:
+    """Split a PostgreSQL statement into tokens, dropping whitespace and comments.
+
+    Args:
+        sql (str): The SQL text to tokenize.
+
+    Returns:
+        list: A list of :class:`Token` objects in source order.
+
+    Raises:
+        SQLLexerError: If a string, quoted identifier or comment is not terminated.
+    """
+    tokens = []
+    i = 0
+    length = len(sql)
+    while i < length:
+        char = sql[i]
+        match = _WHITESPACE.match(sql, i)
+        if match:
+            i = match.end()
+            continue
+        if sql.startswith("--", i):
+            newline = sql.find("\n", i)
+            i = length if newline == -1 else newline + 1
+            continue
+        if sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            if end == -1:
+                raise SQLLexerError("Unterminated block comment", i)
+            i = end + 2
+            continue
+        if char == "'":
+            end = _scan_quoted(sql, i, "'")
+            tokens.append(Token("string", sql[i:end], i))
+            i = end
+            continue
+        if char.upper() in _STRING_PREFIXES and sql.startswith("'", i + 1):
+            end = _scan_quoted(sql, i + 1, "'", backslash_escapes=char.upper() == "E")
+            tokens.append(Token("string", sql[i:end], i))
+            i = end
+            continue
+        if char == '"':
+            end = _scan_quoted(sql, i, '"')
+            tokens.append(Token("quoted_identifier", sql[i:end], i))
+            i = end
+            continue
+        if char == "$":
+            match = _PARAMETER.match(sql, i)
+            if match:
+                tokens.append(Token("parameter", match.group(), i))
+                i = match.end()
+                continue
+            match = _DOLLAR_TAG.match(sql, i)
+            if match:
+                tag = match.group()
+                end = sql.find(tag, match.end())
+                if end == -1:
+                    raise SQLLexerError("Unterminated dollar-quoted string", i)
+                tokens.append(Token("string", sql[i : end + len(tag)], i))
+                i = end + len(tag)
+                continue
+        match = _NUMBER.match(sql, i)
+        if match:
+            tokens.append(Token("number", match.group(), i))
+            i = match.end()
+            continue
+        match = _WORD.match(sql, i)
+        if match:
+            tokens.append(Token("word", match.group(), i))
+            i = match.end()
+            continue
+        if sql.startswith("::", i):
+            tokens.append(Token("operator", "::", i))
+            i += 2
+            continue
+        if char in _PUNCTUATION:
+            tokens.append(Token("punctuation", char, i))
+            i += 1
+            continue
+        match = _OPERATOR.match(sql, i)
+        if match:
+            tokens.append(Token("operator", match.group(), i))
+            i = match.end()
+            continue
+        raise SQLLexerError(f"Unexpected character {char!r}", i)
+    return tokens
+
+
+def identifier_name(token: Token) -> str:
+    """Return the catalog name of an identifier token.
+
+    Unquoted identifiers are folded to lower case as PostgreSQL does, quoted
+    identifiers keep their case with doubled quotes unescaped.
+    """
+    if token.kind == "quoted_identifier":
+        return token.text[1:-1].replace('""', '"')
+    return token.text.lower()
+
+
+def _is_identifier(token: Token) -> bool:
+    return token.kind in ("word", "quoted_identifier")
+
+
+def _read_qualified_name(tokens: List[Token], start: int):
+    """Read a possibly dotted identifier starting at ``start``.
+
+    Returns:
+        tuple: The dotted name and the index of the first token after it.
+    """
+    parts = [identifier_name(tokens[start])]
+    i = start + 1
+    while (
+        i + 1 < len(tokens) and tokens[i].text == "." and _is_identifier(tokens[i + 1])
+    ):
+        parts.append(identifier_name(tokens[i + 1]))
+        i += 2
+    return ".".join(parts), i
+
+
+def common_table_names(tokens: List[Token]) -> Set[str]:
+    """Collect the names defined by ``WITH name [(columns)] AS (...)`` clauses."""
+    names = set()
+    for i, token in enumerate(tokens):
+        if not _is_identifier(token) or i == 0:
+            continue
+        previous = tokens[i - 1].upper
+        if previous not in ("WITH", "RECURSIVE", ","):
+            continue
+        j = i + 1
+        if j < len(tokens) and tokens[j].text == "(":
+            depth = 0
+            while j < len(tokens):
+                if tokens[j].text == "(":
+                    depth += 1
+                elif tokens[j].text == ")":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                j += 1
+            j += 1
+        if (
+            j + 1 < len(tokens)
+            and tokens[j].upper == "AS"
+            and (
+                tokens[j + 1].text == "("
+                or tokens[j + 1].upper in ("MATERIALIZED", "NOT")
+            )
+        ):
+            names.add(identifier_name(token))
+    return names
+
+
+def referenced_tables(sql: Union[str, List[Token]]) -> Set[str]:
+    """Return the names of all relations a statement reads from.
+
+    Relations are collected from ``FROM`` lists and ``JOIN`` clauses, including
+    those of subqueries. Names defined by common table expressions, subqueries
+    and set-returning functions are not reported. Schema-qualified references are
+    returned in dotted ``schema.table`` form.
+
+    Args:
+        sql (str or list): The SQL text, or its tokens from :func:`tokenize_sql`.
+
+    Returns:
+        set: The referenced relation names.
+    """
+    tokens = tokenize_sql(sql) if isinstance(sql, str) else sql
+    ctes = common_table_names(tokens)
+    tables = set()
+
+    # Track whether each parenthesis level holds a query or an expression, so
+    # that e.g. EXTRACT(YEAR FROM col) is not mistaken for a FROM clause.
+    query_levels = [True]
+    in_from_list = [False]
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.text == "(":
+            following = tokens[i + 1].upper if i + 1 < len(tokens) else ""
+            query_levels.append(following in ("SELECT", "WITH", "VALUES"))
+            in_from_list.append(False)
+            i += 1
+            continue
+        if token.text == ")":
+            if len(query_levels) > 1:
+                query_levels.pop()
+                in_from_list.pop()
+            i += 1
+            continue
+        if not query_levels[-1]:
+            i += 1
+            continue
+
+        is_table_keyword = token.kind == "word" and token.upper in _TABLE_KEYWORDS
+        if is_table_keyword and i > 0 and tokens[i - 1].upper == "DISTINCT":
+            # IS [NOT] DISTINCT FROM is a comparison, not a FROM clause.
+            is_table_keyword = False
+        if token.kind == "word" and token.upper in _CLAUSE_KEYWORDS:
+            in_from_list[-1] = False
+        if token.text == "," and in_from_list[-1]:
+            is_table_keyword = True
+        if token.text == ";":
+            in_from_list[-1] = False
+
+        if is_table_keyword:
+            if token.upper == "FROM" or token.text == ",":
+                in_from_list[-1] = True
+            j = i + 1
+            while j < len(tokens) and tokens[j].upper in _TABLE_MODIFIERS:
+                j += 1
+            if j < len(tokens) and _is_identifier(tokens[j]):
+                name, end = _read_qualified_name(tokens, j)
+                is_function = end < len(tokens) and tokens[end].text == "("
+                if not is_function and name not in ctes:
+                    tables.add(name)
+                i = end
+                continue
+        i += 1
+    return tables
+
+
+def is_read_only_query(sql: Union[str, List[Token]]) -> bool:
+    """Return whether ``sql`` is a single statement that only reads data.
+
+    Args:
+        sql (str or list): The SQL text, or its tokens from :func:`tokenize_sql`.
+
+    Returns:
+        bool: True for a single SELECT/WITH/VALUES/TABLE statement without
+        data-modifying clauses.
+    """
+    tokens = tokenize_sql(sql) if isinstance(sql, str) else sql
+    while tokens and tokens[-1].text == ";":
+        tokens = tokens[:-1]
+    if not tokens or tokens[0].upper not in _READ_ONLY_STATEMENTS:
+        return False
+    for token in tokens:
+        if token.text == ";":
+            return False
+        if token.kind == "word" and token.upper in _WRITE_KEYWORDS:
+            return False
+    return True
+
+
+__all__ = [
+    "SQLLexerError",
+    "Token",
+    "tokenize_sql",
+    "identifier_name",
+    "common_table_names",
+    "referenced_tables",
+    "is_read_only_query",
+]
@@ -0,0 +1,192 @@
+from decimal import Decimal
+from typing import List, Optional, Tuple, Union
+
+from pipableai.core.sql_lexer import (
+    SQLLexerError,
+    Token,
+    is_read_only_query,
+    tokenize_sql,
+)
+
+# Keywords after which a literal is a plain value that a parameter can replace.
+_VALUE_KEYWORDS = {
+    "AND",
+    "OR",
+    "NOT",
+    "LIKE",
+    "ILIKE",
+    "IN",
+    "BETWEEN",
+    "WHEN",
+    "THEN",
+    "ELSE",
+    "IS",
+    "FROM",
+    "LIMIT",
+    "OFFSET",
+    "ANY",
+    "ALL",
+}
+
+# Type names whose parenthesized modifiers (e.g. numeric(10, 2)) must stay literal.
+_TYPE_NAMES = {
+    "BIT",
+    "CHAR",
+    "CHARACTER",
+    "DECIMAL",
+    "FLOAT",
+    "INTERVAL",
+    "NUMERIC",
+    "TIME",
+    "TIMESTAMP",
+    "VARBIT",
+    "VARCHAR",
+    "VARYING",
+}
+
+# Clauses in which a bare integer is a positional column reference.
+_POSITIONAL_CLAUSES = {"ORDER", "GROUP"}
+# Clauses whose literals, including those in function arguments, stay in place: a
+# GROUP BY expression must match its select list expression text for text.
+_STRUCTURAL_CLAUSES = {"SELECT", "GROUP", "ORDER"}
+_CLAUSE_KEYWORDS = {
+    "SELECT",
+    "FROM",
+    "WHERE",
+    "HAVING",
+    "LIMIT",
+    "OFFSET",
+    "UNION",
+    "INTERSECT",
+    "EXCEPT",
+    "WINDOW",
+    "FETCH",
+}
+
+Parameter = Union[int, Decimal, str]
+
+_INT4_MAX = 2**31 - 1
+_INT8_MAX = 2**63 - 1
+
+
+def _literal_value(token: Token) -> Parameter:
+    if token.kind == "string":
+        return token.text[1:-1].replace("''", "'")
+    text = token.text
+    if text.isdigit():
+        return int(text)
+    return Decimal(text)
+
+
+def _placeholder(index: int, value: Parameter) -> str:
+    """Return the placeholder of a parameter, cast to the type PostgreSQL gives its literal.
+
+    An untyped numeric parameter would take the type of the column it is compared with,
+    and `EXECUTE` would then round ``2.5`` for an integer column or reject a value out of
+    its range, where the literal compares as written. Strings stay untyped, as their
+    literals are.
+    """
+    if isinstance(value, str):
+        return f"${index}"
+    if isinstance(value, int) and value <= _INT4_MAX:
+        return f"${index}::integer"
+    if isinstance(value, int) and value <= _INT8_MAX:
+        return f"${index}::bigint"
+    return f"${index}::numeric"
+
+
+def _is_value_position(previous: Optional[Token]) -> bool:
+    if previous is None:
+        return False
+    if previous.kind == "operator":
+        return previous.text != "::"
+    if previous.kind == "punctuation":
+        return previous.text in ("(", ",", "[")
+    return previous.kind == "word" and previous.upper in _VALUE_KEYWORDS
+
+
+def parameterize_query(query: str) -> Optional[Tuple[str, List[Parameter]]]:
+    """Replace the literals of a read-only query with positional parameters.
+
+    Queries which only differ in their literal values map to the same parameterized
+    shape, so a single server-side prepared statement can serve all of them. Literals
+    which are part of the statement structure rather than values, such as typed literals
+    (``DATE '2020-01-01'``), type modifiers (``numeric(10, 2)``), positional ``ORDER BY``
+    and ``GROUP BY`` references, select list, ``GROUP BY`` and ``ORDER BY`` values including
+    function arguments (``DATE_TRUNC('month', day)``) and prefixed or dollar-quoted strings,
+    are left in place.
+
+    Args:
+        query (str): The SQL query to normalize.
+
+    Numeric placeholders are cast to the type of their literal, see `_placeholder`.
+
+    Returns:
+        tuple: The parameterized query using ``$1 .. $n`` placeholders and the list of
+        extracted parameter values, or None if the query is not a single read-only
+        statement or already uses placeholders.
+    """
+    try:
+        tokens = tokenize_sql(query)
+    except SQLLexerError:
+        return None
+    if not is_read_only_query(tokens):
+        return None
+    if any(token.kind == "parameter" for token in tokens):
+        return None
+
+    parts = []
+    params = []
+    cursor = 0
+    # One entry per parenthesis level: (current clause keyword, is a type modifier list)
+    levels = [("", False)]
+    for i, token in enumerate(tokens):
+        previous = tokens[i - 1] if i > 0 else None
+        clause, is_type_modifier = levels[-1]
+
+        if token.text == "(":
+            before = tokens[i - 2] if i > 1 else None
+            type_modifier = previous is not None and (
+                previous.upper in _TYPE_NAMES
+                or (before is not None and before.text == "::")
+            )
+            # Function arguments belong to the clause around them, a subquery starts its own
+            levels.append(
+                (clause if clause in _STRUCTURAL_CLAUSES else "", type_modifier)
+            )
+            continue
+        if token.text == ")":
+            if len(levels) > 1:
+                levels.pop()
+            continue
+        if token.kind == "word":
+            upper = token.upper
+            if upper in _POSITIONAL_CLAUSES or upper in _CLAUSE_KEYWORDS:
+                levels[-1] = (upper, is_type_modifier)
+            continue
+        if token.kind not in ("number", "string"):
+            continue
+        if token.kind == "string" and not token.text.startswith("'"):
+            continue
+        if is_type_modifier or not _is_value_position(previous):
+            continue
+        if clause in _STRUCTURAL_CLAUSES:
+            # Select list literals give PostgreSQL no context to infer a parameter type from,
+            # and GROUP BY and ORDER BY expressions must match them.
+            continue
+        if token.kind == "number" and (
+            previous.upper == "BY"
+            or (clause in _POSITIONAL_CLAUSES and previous.text == ",")
+        ):
+            continue
+
+        params.append(_literal_value(token))
+        parts.append(query[cursor : token.position])
+        parts.append(_placeholder(len(params), params[-1]))
+        cursor = token.position + len(token.text)
+
+    parts.append(query[cursor:])
+    return "".join(parts).strip(), params
+
+
+__all__ = ["parameterize_query"]
@@ -0,0 +1,510 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+from pipableai.core.sql_lexer import (
+    SQLLexerError,
+    Token,
+    common_table_names,
+    identifier_name,
+    referenced_tables,
+    tokenize_sql,
+)
+
+_CREATE_TABLE_PATTERN = re.compile(
+    r"CREATE TABLE\s+([\w.\"]+)\s*\((.*)\)\s*;?\s*$", re.IGNORECASE | re.DOTALL
+)
+
+# Leading keywords of the statements the LLM is expected to produce.
+_STATEMENT_KEYWORDS = {
+    "SELECT",
+    "WITH",
+    "VALUES",
+    "TABLE",
+    "INSERT",
+    "UPDATE",
+    "DELETE",
+    "EXPLAIN",
+}
+
+# Keywords after which an expression is required.
+_EXPRESSION_KEYWORDS = {
+    "SELECT",
+    "FROM",
+    "WHERE",
+    "AND",
+    "OR",
+    "NOT",
+    "ON",
+    "BY",
+    "HAVING",
+    "JOIN",
+    "LIMIT",
+    "OFFSET",
+}
+
+# Keywords, date/time field names and type names which may legitimately appear
+# in a query without being a column reference.
+_KEYWORDS = set("""
+    ALL AND ANY ARRAY AS ASC ASYMMETRIC AT BETWEEN BOTH BY CASE CAST COLLATE CROSS
+    CURRENT CURRENT_DATE CURRENT_ROLE CURRENT_TIME CURRENT_TIMESTAMP CURRENT_USER
+    DEFAULT DELETE DESC DISTINCT DO ELSE END ESCAPE EXCEPT EXCLUDE EXISTS EXPLAIN
+    FALSE FETCH FILTER FIRST FOLLOWING FOR FROM FULL GROUP GROUPING GROUPS HAVING
+    ILIKE IN INNER INSERT INTERSECT INTERVAL INTO IS ISNULL JOIN LAST LATERAL
+    LEADING LEFT LIKE LIMIT LOCALTIME LOCALTIMESTAMP MATERIALIZED NATURAL NEXT NO
+    NOT NOTNULL NULL NULLS OF OFFSET ON ONLY OR ORDER OTHERS OUTER OVER OVERLAPS
+    PARTITION PRECEDING RANGE RECURSIVE RETURNING RIGHT ROW ROWS SELECT SESSION_USER
+    SET SIMILAR SOME SYMMETRIC TABLE TIES THEN TO TRAILING TRUE UNBOUNDED UNION
+    UNKNOWN UPDATE USER USING VALUES WHEN WHERE WINDOW WITH WITHIN WITHOUT ZONE
+    PERCENT CENTURY DAY DAYS DECADE DOW DOY EPOCH HOUR HOURS ISODOW ISOYEAR
+    MICROSECONDS MILLENNIUM MILLISECONDS MINUTE MINUTES MONTH MONTHS QUARTER SECOND
+    SECONDS TIMEZONE WEEK WEEKS YEAR YEARS BIGINT BIGSERIAL BIT BOOL BOOLEAN BYTEA
+    CHAR CHARACTER DATE DECIMAL DOUBLE FLOAT FLOAT4 FLOAT8 INT INT2 INT4 INT8
+    INTEGER JSON JSONB MONEY NUMERIC PRECISION REAL SERIAL SMALLINT TEXT TIME
+    TIMESTAMP TIMESTAMPTZ TIMETZ UUID VARCHAR VARYING
+    """.split())
+
+# Keywords directly followed by a relation name, the ones read from and the target
+# of INSERT INTO and UPDATE.
+_RELATION_KEYWORDS = ("FROM", "JOIN", ",", "ONLY", "LATERAL", "INTO", "UPDATE")
+
+
+@dataclass
+class ValidationIssue:
+    """Data class describing a single problem found in a generated SQL query.
+
+    Args:
+        kind (str): One of ``syntax``, ``unknown_table`` or ``unknown_column``.
+        message (str): A human readable description of the problem.
+        position (int, optional): The character offset of the offending token.
+
+    Attributes:
+        kind (str): One of ``syntax``, ``unknown_table`` or ``unknown_column``.
+        message (str): A human readable description of the problem.
+        position (int, optional): The character offset of the offending token.
+    """
+
+    kind: str
+    message: str
+    position: Optional[int] = None
+
+
+class SQLValidationError(ValueError):
+    """Raised when a generated SQL query fails local validation.
+
+    Attributes:
+        query (str): The rejected SQL query.
+        issues (list): The `ValidationIssue` entries describing what is wrong.
+    """
+
+    def __init__(self, query: str, issues: List[ValidationIssue]):
+        self.query = query
+        self.issues = issues
+        details = "; ".join(issue.message for issue in issues)
+        super().__init__(f"Invalid SQL query: {details}")
+
+
+def catalog_from_create_statements(statements: Iterable[str]) -> Dict[str, Set[str]]:
+    """Build a table to column names mapping from CREATE TABLE statements.
+
+    Args:
+        statements (list): CREATE TABLE statements as generated by `Pipable`.
+
+    Returns:
+        dict: The column names of every table, keyed by table name.
+    """
+    catalog = {}
+    for statement in statements:
+        match = _CREATE_TABLE_PATTERN.match(statement.strip())
+        if not match:
+            continue
+        table_name = match.group(1).replace('"', "")
+        columns = set()
+        for column_def in match.group(2).split(","):
+            parts = column_def.split()
+            if parts:
+                columns.add(parts[0].strip('"'))
+        catalog[table_name] = columns
+    return catalog
+
+
+@dataclass
+class _Scope:
+    tables: Dict[str, Set[str]] = field(default_factory=dict)
+    aliases: Set[str] = field(default_factory=set)
+    opaque_aliases: Set[str] = field(default_factory=set)
+    has_opaque_source: bool = False
+
+
+class SQLValidator:
+    """Check generated SQL against the PostgreSQL dialect and a table catalog without a database round trip.
+
+    The validator tokenizes the query, performs structural syntax checks and verifies that
+    every referenced table, and every column it can attribute to a table, exists in the
+    catalog. With an empty catalog only the syntax checks are performed.
+
+    Args:
+        catalog (dict): Column names keyed by table name. Tables outside the default schema
+            are keyed by their ``schema.table`` name.
+
+    Example:
+        .. code-block:: python
+
+            validator = SQLValidator({"actor": {"actor_id", "first_name"}})
+            validator.check("SELECT last_name FROM actor")  # raises SQLValidationError
+
+    """
+
+    def __init__(self, catalog: Dict[str, Iterable[str]]):
+        """Initialize a SQLValidator instance.
+
+        Args:
+            catalog (dict): Column names keyed by table name.
+        """
+        self.catalog = {name: set(columns) for name, columns in catalog.items()}
+
+    @classmethod
+    def from_create_statements(cls, statements: Iterable[str]) -> "SQLValidator":
+        """Create a validator from CREATE TABLE statements.
+
+        Args:
+            statements (list): CREATE TABLE statements as generated by `Pipable`.
+
+        Returns:
+            SQLValidator: A validator for the described tables.
+        """
+        return cls(catalog_from_create_statements(statements))
+
+    def check(self, query: str):
+        """Validate a query and raise if it has any issue.
+
+        Args:
+            query (str): The SQL query to validate.
+
+        Raises:
+            SQLValidationError: If the query is invalid.
+        """
+        issues = self.validate(query)
+        if issues:
+            raise SQLValidationError(query, issues)
+
+    def validate(self, query: str) -> List[ValidationIssue]:
+        """Validate a query.
+
+        Args:
+            query (str): The SQL query to validate.
+
+        Returns:
+            list: The `ValidationIssue` entries found, empty if the query is valid.
+        """
+        try:
+            tokens = tokenize_sql(query)
+        except SQLLexerError as e:
+            return [ValidationIssue("syntax", str(e), e.position)]
+
+        issues = self._check_syntax(tokens)
+        if issues or not self.catalog:
+            return issues
+        return self._check_catalog(tokens)
+
+    def _check_syntax(self, tokens: List[Token]) -> List[ValidationIssue]:
+        if not tokens:
+            return [ValidationIssue("syntax", "Query is empty")]
+        first = tokens[0]
+        if first.upper not in _STATEMENT_KEYWORDS and first.text != "(":
+            return [
+                ValidationIssue(
+                    "syntax",
+                    f"Query must start with a SQL statement, not {first.text!r}",
+                    first.position,
+                )
+            ]
+
+        issues = []
+        depth = 0
+        for i, token in enumerate(tokens):
+            if token.text == "(":
+                depth += 1
+            elif token.text == ")":
+                depth -= 1
+                if depth < 0:
+                    issues.append(
+                        ValidationIssue("syntax", "Unbalanced ')'", token.position)
+                    )
+                    depth = 0
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+            if token.text == "," and (
+                following is None
+                or following.text in (")", ";")
+                or following.upper in ("FROM", "WHERE", "GROUP", "ORDER")
+            ):
+                issues.append(
+                    ValidationIssue(
+                        "syntax", "Expected an expression after ','", token.position
+                    )
+                )
+            if (
+                token.kind == "word"
+                and token.upper in _EXPRESSION_KEYWORDS
+                and (following is None or following.text in (")", ";", ","))
+            ):
+                issues.append(
+                    ValidationIssue(
+                        "syntax",
+                        f"Expected an expression after {token.upper}",
+                        token.position,
+                    )
+                )
+        if depth > 0:
+            issues.append(ValidationIssue("syntax", "Unbalanced '('"))
+        return issues
+
+    def _resolve_table(self, name: str) -> Optional[str]:
+        if name in self.catalog:
+            return name
+        if name.startswith("public.") and name[len("public.") :] in self.catalog:
+            return name[len("public.") :]
+        return None
+
+    @staticmethod
+    def _dml_targets(tokens: List[Token]) -> Set[str]:
+        """Return the tables written by ``INSERT INTO`` and ``UPDATE`` statements."""
+        targets = set()
+        for i, token in enumerate(tokens):
+            if token.upper == "INSERT" and i + 1 < len(tokens):
+                j = i + 1 if tokens[i + 1].upper != "INTO" else i + 2
+            elif token.upper == "UPDATE" and (i == 0 or tokens[i - 1].upper != "DO"):
+                j = i + 1
+            else:
+                continue
+            if j < len(tokens) and tokens[j].upper == "ONLY":
+                j += 1
+            parts = []
+            while j < len(tokens) and tokens[j].kind in ("word", "quoted_identifier"):
+                if tokens[j].kind == "word" and tokens[j].upper in _KEYWORDS:
+                    break
+                parts.append(identifier_name(tokens[j]))
+                if j + 2 < len(tokens) and tokens[j + 1].text == ".":
+                    j += 2
+                else:
+                    break
+            if parts:
+                targets.add(".".join(parts))
+        return targets
+
+    def _collect_scope(self, tokens: List[Token], table_refs: Set[str]) -> _Scope:
+        """Find table aliases, output column aliases and derived relations."""
+        scope = _Scope(aliases=common_table_names(tokens))
+        for name in table_refs:
+            resolved = self._resolve_table(name)
+            if resolved is not None:
+                scope.tables[name] = self.catalog[resolved]
+                scope.tables[name.split(".")[-1]] = self.catalog[resolved]
+
+        for i, token in enumerate(tokens):
+            if token.kind not in ("word", "quoted_identifier") or i == 0:
+                continue
+            if token.kind == "word" and token.upper in _KEYWORDS:
+                continue
+            previous = tokens[i - 1]
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+            if following is not None and following.text in (".", "("):
+                continue
+            explicit = previous.upper == "AS"
+            implicit = (
+                previous.kind in ("word", "quoted_identifier", "string", "number")
+                and not (previous.kind == "word" and previous.upper in _KEYWORDS)
+            ) or previous.text == ")"
+            if not (explicit or implicit):
+                continue
+
+            # Work out which relation, if any, the alias names.
+            j = i - 2 if explicit else i - 1
+            name = identifier_name(token)
+            if j >= 0 and tokens[j].text == ")":
+                scope.opaque_aliases.add(name)
+                scope.has_opaque_source = (
+                    scope.has_opaque_source or self._closes_from_item(tokens, j)
+                )
+                continue
+            start = j
+            while start >= 2 and tokens[start - 1].text == ".":
+                start -= 2
+            before = tokens[start - 1].upper if start >= 1 else ""
+            if before in _RELATION_KEYWORDS and j >= 0:
+                relation = ".".join(
+                    identifier_name(t) for t in tokens[start : j + 1 : 2]
+                )
+                if relation in scope.tables:
+                    scope.tables[name] = scope.tables[relation]
+                    continue
+            scope.aliases.add(name)
+
+        # Column lists of common table expressions: WITH name (a, b) AS (...)
+        for i, token in enumerate(tokens[:-1]):
+            if token.upper in ("WITH", "RECURSIVE", ",") and i + 2 < len(tokens):
+                if tokens[i + 2].text != "(":
+                    continue
+                j = i + 3
+                names = []
+                while j < len(tokens) and tokens[j].text != ")":
+                    if tokens[j].kind in ("word", "quoted_identifier"):
+                        names.append(identifier_name(tokens[j]))
+                    j += 1
+                if j + 1 < len(tokens) and tokens[j + 1].upper == "AS":
+                    scope.aliases.update(names)
+        return scope
+
+    @staticmethod
+    def _closes_from_item(tokens: List[Token], close_index: int) -> bool:
+        """Return whether the group closed at ``close_index`` is a subquery or function in FROM."""
+        depth = 0
+        for k in range(close_index, -1, -1):
+            if tokens[k].text == ")":
+                depth += 1
+            elif tokens[k].text == "(":
+                depth -= 1
+                if depth == 0:
+                    before = tokens[k - 1] if k >= 1 else None
+                    if (
+                        before is not None
+                        and before.kind == "word"
+                        and before.upper not in _KEYWORDS
+                    ):
+                        # A function call; look one token further back.
+                        before = tokens[k - 2] if k >= 2 else None
+                    return before is not None and before.upper in (
+                        "FROM",
+                        "JOIN",
+                        ",",
+                        "LATERAL",
+                    )
+        return False
+
+    def _check_catalog(self, tokens: List[Token]) -> List[ValidationIssue]:
+        issues = []
+        targets = self._dml_targets(tokens)
+        table_refs = referenced_tables(tokens) | targets
+        unknown_tables = set()
+        for name in sorted(table_refs):
+            if self._resolve_table(name) is None:
+                unknown_tables.add(name)
+                issues.append(
+                    ValidationIssue("unknown_table", f"Table {name} does not exist")
+                )
+
+        scope = self._collect_scope(tokens, table_refs)
+        for target in targets:
+            if target in scope.tables:
+                # INSERT ... ON CONFLICT DO UPDATE refers to the proposed row as EXCLUDED
+                scope.tables["excluded"] = scope.tables[target]
+        known_columns = set()
+        for columns in scope.tables.values():
+            known_columns.update(columns)
+
+        for i, token in enumerate(tokens):
+            if token.kind not in ("word", "quoted_identifier"):
+                continue
+            previous = tokens[i - 1] if i >= 1 else None
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+
+            # Qualified reference: qualifier.column
+            if previous is not None and previous.text == "." and i >= 2:
+                qualifier_start = i - 2
+                while qualifier_start >= 2 and tokens[qualifier_start - 1].text == ".":
+                    qualifier_start -= 2
+                if (
+                    qualifier_start >= 1
+                    and tokens[qualifier_start - 1].upper in _RELATION_KEYWORDS
+                    and (following is None or following.text != ".")
+                ):
+                    # Part of a table reference, already checked.
+                    continue
+                if following is not None and following.text in (".", "("):
+                    continue
+                qualifier = ".".join(
+                    identifier_name(t) for t in tokens[qualifier_start : i - 1 : 2]
+                )
+                if (
+                    token.text == "*"
+                    or qualifier in scope.aliases | scope.opaque_aliases
+                ):
+                    continue
+                if qualifier in unknown_tables:
+                    continue
+                columns = scope.tables.get(qualifier)
+                if columns is None:
+                    issues.append(
+                        ValidationIssue(
+                            "unknown_table",
+                            f"Missing FROM-clause entry for {qualifier}",
+                            tokens[qualifier_start].position,
+                        )
+                    )
+                elif identifier_name(token) not in columns:
+                    issues.append(
+                        ValidationIssue(
+                            "unknown_column",
+                            f"Column {qualifier}.{identifier_name(token)} does not exist",
+                            token.position,
+                        )
+                    )
+                continue
+
+            # Unqualified reference
+            if unknown_tables or scope.has_opaque_source:
+                continue
+            if token.kind == "word" and token.upper in _KEYWORDS:
+                continue
+            if following is not None and following.text in (".", "("):
+                continue
+            if previous is not None and (
+                previous.text == "::"
+                or previous.upper == "AS"
+                or previous.upper
+                in ("FROM", "JOIN", "ONLY", "LATERAL", "INTO", "UPDATE")
+                or (previous.text == "," and self._in_from_list(tokens, i))
+            ):
+                continue
+            name = identifier_name(token)
+            if (
+                name in known_columns
+                or name in scope.aliases
+                or name in scope.opaque_aliases
+                or name in scope.tables
+            ):
+                continue
+            issues.append(
+                ValidationIssue(
+                    "unknown_column", f"Column {name} does not exist", token.position
+                )
+            )
+        return issues
+
+    @staticmethod
+    def _in_from_list(tokens: List[Token], index: int) -> bool:
+        """Return whether the token at ``index`` follows a comma inside a FROM list."""
+        depth = 0
+        for k in range(index - 1, -1, -1):
+            text = tokens[k].text
+            if text == ")":
+                depth += 1
+            elif text == "(":
+                if depth == 0:
+                    return False
+                depth -= 1
+            elif depth == 0 and tokens[k].kind == "word":
+                upper = tokens[k].upper
+                if upper == "FROM":
+                    return True
+                if upper in ("SELECT", "WHERE", "GROUP", "ORDER", "HAVING", "SET"):
+                    return False
+        return False
+
+
+__all__ = [
+    "ValidationIssue",
+    "SQLValidationError",
+    "SQLValidator",
+    "catalog_from_create_statements",
+]
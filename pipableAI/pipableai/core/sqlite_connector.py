@@ -0,0 +1,148 @@
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from pandas import DataFrame
+
+from pipableai.core.result_materializer import check_result_format, convert_dataframe
+from pipableai.interfaces.database_connector_interface import DatabaseConnectorInterface
+
+
+@dataclass
+class SQLiteConfig:
+    """Data class for SQLite connection configuration.
+
+    Args:
+        database (str): Path to the SQLite database file, or ":memory:" for an in-memory database.
+
+    Attributes:
+        database (str): Path to the SQLite database file, or ":memory:" for an in-memory database.
+    """
+
+    database: str = ":memory:"
+
+
+class SQLiteConnector(DatabaseConnectorInterface):
+    """A class for querying an embedded SQLite database.
+
+    This class uses the standard library `sqlite3` module, so it needs no extra dependency.
+    It is mostly useful as a local extract store for
+    :class:`~pipableai.core.cached_connector.CachedConnector` and for tests.
+
+    Args:
+        config (SQLiteConfig): The configuration for opening the SQLite database.
+
+    Attributes:
+        config (SQLiteConfig): The configuration for opening the SQLite database.
+        connection (sqlite3.Connection): The connection to the SQLite database.
+        cursor (sqlite3.Cursor): The cursor for executing SQL queries.
+
+    Raises:
+        ConnectionError: If the database cannot be opened.
+        ValueError: If an error occurs during query execution.
+
+    Example:
+        .. code-block:: python
+
+            from pipableai.core.sqlite_connector import SQLiteConfig, SQLiteConnector
+
+            connector = SQLiteConnector(SQLiteConfig(database="reference.db"))
+            connector.connect()
+            result = connector.execute_query("SELECT * FROM regions")
+
+    """
+
+    def __init__(self, config: SQLiteConfig):
+        """Initialize a SQLiteConnector instance.
+
+        Args:
+            config (SQLiteConfig): The configuration for opening the SQLite database.
+        """
+        self.config = config
+        self.connection = None
+        self.cursor = None
+
+    def connect(self):
+        """Open the SQLite database."""
+        try:
+            self.connection = sqlite3.connect(
+                self.config.database, check_same_thread=False
+            )
+            self.cursor = self.connection.cursor()
+        except sqlite3.Error as e:
+            raise ConnectionError(f"Failed to open the SQLite database: {str(e)}")
+
+    def disconnect(self):
+        """Close the SQLite database."""
+        if self.cursor:
+            self.cursor.close()
+        if self.connection:
+            self.connection.close()
+
+    def execute_query(
+        self, query: str, timeout: Optional[float] = None, result_format: str = "pandas"
+    ) -> DataFrame:
+        """Execute an SQL query on the SQLite database and return the result as
+        a Pandas DataFrame.
+
+        Statements that return no rows are committed and yield an empty DataFrame.
+
+        Args:
+            query (str): The SQL query to execute.
+            timeout (float, optional): Seconds the query may run before it is interrupted.
+                Defaults to None, no limit.
+            result_format (str, optional): "pandas", "arrow" for a `pyarrow.Table` or "polars"
+                for a `polars.DataFrame`. Defaults to "pandas".
+
+        Returns:
+            DataFrame: A Pandas DataFrame representing the query results, or the Arrow table or
+            Polars DataFrame requested by `result_format`.
+
+        Raises:
+            ValueError: If an error occurs during query execution.
+            TimeoutError: If the query was interrupted because it ran longer than `timeout`.
+        """
+        check_result_format(result_format)
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+            # Called every few thousand virtual machine instructions, interrupts the query
+            # once it returns True
+            self.connection.set_progress_handler(
+                lambda: time.monotonic() > deadline, 1000
+            )
+        try:
+            self.cursor.execute(query)
+            if self.cursor.description is None:
+                self.connection.commit()
+                return convert_dataframe(DataFrame(), result_format)
+            columns = [desc[0] for desc in self.cursor.description]
+            data = self.cursor.fetchall()
+            return convert_dataframe(DataFrame(data, columns=columns), result_format)
+        except sqlite3.Error as e:
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"SQL query exceeded its {timeout:.3f}s timeout")
+            raise ValueError(f"SQL query execution error: {e}")
+        finally:
+            if deadline is not None:
+                self.connection.set_progress_handler(None, 0)
+
+    def load_dataframe(self, table_name: str, df: DataFrame):
+        """Create or replace a table with the contents of a DataFrame.
+
+        Args:
+            table_name (str): The name of the table to (re)create.
+            df (DataFrame): The rows to store.
+
+        Raises:
+            ValueError: If the table cannot be written.
+        """
+        try:
+            df.to_sql(table_name, self.connection, if_exists="replace", index=False)
+            self.connection.commit()
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            raise ValueError(f"Failed to load table {table_name}: {e}")
+
+
+__all__ = ["SQLiteConfig", "SQLiteConnector"]
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Optional
 
 from pandas import DataFrame
 
@@ -15,7 +16,8 @@ class DatabaseConnectorInterface(ABC):
     Methods:
         - connect(): Establish a connection to the database.
         - disconnect(): Close the connection to the database.
-        - execute_query(query: str) -> DataFrame: Execute an SQL query and return the result as a Pandas DataFrame.
+        - execute_query(query: str, timeout: Optional[float] = None, result_format: str = "pandas")
+          -> DataFrame: Execute an SQL query and return the result as a Pandas DataFrame.
 
     Example:
         To create a custom database connector, inherit from this class and provide implementations
@@ -55,15 +57,22 @@ class DatabaseConnectorInterface(ABC):
         pass
 
     @abstractmethod
-    def execute_query(self, query: str) -> DataFrame:
+    def execute_query(
+        self, query: str, timeout: Optional[float] = None, result_format: str = "pandas"
+    ) -> DataFrame:
         """Execute an SQL query on the connected database and return the result as
         a Pandas DataFrame.
 
         Args:
             query (str): The SQL query to execute.
+            timeout (float, optional): Seconds the query may run before it is cancelled
+                with a TimeoutError. Defaults to None, no limit.
+            result_format (str, optional): "pandas", "arrow" for a `pyarrow.Table` or "polars"
+                for a `polars.DataFrame`. Defaults to "pandas".
 
         Returns:
-            DataFrame: A Pandas DataFrame representing the query results.
+            DataFrame: A Pandas DataFrame representing the query results, or the Arrow table or
+            Polars DataFrame requested by `result_format`.
         """
         pass
 
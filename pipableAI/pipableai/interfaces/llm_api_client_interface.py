@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Optional
 
 
 class LlmApiClientInterface(ABC):
@@ -32,12 +33,16 @@ class LlmApiClientInterface(ABC):
     """
 
     @abstractmethod
-    def generate_text(self, context: str, question: str) -> str:
+    def generate_text(
+        self, context: str, question: str, deadline: Optional[float] = None
+    ) -> str:
         """Generate text based on the given context and question.
 
         Args:
             context (str): The context for text generation.
             question (str): The question to be answered in the generated text.
+            deadline (float, optional): The `time.time()` after which the caller no longer
+                wants the answer. Implementations raise TimeoutError once it has passed.
 
         Returns:
             str: The generated text.
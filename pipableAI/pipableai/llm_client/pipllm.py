@@ -1,8 +1,12 @@
 import json
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
 
 import requests
 
 from pipableai.core.dev_logger import dev_logger
+from pipableai.llm_client import transport as wire
 from pipableai.interfaces.llm_api_client_interface import LlmApiClientInterface
 
 
@@ -15,6 +19,15 @@ class PipLlmApiClient(LlmApiClientInterface):
 
     Args:
         api_base_url (str): The base URL of the Language Model API.
+        max_retries (int, optional): How many times a request rejected with 429 or 503 is retried. Defaults to 3.
+        max_retry_after (float, optional): The longest wait, in seconds, accepted from a Retry-After header.
+            Longer waits fail the request right away. Defaults to 30.
+        client_id (str, optional): Sent as the X-Client-Id header, which the server uses for its
+            per-client concurrency limit. Defaults to None, the server then uses the client address.
+        transport (str, optional): "json" sends plain JSON bodies. "auto" sends msgpack bodies when the
+            `msgpack` package is installed and compresses large bodies with zstd, or gzip without the
+            `zstandard` package, and asks for responses in the same formats. Servers which do not
+            support them get JSON again. Defaults to "json".
 
     Attributes:
         api_base_url (str): The base URL of the Language Model API.
@@ -42,28 +55,60 @@ class PipLlmApiClient(LlmApiClientInterface):
         requests.exceptions.RequestException: If there is an issue with the API request.
     """
 
-    def __init__(self, api_base_url: str):
+    RETRY_STATUS_CODES = (429, 503)
+    # Seconds left until the caller's deadline, the server stops generating once they are spent
+    DEADLINE_HEADER = "X-Request-Timeout"
+
+    def __init__(
+        self,
+        api_base_url: str,
+        max_retries: int = 3,
+        max_retry_after: float = 30,
+        client_id: str = None,
+        transport: str = "json",
+    ):
         """Initialize a PipLlmApiClient instance.
 
         Args:
             api_base_url (str): The base URL of the Language Model API.
+            max_retries (int, optional): How many times a rejected request is retried. Defaults to 3.
+            max_retry_after (float, optional): The longest Retry-After wait accepted, in seconds. Defaults to 30.
+            client_id (str, optional): Sent as the X-Client-Id header. Defaults to None.
+            transport (str, optional): "json" or "auto", see the class documentation. Defaults to "json".
+
+        Raises:
+            ValueError: If transport is not "json" or "auto".
         """
+        if transport not in ("json", "auto"):
+            raise ValueError(f"transport must be 'json' or 'auto', not {transport!r}")
         self.api_base_url = api_base_url
-
-    def generate_text(self, context: str, question: str) -> str:
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self.client_id = client_id
+        self.transport = transport
+        # Cleared when the server turns down binary bodies
+        self._negotiate = transport == "auto"
+        self.logger = dev_logger()
+
+    def generate_text(self, context: str, question: str, deadline: Optional[float] = None) -> str:
         """Generate an SQL query based on contextual information and user query.
 
         Args:
             context (str): The context or CREATE TABLE statements for the query.
             question (str): The user's query in simple English.
+            deadline (float, optional): The `time.time()` after which the answer is no longer wanted.
+                The time left is sent to the server, which stops generating when it runs out.
 
         Returns:
             str: The generated SQL query.
+
+        Raises:
+            TimeoutError: If the deadline passed before the server answered.
         """
         endpoint = "/generate"
         url = self.api_base_url + endpoint
         data = {"context": context, "question": question}
-        response = self._make_post_request(url, data)
+        response = self._make_post_request(url, data, deadline)
         return response.get("output")
 
     def train_llm(self, dataset_path: str):
@@ -81,26 +126,126 @@ class PipLlmApiClient(LlmApiClientInterface):
         response = self._make_post_request(url, data)
         return response
     
-    def _make_post_request(self, url, data):
+    def _make_post_request(self, url, data, deadline=None):
         """Make a POST request to the specified URL with the provided data.
 
         Args:
             url (str): The URL to make the POST request to.
             data (dict): The data to send with the POST request.
+            deadline (float, optional): The `time.time()` after which the request is abandoned.
 
         Returns:
             dict: The JSON response from the API.
 
         Raises:
             requests.exceptions.RequestException: If there is an issue with the API request.
+            TimeoutError: If the deadline passed before the server answered.
         """
 
+        headers = {}
+        if self.client_id is not None:
+            headers["X-Client-Id"] = self.client_id
+
         try:
-            response = requests.post(url, json=data)
+            for attempt in range(self.max_retries + 1):
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        raise TimeoutError("The request deadline has passed.")
+                    headers[self.DEADLINE_HEADER] = f"{timeout:.3f}"
+                response = self._send(url, data, headers, timeout)
+                if response.status_code == 504 and deadline is not None:
+                    raise TimeoutError("The server gave up on the request at its deadline.")
+                if response.status_code not in self.RETRY_STATUS_CODES or attempt == self.max_retries:
+                    break
+                # The server is overloaded or draining, wait as long as it asks before retrying
+                retry_after = self._retry_after(response)
+                if retry_after is None or retry_after > self.max_retry_after:
+                    break
+                if deadline is not None and time.time() + retry_after >= deadline:
+                    break
+                self.logger.info(f"Server answered {response.status_code}, retrying in {retry_after}s.")
+                time.sleep(retry_after)
             response.raise_for_status()
-            return response.json()
+            return self._decode_response(response)
+        except requests.exceptions.Timeout as e:
+            if deadline is not None:
+                raise TimeoutError(f"The request deadline passed: {str(e)}")
+            raise Exception(f"Error making POST request: {str(e)}")
         except requests.exceptions.RequestException as e:
             raise Exception(f"Error making POST request: {str(e)}")
 
+    def _send(self, url, data, headers, timeout):
+        """Send one POST request, in the negotiated format.
+
+        Args:
+            url (str): The URL to make the POST request to.
+            data (dict): The data to send with the POST request.
+            headers (dict): Extra request headers.
+            timeout (float): Seconds to wait for the response, or None.
+
+        Returns:
+            requests.Response: The response.
+        """
+        if self._negotiate:
+            body, body_headers = wire.encode_request(data, wire.content_types()[0])
+            kwargs = {"data": body, "headers": {**headers, **body_headers, **wire.accept_headers()}}
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            response = requests.post(url, **kwargs)
+            if response.status_code != 415:
+                return response
+            # The server predates binary transport, talk JSON to it from now on
+            self.logger.info("Server does not accept binary bodies, falling back to JSON.")
+            self._negotiate = False
+
+        kwargs = {"json": data}
+        if headers:
+            kwargs["headers"] = headers
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        return requests.post(url, **kwargs)
+
+    def _decode_response(self, response):
+        """Decode a response body, which is JSON unless binary transport was negotiated.
+
+        Args:
+            response (requests.Response): A successful response.
+
+        Returns:
+            dict: The decoded body.
+        """
+        if self.transport == "json":
+            return response.json()
+        body = response.content
+        encoding = response.headers.get("Content-Encoding")
+        if encoding:
+            body = wire.decompress(body, encoding)
+        return wire.deserialize(body, response.headers.get("Content-Type", wire.JSON))
+
+    @staticmethod
+    def _retry_after(response):
+        """Read the Retry-After header of a response.
+
+        Args:
+            response (requests.Response): A 429 or 503 response.
+
+        Returns:
+            float: The seconds to wait, or None when the header is missing or invalid.
+        """
+        value = response.headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, retry_at.timestamp() - time.time())
+
 
 __all__ = ["PipLlmApiClient"]
@@ -0,0 +1,138 @@
+import gzip
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+GZIP = "gzip"
+ZSTD = "zstd"
+
+# Bodies smaller than this are sent uncompressed, compressing them costs more than it saves
+MIN_COMPRESS_BYTES = 1024
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def content_types():
+    """Return the content types this installation can serialize, most compact first.
+
+    Returns:
+        list: `MSGPACK` when the `msgpack` package is installed, and always `JSON`.
+    """
+    return ([MSGPACK] if msgpack is not None else []) + [JSON]
+
+
+def content_encodings():
+    """Return the compressions this installation supports, best first.
+
+    Returns:
+        list: `ZSTD` when the `zstandard` package is installed, and always `GZIP`.
+    """
+    return ([ZSTD] if zstandard is not None else []) + [GZIP]
+
+
+def serialize(data, content_type: str) -> bytes:
+    """Serialize a request or response body.
+
+    Args:
+        data: The JSON compatible body.
+        content_type (str): `JSON` or `MSGPACK`.
+
+    Returns:
+        bytes: The serialized body.
+    """
+    if content_type == MSGPACK:
+        return msgpack.packb(data, use_bin_type=True)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def deserialize(body: bytes, content_type: str):
+    """Deserialize a body serialized by `serialize`.
+
+    Args:
+        body (bytes): The serialized body.
+        content_type (str): The media type of the body, parameters such as charset are ignored.
+
+    Returns:
+        The deserialized body.
+    """
+    if content_type.split(";")[0].strip() == MSGPACK:
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a serialized body with `ZSTD` or `GZIP`."""
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return gzip.compress(body, compresslevel=5)
+
+
+def decompress(body: bytes, encoding: str) -> bytes:
+    """Decompress a body compressed by `compress`.
+
+    HTTP libraries may already have decoded the body, so bodies which are not
+    compressed with `encoding` are returned unchanged.
+    """
+    if encoding == ZSTD and body.startswith(_ZSTD_MAGIC):
+        # Streaming frames do not record their size, decompressobj handles both kinds
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    if encoding == GZIP and body.startswith(b"\x1f\x8b"):
+        return gzip.decompress(body)
+    return body
+
+
+def encode_request(
+    data, content_type: str, min_compress_bytes: int = MIN_COMPRESS_BYTES
+):
+    """Serialize and, when it is large enough, compress a request body.
+
+    Args:
+        data: The JSON compatible body.
+        content_type (str): `JSON` or `MSGPACK`.
+        min_compress_bytes (int, optional): Smallest body that is compressed. Defaults to 1024.
+
+    Returns:
+        tuple: The body bytes and the Content-Type and Content-Encoding headers.
+    """
+    body = serialize(data, content_type)
+    headers = {"Content-Type": content_type}
+    if len(body) >= min_compress_bytes:
+        encoding = content_encodings()[0]
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+def accept_headers():
+    """Return the Accept and Accept-Encoding headers advertising what this installation decodes."""
+    accept = ", ".join(
+        content_type if content_type == MSGPACK else f"{content_type};q=0.9"
+        for content_type in content_types()
+    )
+    return {"Accept": accept, "Accept-Encoding": ", ".join(content_encodings())}
+
+
+__all__ = [
+    "JSON",
+    "MSGPACK",
+    "GZIP",
+    "ZSTD",
+    "content_types",
+    "content_encodings",
+    "serialize",
+    "deserialize",
+    "compress",
+    "decompress",
+    "encode_request",
+    "accept_headers",
+]
@@ -1,8 +1,14 @@
-from typing import List, Optional
+import threading
+import time
+from typing import Callable, List, Optional
 
 from pandas import DataFrame
 
 from pipableai.core.dev_logger import dev_logger
+from pipableai.core.result_materializer import check_result_format
+from pipableai.core.schema_catalog import DEFAULT_SCHEMA, SchemaCatalog
+from pipableai.core.schema_serializer import SchemaSerializer
+from pipableai.core.sql_validator import SQLValidationError, SQLValidator
 from pipableai.interfaces.database_connector_interface import DatabaseConnectorInterface
 from pipableai.interfaces.llm_api_client_interface import LlmApiClientInterface
 
@@ -19,35 +25,136 @@ class Pipable:
         connection: The connection object to the remote PostgreSQL server.
         logger: The logger object for logging messages and errors.
         all_table_queries (list): A list to store CREATE TABLE queries for all tables in the database.
+        validate_sql (bool): Whether generated queries are validated locally before they are executed.
+        max_regenerations (int): How many times an invalid generated query is sent back to the language model.
+        schemas (list): The schemas whose tables form the default query context.
+        catalog (SchemaCatalog): The lazily populated CREATE TABLE statements of each schema.
+        schema_serializer (SchemaSerializer): Builds the compact, token-budgeted query context, or None
+            to send the CREATE TABLE statements unchanged.
     """
 
     def __init__(
         self,
         database_connector: DatabaseConnectorInterface,
         llm_api_client: LlmApiClientInterface,
+        validate_sql: bool = True,
+        max_regenerations: int = 0,
+        schemas: Optional[List[str]] = None,
+        connector_factory: Optional[Callable[[], DatabaseConnectorInterface]] = None,
+        max_cached_schemas: int = 32,
+        compact_schema: bool = True,
+        max_context_tokens: Optional[int] = None,
+        token_counter: Optional[Callable[[str], int]] = None,
+        deduplicate_schema: bool = False,
     ):
         """Initialize a Pipable instance.
 
         Args:
             database_connector (DatabaseConnectorInterface): The configuration for connecting to the PostgreSQL server.
             llm_api_client (LlmApiClientInterface): The API client for generating SQL queries using the language model.
+            validate_sql (bool, optional): Whether `ask_and_execute` checks the generated query against the
+                PostgreSQL syntax and the table catalog before executing it. Defaults to True.
+            max_regenerations (int, optional): How many times an invalid generated query is sent back to the
+                language model, together with the validation errors, before giving up. Defaults to 0.
+            schemas (list, optional): The schemas whose tables form the default query context.
+                Defaults to ["public"]. Tables of other schemas can be referenced as ``schema.table``
+                in `table_names`; their schema is introspected on first use.
+            connector_factory (callable, optional): Creates additional connectors to the same database,
+                used to introspect several schemas in parallel.
+            max_cached_schemas (int, optional): The maximum number of schemas kept in the catalog.
+                The least recently used schemas outside `schemas` are evicted first. Defaults to 32.
+            compact_schema (bool, optional): Whether the query context is sent in the compact form of
+                `SchemaSerializer`, with short type names. Defaults to True.
+            max_context_tokens (int, optional): The token budget of the query context. The tables most
+                relevant to the question are kept when all of them do not fit. Defaults to None, no limit.
+            token_counter (callable, optional): Counts the tokens of a text for `max_context_tokens`,
+                e.g. with the tokenizer of the model. Defaults to about four characters per token.
+            deduplicate_schema (bool, optional): Whether tables with the same columns as an earlier
+                table are sent as ``CREATE TABLE name (LIKE earlier)``. Only servers which expand LIKE
+                column lists understand this context. Defaults to False.
         """
         self.database_connector = database_connector
         self.llm_api_client = llm_api_client
+        self.validate_sql = validate_sql
+        self.max_regenerations = max_regenerations
         self.connected = False
         self.connection = None
         self.logger = dev_logger()
         self.logger.info("logger initialized in Pipable")
+        self.schemas = list(schemas) if schemas else [DEFAULT_SCHEMA]
+        self.catalog = SchemaCatalog(
+            database_connector,
+            connector_factory=connector_factory,
+            max_schemas=max_cached_schemas,
+            pinned_schemas=self.schemas,
+        )
+        self.schema_serializer = None
+        if compact_schema or max_context_tokens is not None or deduplicate_schema:
+            self.schema_serializer = SchemaSerializer(
+                max_context_tokens, token_counter, deduplicate=deduplicate_schema
+            )
         self.all_table_queries = self._generate_create_table_statements()
+        self._refresh_thread = None
+        self._refresh_stop = threading.Event()
+
+    def _build_context(self, create_table_statements, question):
+        """Join CREATE TABLE statements into the query context sent to the language model."""
+        if self.schema_serializer is None:
+            return ";".join(create_table_statements)
+        return self.schema_serializer.serialize(create_table_statements, question)
 
-    def _generate_sql_query(self, context, question):
+    def _generate_sql_query(self, context, question, deadline=None):
         self.logger.info("generating query using llm")
-        generated_text = self.llm_api_client.generate_text(context, question)
+        if deadline is None:
+            generated_text = self.llm_api_client.generate_text(context, question)
+        else:
+            generated_text = self.llm_api_client.generate_text(
+                context, question, deadline=deadline
+            )
         if not generated_text:
-            self.logger.error(f"LLM failed to generate a SQL query: {e}")
+            self.logger.error("LLM failed to generate a SQL query.")
             raise ValueError("LLM failed to generate a SQL query.")
         return generated_text.strip()
 
+    def _generate_valid_sql_query(
+        self, context, question, create_table_statements, deadline=None
+    ):
+        """Generate an SQL query and validate it locally, regenerating it on failure.
+
+        Raises:
+            SQLValidationError: If the query is still invalid after `max_regenerations` attempts.
+        """
+        sql_query = self._generate_sql_query(context, question, deadline)
+        if not self.validate_sql:
+            return sql_query
+
+        validator = SQLValidator.from_create_statements(create_table_statements)
+        for attempt in range(self.max_regenerations + 1):
+            issues = validator.validate(sql_query)
+            if not issues:
+                return sql_query
+            error = SQLValidationError(sql_query, issues)
+            self.logger.warning(f"Generated query failed validation: {str(error)}")
+            if attempt == self.max_regenerations:
+                raise error
+            feedback = (
+                f"{question} The query {sql_query} is invalid ({str(error)}), "
+                "write a corrected one."
+            )
+            sql_query = self._generate_sql_query(context, feedback, deadline)
+
+    @staticmethod
+    def _remaining_seconds(deadline):
+        """Return the seconds left until a `time.time()` deadline.
+
+        Raises:
+            TimeoutError: If the deadline has already passed.
+        """
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise TimeoutError("The deadline passed before the query was executed.")
+        return remaining
+
     def connect(self):
         """Establish a connection to the Database server.
 
@@ -70,6 +177,8 @@ class Pipable:
 
         This method closes the connection to the remote PostgreSQL server.
         """
+        self.stop_schema_refresh()
+        self.catalog.close()
         if self.connected:
             try:
                 self.database_connector.disconnect()
@@ -84,59 +193,101 @@ class Pipable:
         """
         Generate CREATE TABLE statements for the specified tables or all tables.
 
+        Statements are served from the schema catalog, which introspects a schema the first
+        time one of its tables is requested.
+
         Parameters:
-            table_names (list, optional): The list of table names for the query context.
-                If not provided, it will be auto-generated.
+            table_names (list, optional): The list of table names for the query context,
+                optionally qualified as ``schema.table``. Unqualified names are looked up in
+                `schemas`. If not provided, all tables of `schemas` are used.
 
         Returns:
             list: A list of CREATE TABLE statements.
         """
         self.connect()
-        # Check if specific table names are provided, else get all tables
-        if table_names is not None and len(table_names) > 0:
-            tables_to_fetch = ",".join([f"'{table}'" for table in table_names])
-            where_clause = f"WHERE table_name IN ({tables_to_fetch})"
-        else:
-            where_clause = "WHERE table_schema = 'public'"
+        if table_names is None or len(table_names) == 0:
+            return self.catalog.statements(self.schemas)
+
+        statements = self.catalog.table_statements(table_names, self.schemas)
+        # If none of the table_names tables exists in the database
+        if not statements:
+            self.logger.warning(f"None of the tables:{table_names} exists in database")
+        return statements
+
+    def refresh_schema(
+        self, database_connector: Optional[DatabaseConnectorInterface] = None
+    ) -> List[str]:
+        """Bring the table catalog up to date, re-introspecting only the tables that changed.
 
-        # SQL query to extract column names and data types
-        column_info_query = f"""
-        SELECT table_name, column_name, data_type
-        FROM information_schema.columns
-        {where_clause};
+        Changes are detected from the xmin of each table's `pg_class` and `pg_attribute` rows,
+        which every DDL statement rewrites, against the fingerprints recorded when each schema was
+        loaded into the catalog.
+
+        Args:
+            database_connector (DatabaseConnectorInterface, optional): The connector used for
+                the catalog queries. Defaults to the connector of this instance.
+
+        Returns:
+            list: The names of the tables which were added, altered or dropped.
         """
+        if database_connector is None:
+            self.connect()
+        changed = self.catalog.refresh(database_connector)
+        if changed:
+            self.all_table_queries = self.catalog.statements(self.schemas)
+        return changed
 
-        try:
-            # Execute the SQL query using the database connector and get the result as DataFrame
-            column_info_df = self.database_connector.execute_query(column_info_query)
-
-            # If none of the table_names tables exists in the database
-            if column_info_df.shape[0] == 0:
-                self.logger.warn(f"None of the tables:{table_names} exists in database")
-                return []
-
-            # Group column info by table name using Pandas groupby
-            grouped_columns = column_info_df.groupby("table_name").apply(
-                lambda x: ", ".join(
-                    [
-                        f"{row['column_name']} {row['data_type']}"
-                        for _, row in x.iterrows()
-                    ]
-                )
-            )
+    def start_schema_refresh(
+        self,
+        database_connector: DatabaseConnectorInterface,
+        interval_seconds: float = 60.0,
+    ):
+        """Keep the table catalog up to date from a background thread.
 
-            # Generate CREATE TABLE statements in Python
-            return [
-                f"CREATE TABLE {table_name} ({columns})"
-                for table_name, columns in grouped_columns.items()
-            ]
+        The catalog queries run on their own connector, so requests never wait on them.
 
-        except Exception as e:
-            self.logger.error(f"Error generating CREATE TABLE statements: {str(e)}")
-            raise ValueError(f"Error generating CREATE TABLE statements: {str(e)}")
+        Args:
+            database_connector (DatabaseConnectorInterface): A dedicated connector to the same
+                database, used only by the background thread.
+            interval_seconds (float, optional): Seconds between two change checks. Defaults to 60.
+        """
+        if self._refresh_thread is not None:
+            return
+
+        def refresh_loop():
+            try:
+                database_connector.connect()
+                self.refresh_schema(database_connector)
+                while not self._refresh_stop.wait(interval_seconds):
+                    try:
+                        self.refresh_schema(database_connector)
+                    except Exception as e:
+                        self.logger.error(f"Failed to refresh the catalog: {str(e)}")
+            except Exception as e:
+                self.logger.error(f"Schema refresh stopped: {str(e)}")
+            finally:
+                database_connector.disconnect()
+
+        self._refresh_stop.clear()
+        self._refresh_thread = threading.Thread(
+            target=refresh_loop, name="pipable-schema-refresh", daemon=True
+        )
+        self._refresh_thread.start()
+
+    def stop_schema_refresh(self):
+        """Stop the background catalog refresh started by `start_schema_refresh`."""
+        if self._refresh_thread is None:
+            return
+        self._refresh_stop.set()
+        self._refresh_thread.join()
+        self._refresh_thread = None
 
     def ask_and_execute(
-        self, question: str, table_names: Optional[List[str]]
+        self,
+        question: str,
+        table_names: Optional[List[str]],
+        deadline: Optional[float] = None,
+        result_format: str = "pandas",
     ) -> DataFrame:
         """Generate an SQL query and execute it on the PostgreSQL server.
 
@@ -144,50 +295,80 @@ class Pipable:
             table_names (list, optional): The list of table names for the query context.
             If not provided, it will be auto-generated.
             question (str): The query to perform in simple English.
+            deadline (float, optional): The `time.time()` after which the result is no longer
+                wanted. It bounds the generation on the server, and what is left of it is the
+                query's `statement_timeout`. Defaults to None, no limit.
+            result_format (str, optional): "pandas", "arrow" for a `pyarrow.Table` or "polars"
+                for a `polars.DataFrame`. Defaults to "pandas".
 
         Returns:
-            pandas.DataFrame: A DataFrame containing the query result.
+            pandas.DataFrame: A DataFrame containing the query result, or the Arrow table or
+            Polars DataFrame requested by `result_format`.
 
         Raises:
-            ValueError: If the language model does not generate a valid SQL query.
+            SQLValidationError: If the generated SQL query fails local validation.
+            TimeoutError: If the deadline passed.
+            ValueError: If the language model does not generate a valid SQL query, or
+                `result_format` is unknown.
+            ImportError: If the package of the requested `result_format` is not installed.
         """
+        check_result_format(result_format)
         try:
             # Connect to PostgreSQL if not already connected
             self.connect()
 
             # Set default context
-            context = ";".join(self.all_table_queries)
+            create_table_statements = self.all_table_queries
 
             # Generate CREATE TABLE statements for the specified tables
             if table_names and len(table_names) > 0:
                 create_table_statements = self._generate_create_table_statements(
                     table_names
                 )
-                # Concatenate create table statements into a single line for context
-                context = ";".join(create_table_statements)
 
-            # Generate SQL query from LLM
-            sql_query = self._generate_sql_query(context, question)
+            # Concatenate create table statements into a single line for context
+            context = self._build_context(create_table_statements, question)
+
+            # Generate SQL query from LLM and check it before it reaches the database
+            sql_query = self._generate_valid_sql_query(
+                context, question, create_table_statements, deadline
+            )
 
-            # Execute SQL query
-            result_df = self.database_connector.execute_query(sql_query)
+            # Execute SQL query, within what is left of the deadline
+            kwargs = {}
+            if deadline is not None:
+                kwargs["timeout"] = self._remaining_seconds(deadline)
+            if result_format != "pandas":
+                kwargs["result_format"] = result_format
+            result_df = self.database_connector.execute_query(sql_query, **kwargs)
 
             return result_df
+        except (SQLValidationError, TimeoutError, ImportError):
+            raise
         except Exception as e:
             raise ValueError(f"Error in 'ask_and_execute' method: {str(e)}")
 
-    def ask(self, question: str, table_names: Optional[List[str]] = None) -> str:
+    def ask(
+        self,
+        question: str,
+        table_names: Optional[List[str]] = None,
+        deadline: Optional[float] = None,
+    ) -> str:
         """Generate an SQL query.
 
         Args:
             table_names (list, optional): The list of table names for the query context.
             If not provided, it will be auto-generated.
             question (str): The query to perform in simple English.
+            deadline (float, optional): The `time.time()` after which the query is no longer
+                wanted. It is sent to the server, which stops generating once it has passed.
+                Defaults to None, no limit.
 
         Returns:
             str: A sql query result.
 
         Raises:
+            TimeoutError: If the deadline passed.
             ValueError: If the language model does not generate a valid SQL query.
         """
         try:
@@ -195,19 +376,22 @@ class Pipable:
             self.connect()
 
             # Set default context
-            context = ";".join(self.all_table_queries)
+            create_table_statements = self.all_table_queries
 
             # Generate CREATE TABLE statements for the specified tables
             if table_names and len(table_names) > 0:
                 create_table_statements = self._generate_create_table_statements(
                     table_names
                 )
-                # Concatenate create table statements into a single line for context
-                context = ";".join(create_table_statements)
+
+            # Concatenate create table statements into a single line for context
+            context = self._build_context(create_table_statements, question)
 
             # Generate SQL query from LLM
-            sql_query = self._generate_sql_query(context, question)
+            sql_query = self._generate_sql_query(context, question, deadline)
 
             return sql_query
+        except TimeoutError:
+            raise
         except Exception as e:
             raise ValueError(f"Error in 'ask' method: {str(e)}")
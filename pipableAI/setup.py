@@ -28,5 +28,11 @@ setup(
         "psycopg2-binary>=2.9.0,<=2.9.9",
         "requests>=2.28",
     ],
+    extras_require={
+        "duckdb": ["duckdb>=0.9.0", "pyarrow>=12.0.0"],
+        "arrow": ["pyarrow>=12.0.0"],
+        "polars": ["polars>=0.19.0", "pyarrow>=12.0.0"],
+        "transport": ["msgpack>=1.0.0", "zstandard>=0.21.0"],
+    },
     python_requires=">=3.7",
 )
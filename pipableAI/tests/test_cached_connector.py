@@ -0,0 +1,144 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+from pandas import DataFrame
+
+# Add the absolute path of the root folder to Python path
+root_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(root_folder)
+
+from pipableai.core.cached_connector import CachedConnector, CachedTable
+from pipableai.core.sqlite_connector import SQLiteConfig, SQLiteConnector
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+class TestCachedConnector(unittest.TestCase):
+    def setUp(self):
+        # An in-memory SQLite database stands in for the remote PostgreSQL server
+        self.source = SQLiteConnector(SQLiteConfig())
+        self.source.connect()
+        self.source.load_dataframe(
+            "country", DataFrame({"country_id": [1, 2], "country": ["India", "Japan"]})
+        )
+        self.source.load_dataframe("payment", DataFrame({"amount": [1.5, 2.5]}))
+        # Reconnecting would reopen an empty in-memory database
+        self.source.connect = lambda: None
+
+        self.connector = CachedConnector(
+            source_connector=self.source,
+            cached_tables=[CachedTable("country", ttl_seconds=60)],
+            local_connector=SQLiteConnector(SQLiteConfig()),
+        )
+        self.connector.connect()
+
+    def tearDown(self):
+        self.connector.disconnect()
+
+    def test_cached_table_is_served_locally(self):
+        with patch.object(
+            self.source, "execute_query", wraps=self.source.execute_query
+        ) as source_query:
+            first = self.connector.execute_query("SELECT country FROM country")
+            second = self.connector.execute_query(
+                "SELECT country FROM country WHERE country_id = 2"
+            )
+
+        # Only the initial extract reaches the source database
+        source_query.assert_called_once_with('SELECT * FROM "country"')
+        self.assertEqual(list(first["country"]), ["India", "Japan"])
+        self.assertEqual(list(second["country"]), ["Japan"])
+
+    def test_uncached_table_goes_to_source(self):
+        with patch.object(
+            self.source, "execute_query", wraps=self.source.execute_query
+        ) as source_query:
+            result = self.connector.execute_query(
+                "SELECT c.country, p.amount FROM country c, payment p"
+            )
+
+        source_query.assert_called_once_with(
+            "SELECT c.country, p.amount FROM country c, payment p"
+        )
+        self.assertEqual(result.shape, (4, 2))
+
+    def test_stale_extract_is_refreshed(self):
+        self.connector.execute_query("SELECT * FROM country")
+        self.source.load_dataframe(
+            "country", DataFrame({"country_id": [3], "country": ["Peru"]})
+        )
+
+        with patch("pipableai.core.cached_connector.time.time", return_value=1e12):
+            result = self.connector.execute_query("SELECT country FROM country")
+
+        self.assertEqual(list(result["country"]), ["Peru"])
+
+    def test_extract_query_quotes_the_configured_name(self):
+        connector = CachedConnector(
+            source_connector=self.source,
+            cached_tables=[CachedTable("Sales.Orders"), CachedTable('my "table"')],
+            local_connector=SQLiteConnector(SQLiteConfig()),
+        )
+        connector.connect()
+        self.addCleanup(connector.local_connector.disconnect)
+
+        with patch.object(
+            self.source, "execute_query", return_value=DataFrame({"id": [1]})
+        ) as source_query:
+            connector.refresh(["sales.orders", 'MY "TABLE"'])
+
+        self.assertEqual(
+            [args[0] for args, _ in source_query.call_args_list],
+            ['SELECT * FROM "Sales"."Orders"', 'SELECT * FROM "my ""table"""'],
+        )
+
+    def test_schema_qualified_table_is_served_locally(self):
+        connector = CachedConnector(
+            source_connector=self.source,
+            cached_tables=[CachedTable("Sales.Orders")],
+            local_connector=SQLiteConnector(SQLiteConfig()),
+        )
+        connector.connect()
+        self.addCleanup(connector.local_connector.disconnect)
+
+        with patch.object(
+            self.source, "execute_query", return_value=DataFrame({"id": [1, 2]})
+        ) as source_query:
+            first = connector.execute_query(
+                "SELECT sales.orders.id FROM sales.orders WHERE sales.orders.id > 1"
+            )
+            second = connector.execute_query(
+                'SELECT count(*) AS n FROM "Sales"."Orders"'
+            )
+
+        # Only the extract reaches the source database
+        source_query.assert_called_once_with('SELECT * FROM "Sales"."Orders"')
+        self.assertEqual(list(first["id"]), [2])
+        self.assertEqual(list(second["n"]), [2])
+
+    @unittest.skipIf(duckdb is None, "duckdb is not installed")
+    def test_duckdb_local_store(self):
+        from pipableai.core.duckdb_connector import DuckDBConfig, DuckDBConnector
+
+        connector = CachedConnector(
+            source_connector=self.source,
+            cached_tables=[CachedTable("country")],
+            local_connector=DuckDBConnector(DuckDBConfig()),
+        )
+        connector.connect()
+
+        result = connector.execute_query(
+            "SELECT country FROM country ORDER BY country_id DESC"
+        )
+
+        self.assertEqual(list(result["country"]), ["Japan", "India"])
+        connector.local_connector.disconnect()
+
+
+if __name__ == "__main__":
+    unittest.main()
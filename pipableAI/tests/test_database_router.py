@@ -0,0 +1,184 @@
+import os
+import sys
+import threading
+import unittest
+from dataclasses import dataclass
+from unittest.mock import Mock
+
+from pandas import DataFrame
+
+# Add the absolute path of the root folder to Python path
+root_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(root_folder)
+
+from pipableai.core.database_router import DatabaseRouter, config_key
+from pipableai.interfaces.database_connector_interface import DatabaseConnectorInterface
+from pipableai.interfaces.llm_api_client_interface import LlmApiClientInterface
+
+
+@dataclass
+class TenantConfig:
+    database: str
+
+
+class FakeConnector(DatabaseConnectorInterface):
+    """A database with one table named after the database."""
+
+    open_connections = 0
+    introspections = 0
+    lock = threading.Lock()
+
+    def __init__(self, config):
+        self.config = config
+        self.connected = False
+
+    def connect(self):
+        with FakeConnector.lock:
+            FakeConnector.open_connections += 1
+        self.connected = True
+
+    def disconnect(self):
+        if self.connected:
+            with FakeConnector.lock:
+                FakeConnector.open_connections -= 1
+            self.connected = False
+
+    def execute_query(self, query, timeout=None):
+        assert self.connected
+        if "information_schema.columns" in query:
+            with FakeConnector.lock:
+                FakeConnector.introspections += 1
+            return DataFrame(
+                {
+                    "table_name": [f"{self.config.database}_orders"],
+                    "column_name": ["amount"],
+                    "data_type": ["numeric"],
+                }
+            )
+        return DataFrame({"amount": [1]})
+
+
+class TestDatabaseRouter(unittest.TestCase):
+    def setUp(self):
+        FakeConnector.open_connections = 0
+        FakeConnector.introspections = 0
+        self.llm_api_client = Mock(spec=LlmApiClientInterface)
+        self.llm_api_client.generate_text.side_effect = (
+            lambda context, question: f"SELECT amount FROM {context.split()[2]}"
+        )
+
+    def router(self, **kwargs):
+        router = DatabaseRouter(FakeConnector, self.llm_api_client, **kwargs)
+        self.addCleanup(router.close)
+        return router
+
+    def test_state_is_reused_across_requests(self):
+        router = self.router()
+
+        for _ in range(3):
+            result_df = router.ask_and_execute(TenantConfig("a"), "Amounts?")
+
+        self.assertEqual(list(result_df["amount"]), [1])
+        self.assertEqual(FakeConnector.introspections, 1)
+        self.assertEqual(router.stats()["connections"], 1)
+        self.llm_api_client.generate_text.assert_called_with(
+            "CREATE TABLE a_orders (amount numeric)", "Amounts?"
+        )
+
+    def test_databases_are_isolated(self):
+        router = self.router()
+
+        self.assertEqual(
+            router.ask(TenantConfig("a"), "?"), "SELECT amount FROM a_orders"
+        )
+        self.assertEqual(
+            router.ask(TenantConfig("b"), "?"), "SELECT amount FROM b_orders"
+        )
+        self.assertEqual(router.stats()["databases"], 2)
+
+    def test_least_recently_used_idle_database_is_evicted(self):
+        router = self.router(max_databases=2)
+
+        router.ask(TenantConfig("a"), "?")
+        router.ask(TenantConfig("b"), "?")
+        router.ask(TenantConfig("a"), "?")
+        router.ask(TenantConfig("c"), "?")
+
+        self.assertEqual(router.stats()["databases"], 2)
+        self.assertEqual(router.stats()["evictions"], 1)
+        self.assertEqual(FakeConnector.open_connections, 2)
+        # a was kept warm, b has to be introspected again
+        router.ask(TenantConfig("a"), "?")
+        self.assertEqual(FakeConnector.introspections, 3)
+        router.ask(TenantConfig("b"), "?")
+        self.assertEqual(FakeConnector.introspections, 4)
+
+    def test_database_in_use_is_not_evicted(self):
+        router = self.router(max_databases=1)
+
+        with router.session(TenantConfig("a")) as pipable:
+            router.ask(TenantConfig("b"), "?")
+            self.assertEqual(pipable.ask("?"), "SELECT amount FROM a_orders")
+
+        self.assertEqual(router.stats()["databases"], 1)
+
+    def test_idle_connection_of_another_database_is_closed_at_the_global_cap(self):
+        router = self.router(max_connections=1, acquire_timeout=1)
+
+        router.ask(TenantConfig("a"), "?")
+        router.ask(TenantConfig("b"), "?")
+
+        self.assertEqual(router.stats()["connections"], 1)
+        self.assertEqual(FakeConnector.open_connections, 1)
+
+    def test_catalog_memory_budget(self):
+        router = self.router(max_catalog_bytes=1)
+
+        router.ask(TenantConfig("a"), "?")
+
+        self.assertEqual(router.stats()["databases"], 0)
+        self.assertEqual(FakeConnector.open_connections, 0)
+
+    def test_concurrent_requests_share_one_warm_up(self):
+        router = self.router(max_connections_per_database=2)
+        threads = [
+            threading.Thread(
+                target=router.ask_and_execute, args=(TenantConfig("a"), "?")
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(FakeConnector.introspections, 1)
+        self.assertLessEqual(router.stats()["connections"], 2)
+
+    def test_connection_closed_by_a_failed_query_is_not_reused(self):
+        router = self.router()
+        router.ask_and_execute(TenantConfig("a"), "?")
+        connections = router.stats()["connections"]
+
+        def lose_connection(query, timeout=None):
+            connector.connection = Mock(closed=2)
+            raise ValueError("SQL query execution error: server closed the connection")
+
+        with router.session(TenantConfig("a")) as pipable:
+            connector = pipable.database_connector.pool.acquire(1)
+            connector.execute_query = lose_connection
+            pipable.database_connector.pool.release(connector)
+            with self.assertRaises(ValueError):
+                pipable.database_connector.execute_query("SELECT 1")
+
+        self.assertEqual(router.stats()["connections"], connections - 1)
+
+    def test_config_key(self):
+        self.assertEqual(config_key(TenantConfig("a")), config_key(TenantConfig("a")))
+        self.assertNotEqual(
+            config_key(TenantConfig("a")), config_key(TenantConfig("b"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
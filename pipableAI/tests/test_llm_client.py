@@ -1,12 +1,16 @@
 import os
 import sys
+import time
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
+
+import requests
 
 # Add the absolute path of the root folder to Python path
 root_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(root_folder)
 
+from pipableai.llm_client import transport
 from pipableai.llm_client.pipllm import PipLlmApiClient
 
 
@@ -37,6 +41,126 @@ class TestPipLlmApiClient(unittest.TestCase):
         # Assert the generated_query matches the expected output from the mock response
         self.assertEqual(generated_query, "SELECT first_name FROM actor;")
 
+    @patch("time.sleep")
+    @patch("requests.post")
+    def test_generate_text_retries_after_rejection(self, mock_post, mock_sleep):
+        rejected = MagicMock(status_code=503, headers={"Retry-After": "2"})
+        accepted = MagicMock(status_code=200, headers={})
+        accepted.json.return_value = {"output": "SELECT 1;"}
+        mock_post.side_effect = [rejected, accepted]
+
+        self.assertEqual(self.client.generate_text("", "one"), "SELECT 1;")
+        self.assertEqual(mock_post.call_count, 2)
+        mock_sleep.assert_called_once_with(2.0)
+
+    @patch("time.sleep")
+    @patch("requests.post")
+    def test_generate_text_gives_up_after_max_retries(self, mock_post, mock_sleep):
+        rejected = MagicMock(status_code=429, headers={"Retry-After": "1"})
+        rejected.raise_for_status.side_effect = requests.exceptions.HTTPError("429")
+        mock_post.return_value = rejected
+
+        with self.assertRaises(Exception):
+            self.client.generate_text("", "one")
+        self.assertEqual(mock_post.call_count, self.client.max_retries + 1)
+        self.assertEqual(mock_sleep.call_count, self.client.max_retries)
+
+    @patch("time.sleep")
+    @patch("requests.post")
+    def test_generate_text_does_not_wait_longer_than_max_retry_after(
+        self, mock_post, mock_sleep
+    ):
+        rejected = MagicMock(status_code=503, headers={"Retry-After": "3600"})
+        rejected.raise_for_status.side_effect = requests.exceptions.HTTPError("503")
+        mock_post.return_value = rejected
+
+        with self.assertRaises(Exception):
+            self.client.generate_text("", "one")
+        mock_post.assert_called_once()
+        mock_sleep.assert_not_called()
+
+    @patch("requests.post")
+    def test_client_id_is_sent_as_header(self, mock_post):
+        mock_post.return_value.json.return_value = {"output": "SELECT 1;"}
+        client = PipLlmApiClient(api_base_url=self.api_base_url, client_id="reports")
+
+        client.generate_text("", "one")
+
+        mock_post.assert_called_once_with(
+            f"{self.api_base_url}/generate",
+            json={"context": "", "question": "one"},
+            headers={"X-Client-Id": "reports"},
+        )
+
+    @patch("requests.post")
+    def test_deadline_is_sent_as_remaining_seconds(self, mock_post):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {"output": "SELECT 1;"}
+
+        self.client.generate_text("", "one", deadline=time.time() + 10)
+
+        _, kwargs = mock_post.call_args
+        remaining = float(kwargs["headers"][PipLlmApiClient.DEADLINE_HEADER])
+        self.assertTrue(0 < remaining <= 10)
+        self.assertTrue(0 < kwargs["timeout"] <= 10)
+
+    @patch("requests.post")
+    def test_expired_deadline_is_not_sent(self, mock_post):
+        with self.assertRaises(TimeoutError):
+            self.client.generate_text("", "one", deadline=time.time() - 1)
+        mock_post.assert_not_called()
+
+    @patch("requests.post")
+    def test_server_timeout_raises_timeout_error(self, mock_post):
+        mock_post.return_value.status_code = 504
+
+        with self.assertRaises(TimeoutError):
+            self.client.generate_text("", "one", deadline=time.time() + 10)
+
+    @patch("requests.post")
+    def test_auto_transport_sends_compact_bodies(self, mock_post):
+        encoded = transport.serialize(
+            {"output": "SELECT 1;"}, transport.content_types()[0]
+        )
+        mock_post.return_value = MagicMock(
+            status_code=200,
+            content=encoded,
+            headers={"Content-Type": transport.content_types()[0]},
+        )
+        client = PipLlmApiClient(api_base_url=self.api_base_url, transport="auto")
+        context = ";".join(f"CREATE TABLE t{i} (id INT, name TEXT)" for i in range(100))
+
+        self.assertEqual(client.generate_text(context, "one"), "SELECT 1;")
+
+        _, kwargs = mock_post.call_args
+        headers = kwargs["headers"]
+        self.assertEqual(headers["Content-Type"], transport.content_types()[0])
+        self.assertEqual(headers["Content-Encoding"], transport.content_encodings()[0])
+        body = transport.decompress(kwargs["data"], headers["Content-Encoding"])
+        self.assertEqual(
+            transport.deserialize(body, headers["Content-Type"]),
+            {"context": context, "question": "one"},
+        )
+
+    @patch("requests.post")
+    def test_auto_transport_falls_back_to_json(self, mock_post):
+        unsupported = MagicMock(status_code=415, headers={})
+        accepted = MagicMock(
+            status_code=200, headers={"Content-Type": "application/json"}
+        )
+        accepted.content = b'{"output": "SELECT 1;"}'
+        mock_post.side_effect = [unsupported, accepted, accepted]
+        client = PipLlmApiClient(api_base_url=self.api_base_url, transport="auto")
+
+        self.assertEqual(client.generate_text("", "one"), "SELECT 1;")
+        self.assertEqual(client.generate_text("", "two"), "SELECT 1;")
+
+        # Only the first request was sent in the binary format
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(
+            mock_post.call_args.kwargs, {"json": {"context": "", "question": "two"}}
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
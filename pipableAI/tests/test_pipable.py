@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 import unittest
 from unittest.mock import Mock
 
@@ -10,6 +11,7 @@ root_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(root_folder)
 
 from pipableai import Pipable
+from pipableai.core.sql_validator import SQLValidationError
 from pipableai.interfaces.database_connector_interface import DatabaseConnectorInterface
 from pipableai.interfaces.llm_api_client_interface import LlmApiClientInterface
 
@@ -81,6 +83,170 @@ class TestPipable(unittest.TestCase):
         # Assert the result
         self.assertIs(result, generated_sql_query)
 
+    def test_ask_and_execute_rejects_invalid_query(self):
+        self.pipable.all_table_queries = [
+            "CREATE TABLE employees (id integer, name text)"
+        ]
+        self.mock_llm_api_client.generate_text.return_value = (
+            "SELECT salary FROM employees"
+        )
+
+        with self.assertRaises(SQLValidationError):
+            self.pipable.ask_and_execute(question="List salaries.", table_names=None)
+
+        # The invalid query never reaches the database
+        self.mock_database_connector.execute_query.assert_not_called()
+
+    def test_ask_and_execute_regenerates_invalid_query(self):
+        self.pipable.all_table_queries = [
+            "CREATE TABLE employees (id integer, name text)"
+        ]
+        self.pipable.max_regenerations = 1
+        self.mock_llm_api_client.generate_text.side_effect = [
+            "SELECT salary FROM employees",
+            "SELECT name FROM employees",
+        ]
+
+        self.pipable.ask_and_execute(question="List names.", table_names=None)
+
+        self.assertEqual(self.mock_llm_api_client.generate_text.call_count, 2)
+        self.mock_database_connector.execute_query.assert_called_once_with(
+            "SELECT name FROM employees"
+        )
+
+    def test_deadline_is_passed_to_the_llm_and_the_database(self):
+        self.mock_llm_api_client.generate_text.return_value = "SELECT 1"
+        deadline = time.time() + 60
+
+        self.pipable.ask_and_execute(
+            question="One.", table_names=None, deadline=deadline
+        )
+
+        self.mock_llm_api_client.generate_text.assert_called_once_with(
+            "", "One.", deadline=deadline
+        )
+        _, kwargs = self.mock_database_connector.execute_query.call_args
+        self.assertTrue(0 < kwargs["timeout"] <= 60)
+
+    def test_expired_deadline_raises_timeout_error(self):
+        self.mock_llm_api_client.generate_text.return_value = "SELECT 1"
+
+        with self.assertRaises(TimeoutError):
+            self.pipable.ask_and_execute(
+                question="One.", table_names=None, deadline=time.time() - 1
+            )
+        self.mock_database_connector.execute_query.assert_not_called()
+
+    def test_result_format_is_passed_to_the_database(self):
+        self.mock_llm_api_client.generate_text.return_value = "SELECT 1"
+
+        self.pipable.ask_and_execute(
+            question="One.", table_names=None, result_format="arrow"
+        )
+
+        self.mock_database_connector.execute_query.assert_called_once_with(
+            "SELECT 1", result_format="arrow"
+        )
+
+    def test_unknown_result_format_is_rejected_before_generation(self):
+        with self.assertRaises(ValueError):
+            self.pipable.ask_and_execute(
+                question="One.", table_names=None, result_format="excel"
+            )
+        self.mock_llm_api_client.generate_text.assert_not_called()
+
+
+class TestPipableSchemaRefresh(unittest.TestCase):
+    def setUp(self):
+        # Columns and pg_class/pg_attribute fingerprints of the fake database
+        self.columns = {
+            "actor": [("actor_id", "integer"), ("first_name", "text")],
+            "city": [("city_id", "integer")],
+        }
+        self.fingerprints = {"actor": "a1", "city": "c1"}
+        self.introspected = []
+
+        self.mock_database_connector = Mock(spec=DatabaseConnectorInterface)
+        self.mock_database_connector.execute_query.side_effect = self._execute_query
+
+        self.pipable = Pipable(
+            database_connector=self.mock_database_connector,
+            llm_api_client=Mock(spec=LlmApiClientInterface),
+        )
+
+    def _execute_query(self, query):
+        if "pg_class" in query:
+            return DataFrame(
+                [("public", table, f) for table, f in self.fingerprints.items()],
+                columns=["table_schema", "table_name", "fingerprint"],
+            )
+        tables = [
+            table
+            for table in self.columns
+            if "table_name IN" not in query or f"'{table}'" in query
+        ]
+        self.introspected.append(tables)
+        return DataFrame(
+            [
+                (table, name, kind)
+                for table in tables
+                for name, kind in self.columns[table]
+            ],
+            columns=["table_name", "column_name", "data_type"],
+        )
+
+    def test_refresh_only_introspects_changed_tables(self):
+        self.pipable.refresh_schema()
+        self.columns["actor"].append(("last_name", "text"))
+        self.fingerprints["actor"] = "a2"
+        del self.columns["city"]
+        del self.fingerprints["city"]
+
+        changed = self.pipable.refresh_schema()
+
+        self.assertEqual(changed, ["actor", "city"])
+        self.assertEqual(self.introspected[-1], ["actor"])
+        self.assertEqual(
+            self.pipable.all_table_queries,
+            ["CREATE TABLE actor (actor_id integer, first_name text, last_name text)"],
+        )
+
+    def test_table_altered_before_the_first_refresh(self):
+        # The catalog was loaded when the instance was created
+        self.columns["actor"].append(("last_name", "text"))
+        self.fingerprints["actor"] = "a2"
+
+        changed = self.pipable.refresh_schema()
+
+        self.assertEqual(changed, ["actor"])
+        self.assertEqual(self.introspected[-1], ["actor"])
+        self.assertIn(
+            "CREATE TABLE actor (actor_id integer, first_name text, last_name text)",
+            self.pipable.all_table_queries,
+        )
+
+    def test_unchanged_catalog_is_not_introspected(self):
+        self.pipable.refresh_schema()
+        introspections = len(self.introspected)
+
+        self.assertEqual(self.pipable.refresh_schema(), [])
+        self.assertEqual(len(self.introspected), introspections)
+
+    def test_background_refresh(self):
+        refresh_connector = Mock(spec=DatabaseConnectorInterface)
+        refresh_connector.execute_query.side_effect = self._execute_query
+        self.fingerprints["store"] = "s1"
+        self.columns["store"] = [("store_id", "integer")]
+
+        self.pipable.start_schema_refresh(refresh_connector, interval_seconds=0.01)
+        self.pipable.stop_schema_refresh()
+
+        refresh_connector.connect.assert_called_once()
+        refresh_connector.disconnect.assert_called_once()
+        self.assertIn(
+            "CREATE TABLE store (store_id integer)", self.pipable.all_table_queries
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
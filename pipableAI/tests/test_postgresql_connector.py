@@ -1,7 +1,9 @@
 import os
 import sys
 import unittest
-from unittest.mock import Mock
+from unittest.mock import Mock, call, patch
+
+import psycopg2.errors
 
 # Add the absolute path of the root folder to Python path
 root_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -53,5 +55,154 @@ class TestPostgresConnector(unittest.TestCase):
         self.assertEqual(result_df.shape, (2, 2))
 
 
+class TestPostgresConnectorStatementCache(unittest.TestCase):
+    def setUp(self):
+        self.mock_connection = Mock(closed=0, autocommit=True)
+        self.mock_cursor = self.mock_connection.cursor.return_value
+        self.mock_cursor.description = [("first_name",)]
+        self.mock_cursor.fetchall.return_value = [("Penelope",)]
+
+        config = PostgresConfig(
+            host="localhost",
+            port=5432,
+            database="sampleDB",
+            user="postgres",
+            password="postgres",
+            statement_cache_size=2,
+        )
+        self.connector = PostgresConnector(config)
+        with patch("psycopg2.connect", return_value=self.mock_connection):
+            self.connector.connect()
+
+    def test_queries_differing_in_literals_share_a_prepared_statement(self):
+        self.connector.execute_query("SELECT first_name FROM actor WHERE actor_id = 1")
+        result_df = self.connector.execute_query(
+            "SELECT first_name FROM actor WHERE actor_id = 2"
+        )
+
+        self.assertEqual(
+            self.mock_cursor.execute.call_args_list,
+            [
+                call(
+                    "PREPARE pipable_stmt_0 AS SELECT first_name FROM actor WHERE actor_id = $1::integer"
+                ),
+                call("EXECUTE pipable_stmt_0 (%s)", [1]),
+                call("EXECUTE pipable_stmt_0 (%s)", [2]),
+            ],
+        )
+        self.assertEqual(list(result_df["first_name"]), ["Penelope"])
+
+    def test_least_recently_used_statement_is_deallocated(self):
+        self.connector.execute_query("SELECT first_name FROM actor WHERE actor_id = 1")
+        self.connector.execute_query("SELECT first_name FROM city WHERE city_id = 1")
+        self.connector.execute_query("SELECT first_name FROM actor WHERE actor_id = 2")
+        self.connector.execute_query("SELECT first_name FROM film WHERE film_id = 1")
+
+        self.mock_cursor.execute.assert_any_call("DEALLOCATE pipable_stmt_1")
+
+    def test_failed_deallocate_does_not_fail_the_query(self):
+        def execute(query, *args):
+            if query.startswith("DEALLOCATE"):
+                raise psycopg2.errors.InvalidSqlStatementName(
+                    "prepared statement does not exist"
+                )
+
+        self.mock_cursor.execute.side_effect = execute
+        self.connector.execute_query("SELECT first_name FROM actor WHERE actor_id = 1")
+        self.connector.execute_query("SELECT first_name FROM city WHERE city_id = 1")
+        result_df = self.connector.execute_query(
+            "SELECT first_name FROM film WHERE film_id = 1"
+        )
+
+        self.mock_connection.rollback.assert_not_called()
+        self.mock_cursor.execute.assert_called_with("EXECUTE pipable_stmt_2 (%s)", [1])
+        self.assertEqual(list(result_df["first_name"]), ["Penelope"])
+
+    def test_failed_prepare_keeps_the_transaction(self):
+        self.mock_connection.autocommit = False
+
+        def execute(query, *args):
+            if query.startswith("PREPARE"):
+                raise psycopg2.errors.IndeterminateDatatype(
+                    "could not determine data type"
+                )
+
+        self.mock_cursor.execute.side_effect = execute
+        self.connector.execute_query("SELECT first_name FROM actor WHERE actor_id = 1")
+
+        self.assertEqual(
+            self.mock_cursor.execute.call_args_list,
+            [
+                call("SAVEPOINT pipable_statement_cache"),
+                call(
+                    "PREPARE pipable_stmt_0 AS "
+                    "SELECT first_name FROM actor WHERE actor_id = $1::integer"
+                ),
+                call("ROLLBACK TO SAVEPOINT pipable_statement_cache"),
+                call("RELEASE SAVEPOINT pipable_statement_cache"),
+                call("SELECT first_name FROM actor WHERE actor_id = 1"),
+            ],
+        )
+        self.mock_connection.rollback.assert_not_called()
+
+    def test_write_queries_are_executed_directly(self):
+        self.connector.execute_query("UPDATE actor SET first_name = 'Nick'")
+
+        self.mock_cursor.execute.assert_called_once_with(
+            "UPDATE actor SET first_name = 'Nick'"
+        )
+
+    def test_timeout_is_applied_as_statement_timeout(self):
+        self.connector.execute_query(
+            "SELECT first_name FROM actor WHERE actor_id = 1", timeout=1.5
+        )
+        self.connector.execute_query(
+            "SELECT first_name FROM actor WHERE actor_id = 2", timeout=1.5
+        )
+        self.connector.execute_query("SELECT first_name FROM actor WHERE actor_id = 3")
+
+        self.assertEqual(
+            self.mock_cursor.execute.call_args_list,
+            [
+                call(
+                    "PREPARE pipable_stmt_0 AS SELECT first_name FROM actor WHERE actor_id = $1::integer"
+                ),
+                call("SET statement_timeout = 1500"),
+                call("EXECUTE pipable_stmt_0 (%s)", [1]),
+                call("EXECUTE pipable_stmt_0 (%s)", [2]),
+                call("SET statement_timeout TO DEFAULT"),
+                call("EXECUTE pipable_stmt_0 (%s)", [3]),
+            ],
+        )
+
+    def test_lost_connection_raises_connection_error(self):
+        def execute(query, *args):
+            self.mock_connection.closed = 2
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+        self.mock_cursor.execute.side_effect = execute
+
+        with self.assertRaises(ConnectionError):
+            self.connector.execute_query("UPDATE actor SET first_name = 'Nick'")
+        self.mock_connection.rollback.assert_not_called()
+
+    def test_cancelled_query_raises_timeout_error(self):
+        self.mock_cursor.execute.side_effect = psycopg2.errors.QueryCanceled(
+            "canceling statement due to statement timeout"
+        )
+
+        with self.assertRaises(TimeoutError):
+            self.connector.execute_query(
+                "UPDATE actor SET first_name = 'Nick'", timeout=1
+            )
+        self.mock_connection.rollback.assert_called_once()
+
+        # The rollback reverted the SET, so the next query sets the timeout again
+        self.mock_cursor.execute.side_effect = None
+        self.mock_cursor.execute.reset_mock()
+        self.connector.execute_query("UPDATE actor SET first_name = 'Nick'", timeout=1)
+        self.mock_cursor.execute.assert_any_call("SET statement_timeout = 1000")
+
+
 if __name__ == "__main__":
     unittest.main()
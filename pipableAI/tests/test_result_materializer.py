@@ -0,0 +1,149 @@
+import datetime
+import os
+import sys
+import unittest
+from decimal import Decimal
+
+import pandas as pd
+
+# Add the absolute path of the root folder to Python path
+root_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(root_folder)
+
+from pipableai.core.result_materializer import convert_dataframe, materialize
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+try:
+    import polars
+except ImportError:
+    polars = None
+
+# (name, type_code) like psycopg2's cursor.description
+DESCRIPTION = [
+    ("id", 23),
+    ("amount", 1700),
+    ("active", 16),
+    ("joined", 1082),
+    ("updated_at", 1184),
+    ("region", 1043),
+]
+UTC = datetime.timezone.utc
+ROWS = [
+    (
+        1,
+        Decimal("10.50"),
+        True,
+        datetime.date(2023, 1, 1),
+        datetime.datetime(2023, 1, 1, tzinfo=UTC),
+        "north",
+    ),
+    (
+        2,
+        Decimal("3.25"),
+        False,
+        datetime.date(2023, 2, 1),
+        datetime.datetime(2023, 2, 1, tzinfo=UTC),
+        "south",
+    ),
+    (3, None, None, None, None, "north"),
+    (
+        4,
+        Decimal("7"),
+        True,
+        datetime.date(2023, 4, 1),
+        datetime.datetime(2023, 4, 1, tzinfo=UTC),
+        "north",
+    ),
+]
+
+
+class TestResultMaterializer(unittest.TestCase):
+    def test_columns_get_dtypes_from_type_codes(self):
+        df = materialize(ROWS, DESCRIPTION)
+
+        self.assertEqual(list(df.columns), [name for name, _ in DESCRIPTION])
+        self.assertEqual(df["id"].dtype, "int32")
+        self.assertEqual(df["amount"].dtype, object)
+        self.assertEqual(df["amount"][0], Decimal("10.50"))
+        self.assertTrue(pd.isna(df["amount"][2]))
+        self.assertEqual(df["active"].dtype, "boolean")
+        self.assertTrue(pd.api.types.is_datetime64_dtype(df["joined"]))
+        self.assertEqual(str(df["updated_at"].dtype.tz), "UTC")
+        self.assertTrue(pd.api.types.is_string_dtype(df["region"]))
+
+    def test_integer_columns_with_nulls_are_nullable(self):
+        df = materialize([(1,), (None,)], [("id", 20)])
+
+        self.assertEqual(df["id"].dtype, "Int64")
+        self.assertTrue(pd.isna(df["id"][1]))
+
+    def test_categorical_and_downcast(self):
+        df = materialize(ROWS, DESCRIPTION, categorical_threshold=0.5, downcast=True)
+
+        self.assertEqual(df["region"].dtype, "category")
+        self.assertEqual(df["id"].dtype, "int8")
+        self.assertEqual(df["amount"].dtype, object)
+
+    def test_numeric_as_float(self):
+        df = materialize(ROWS, DESCRIPTION, numeric_as_float=True)
+        downcast_df = materialize(
+            ROWS, DESCRIPTION, downcast=True, numeric_as_float=True
+        )
+
+        self.assertEqual(df["amount"].dtype, "float64")
+        self.assertEqual(df["amount"][0], 10.5)
+        self.assertTrue(pd.isna(df["amount"][2]))
+        self.assertEqual(downcast_df["amount"].dtype, "float32")
+
+    def test_unknown_types_and_duplicate_names_are_kept(self):
+        df = materialize([(1, {"a": 1})], [("id", 23), ("id", 3802)])
+
+        self.assertEqual(list(df.columns), ["id", "id"])
+        self.assertEqual(df.iloc[0, 1], {"a": 1})
+
+    def test_empty_result_keeps_columns(self):
+        df = materialize([], DESCRIPTION)
+
+        self.assertEqual(len(df), 0)
+        self.assertEqual(df["id"].dtype, "int32")
+
+    def test_unknown_result_format(self):
+        with self.assertRaises(ValueError):
+            materialize(ROWS, DESCRIPTION, result_format="excel")
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_arrow_result(self):
+        table = materialize(ROWS, DESCRIPTION, result_format="arrow")
+
+        self.assertEqual(table.schema.field("id").type, pyarrow.int32())
+        self.assertTrue(pyarrow.types.is_decimal(table.schema.field("amount").type))
+        self.assertEqual(table.schema.field("joined").type, pyarrow.date32())
+        self.assertEqual(table.column("active").null_count, 1)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_arrow_numeric_as_float(self):
+        table = materialize(ROWS, DESCRIPTION, "arrow", numeric_as_float=True)
+
+        self.assertEqual(table.schema.field("amount").type, pyarrow.float64())
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_convert_dataframe_to_arrow(self):
+        table = convert_dataframe(pd.DataFrame({"id": [1, 2]}), "arrow")
+
+        self.assertEqual(table.column_names, ["id"])
+        self.assertEqual(table.num_rows, 2)
+
+    @unittest.skipIf(polars is None, "polars is not installed")
+    def test_polars_result(self):
+        df = materialize(ROWS, DESCRIPTION, result_format="polars")
+
+        self.assertEqual(df.columns, [name for name, _ in DESCRIPTION])
+        self.assertEqual(df["id"].dtype, polars.Int32)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import re
+import sys
+import threading
+import unittest
+from unittest.mock import Mock
+
+from pandas import DataFrame
+
+# Add the absolute path of the root folder to Python path
+root_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(root_folder)
+
+from pipableai.core.schema_catalog import SchemaCatalog
+from pipableai.interfaces.database_connector_interface import DatabaseConnectorInterface
+
+# Columns of the fake database, keyed by (schema, table)
+COLUMNS = {
+    ("public", "actor"): [("actor_id", "integer")],
+    ("sales", "orders"): [("order_id", "integer"), ("amount", "numeric")],
+    ("sales", "region"): [("name", "text")],
+    ("hr", "staff"): [("staff_id", "integer")],
+}
+
+
+def fake_execute_query(query):
+    if "pg_class" in query:
+        schemas = re.search(r"nspname IN \(([^)]*)\)", query).group(1)
+        rows = [
+            (schema, table, f"{schema}.{table}")
+            for schema, table in COLUMNS
+            if f"'{schema}'" in schemas
+        ]
+        return DataFrame(rows, columns=["table_schema", "table_name", "fingerprint"])
+    schema = re.search(r"table_schema = '(\w+)'", query).group(1)
+    rows = [
+        (table, column, data_type)
+        for (table_schema, table), columns in COLUMNS.items()
+        if table_schema == schema
+        for column, data_type in columns
+    ]
+    return DataFrame(rows, columns=["table_name", "column_name", "data_type"])
+
+
+def make_connector():
+    connector = Mock(spec=DatabaseConnectorInterface)
+    connector.execute_query.side_effect = fake_execute_query
+    return connector
+
+
+class TestSchemaCatalog(unittest.TestCase):
+    def setUp(self):
+        self.connector = make_connector()
+
+    def test_schemas_are_introspected_lazily(self):
+        catalog = SchemaCatalog(self.connector)
+
+        statements = catalog.table_statements(["actor", "sales.orders"], ["public"])
+
+        self.assertEqual(
+            statements,
+            [
+                "CREATE TABLE actor (actor_id integer)",
+                "CREATE TABLE sales.orders (order_id integer, amount numeric)",
+            ],
+        )
+        self.assertEqual(catalog.loaded_schemas, ["public", "sales"])
+        # The fingerprints and the columns of each schema
+        self.assertEqual(self.connector.execute_query.call_count, 4)
+
+        # Loaded schemas are served from memory
+        catalog.statements(["sales"])
+        self.assertEqual(self.connector.execute_query.call_count, 4)
+
+    def test_schemas_are_introspected_in_parallel(self):
+        pooled = []
+        threads = set()
+
+        def connector_factory():
+            connector = make_connector()
+
+            def execute_query(query):
+                threads.add(threading.get_ident())
+                return fake_execute_query(query)
+
+            connector.execute_query.side_effect = execute_query
+            pooled.append(connector)
+            return connector
+
+        catalog = SchemaCatalog(self.connector, connector_factory=connector_factory)
+
+        statements = catalog.statements(["public", "sales", "hr"])
+
+        self.assertEqual(len(statements), 4)
+        self.connector.execute_query.assert_not_called()
+        for connector in pooled:
+            connector.connect.assert_called_once()
+        catalog.close()
+        for connector in pooled:
+            connector.disconnect.assert_called_once()
+
+    def test_least_recently_used_schema_is_evicted(self):
+        catalog = SchemaCatalog(
+            self.connector, max_schemas=2, pinned_schemas=["public"]
+        )
+
+        catalog.statements(["public"])
+        catalog.statements(["sales"])
+        catalog.statements(["hr"])
+
+        self.assertEqual(catalog.loaded_schemas, ["public", "hr"])
+
+
+if __name__ == "__main__":
+    unittest.main()
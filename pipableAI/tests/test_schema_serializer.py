@@ -0,0 +1,90 @@
+import os
+import sys
+import unittest
+
+# Add the absolute path of the root folder to Python path
+root_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(root_folder)
+
+from pipableai.core.schema_serializer import SchemaSerializer, compact_statement
+
+SALES_COLUMNS = (
+    "id integer, amount numeric, sold_at timestamp without time zone, "
+    "store character varying"
+)
+STATEMENTS = [
+    f"CREATE TABLE sales_2021 ({SALES_COLUMNS})",
+    f"CREATE TABLE sales_2022 ({SALES_COLUMNS})",
+    "CREATE TABLE stores (id integer, name text)",
+]
+
+
+class TestSchemaSerializer(unittest.TestCase):
+    def test_types_are_aliased(self):
+        self.assertEqual(
+            compact_statement(STATEMENTS[0]),
+            ("sales_2021", "id integer,amount numeric,sold_at timestamp,store varchar"),
+        )
+
+    def test_repeated_column_lists_are_kept_by_default(self):
+        context = SchemaSerializer().serialize(STATEMENTS)
+
+        self.assertNotIn("LIKE", context)
+        self.assertEqual(
+            context.split(";")[1],
+            "CREATE TABLE sales_2022 "
+            "(id integer,amount numeric,sold_at timestamp,store varchar)",
+        )
+
+    def test_repeated_column_lists_are_deduplicated(self):
+        context = SchemaSerializer(deduplicate=True).serialize(STATEMENTS)
+
+        self.assertEqual(
+            context.split(";"),
+            [
+                "CREATE TABLE sales_2021 "
+                "(id integer,amount numeric,sold_at timestamp,store varchar)",
+                "CREATE TABLE sales_2022 (LIKE sales_2021)",
+                "CREATE TABLE stores (id integer,name text)",
+            ],
+        )
+        self.assertLess(len(context), len(";".join(STATEMENTS)))
+
+    def test_budget_keeps_the_most_relevant_tables(self):
+        serializer = SchemaSerializer(max_tokens=20)
+
+        context = serializer.serialize(STATEMENTS, "What are the store names?")
+
+        self.assertEqual(context, "CREATE TABLE stores (id integer,name text)")
+
+    def test_budget_keeps_the_original_order(self):
+        serializer = SchemaSerializer(
+            max_tokens=10, token_counter=lambda text: 1, deduplicate=True
+        )
+
+        context = serializer.serialize(list(reversed(STATEMENTS)), "stores")
+
+        self.assertTrue(context.startswith("CREATE TABLE stores"))
+        self.assertIn("(LIKE sales_2022)", context)
+
+    def test_token_counts_are_cached_per_table(self):
+        counted = []
+
+        def token_counter(text):
+            counted.append(text)
+            return len(text.split())
+
+        serializer = SchemaSerializer(max_tokens=1000, token_counter=token_counter)
+        serializer.serialize(STATEMENTS, "one")
+        serializer.serialize(STATEMENTS, "two")
+
+        self.assertEqual(len(counted), len(STATEMENTS))
+
+    def test_other_statements_are_kept(self):
+        context = SchemaSerializer().serialize(["CREATE VIEW v AS SELECT 1"])
+
+        self.assertEqual(context, "CREATE VIEW v AS SELECT 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
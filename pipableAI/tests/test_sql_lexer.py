@@ -0,0 +1,54 @@
+import os
+import sys
+import unittest
+
+# Add the absolute path of the root folder to Python path
+root_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(root_folder)
+
+from pipableai.core.sql_lexer import (
+    SQLLexerError,
+    is_read_only_query,
+    referenced_tables,
+    tokenize_sql,
+)
+
+
+class TestSqlLexer(unittest.TestCase):
+    def test_tokenize_skips_comments_and_keeps_literals(self):
+        tokens = tokenize_sql("SELECT 'it''s', 1.5 -- note\n/* block */ FROM t")
+        self.assertEqual(
+            [(token.kind, token.text) for token in tokens],
+            [
+                ("word", "SELECT"),
+                ("string", "'it''s'"),
+                ("punctuation", ","),
+                ("number", "1.5"),
+                ("word", "FROM"),
+                ("word", "t"),
+            ],
+        )
+
+    def test_tokenize_rejects_unterminated_string(self):
+        with self.assertRaises(SQLLexerError):
+            tokenize_sql("SELECT 'oops FROM t")
+
+    def test_referenced_tables(self):
+        query = (
+            "WITH recent AS (SELECT * FROM rental) "
+            'SELECT EXTRACT(YEAR FROM r.rental_date) FROM recent r JOIN "Customer" c '
+            "ON r.customer_id = c.customer_id, sales.store s "
+            "WHERE r.staff_id IN (SELECT staff_id FROM staff)"
+        )
+        self.assertEqual(
+            referenced_tables(query), {"rental", "Customer", "sales.store", "staff"}
+        )
+
+    def test_is_read_only_query(self):
+        self.assertTrue(is_read_only_query("SELECT * FROM actor;"))
+        self.assertFalse(is_read_only_query("DELETE FROM actor"))
+        self.assertFalse(is_read_only_query("SELECT 1; DROP TABLE actor"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import unittest
+from decimal import Decimal
+
+# Add the absolute path of the root folder to Python path
+root_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(root_folder)
+
+from pipableai.core.sql_parameterizer import parameterize_query
+
+
+class TestParameterizeQuery(unittest.TestCase):
+    def test_literals_become_parameters(self):
+        shape, params = parameterize_query(
+            "SELECT sum(amount) FROM payment WHERE region = 'North''s' "
+            "AND amount > 1.5 AND customer_id IN (1, 2) LIMIT 10"
+        )
+
+        self.assertEqual(
+            shape,
+            "SELECT sum(amount) FROM payment WHERE region = $1 "
+            "AND amount > $2::numeric AND customer_id IN ($3::integer, $4::integer) "
+            "LIMIT $5::integer",
+        )
+        self.assertEqual(params, ["North's", Decimal("1.5"), 1, 2, 10])
+
+    def test_same_shape_for_different_literals(self):
+        first, _ = parameterize_query("SELECT * FROM city WHERE country_id = 1")
+        second, _ = parameterize_query("SELECT * FROM city WHERE country_id = 42")
+        self.assertEqual(first, second)
+
+    def test_structural_literals_are_kept(self):
+        query = (
+            "SELECT 'total', amount::numeric(10, 2) FROM payment "
+            "WHERE payment_date > DATE '2007-01-01' ORDER BY 2 DESC, 1"
+        )
+        self.assertEqual(parameterize_query(query), (query, []))
+
+    def test_function_arguments_in_the_select_list_are_kept(self):
+        shape, params = parameterize_query(
+            "SELECT DATE_TRUNC('month', payment_date), sum(amount) FROM payment "
+            "WHERE amount > 5 GROUP BY DATE_TRUNC('month', payment_date) "
+            "ORDER BY DATE_TRUNC('month', payment_date)"
+        )
+
+        self.assertEqual(
+            shape,
+            "SELECT DATE_TRUNC('month', payment_date), sum(amount) FROM payment "
+            "WHERE amount > $1::integer GROUP BY DATE_TRUNC('month', payment_date) "
+            "ORDER BY DATE_TRUNC('month', payment_date)",
+        )
+        self.assertEqual(params, [5])
+
+    def test_subqueries_in_the_select_list_are_parameterized(self):
+        shape, params = parameterize_query(
+            "SELECT (SELECT count(*) FROM rental WHERE customer_id = 1) FROM customer"
+        )
+
+        self.assertEqual(
+            shape,
+            "SELECT (SELECT count(*) FROM rental WHERE customer_id = $1::integer) "
+            "FROM customer",
+        )
+        self.assertEqual(params, [1])
+
+    def test_numeric_placeholders_keep_the_type_of_their_literal(self):
+        shape, params = parameterize_query(
+            "SELECT * FROM t WHERE int_col > 2.5 AND big = 3000000000 "
+            "AND huge < 10000000000000000000"
+        )
+
+        # Untyped, 2.5 would be rounded to an integer and 3000000000 rejected as out of range
+        self.assertEqual(
+            shape,
+            "SELECT * FROM t WHERE int_col > $1::numeric AND big = $2::bigint "
+            "AND huge < $3::numeric",
+        )
+        self.assertEqual(params, [Decimal("2.5"), 3000000000, 10000000000000000000])
+
+    def test_write_queries_are_not_parameterized(self):
+        self.assertIsNone(parameterize_query("DELETE FROM payment WHERE amount = 0"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import sys
+import unittest
+
+# Add the absolute path of the root folder to Python path
+root_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(root_folder)
+
+from pipableai.core.sql_validator import SQLValidationError, SQLValidator
+
+
+class TestSQLValidator(unittest.TestCase):
+    def setUp(self):
+        self.validator = SQLValidator.from_create_statements(
+            [
+                "CREATE TABLE actor (actor_id integer, first_name character varying, last_update timestamp without time zone)",
+                "CREATE TABLE film_actor (actor_id integer, film_id integer)",
+            ]
+        )
+
+    def test_valid_query(self):
+        query = (
+            "SELECT a.first_name, count(*) AS films FROM actor a "
+            "JOIN film_actor fa ON fa.actor_id = a.actor_id "
+            "WHERE EXTRACT(YEAR FROM last_update) = 2006 "
+            "GROUP BY a.first_name ORDER BY films DESC LIMIT 10"
+        )
+        self.assertEqual(self.validator.validate(query), [])
+
+    def test_syntax_error(self):
+        issues = self.validator.validate("SELECT first_name, FROM actor")
+        self.assertEqual([issue.kind for issue in issues], ["syntax"])
+
+    def test_unknown_table_and_column(self):
+        with self.assertRaises(SQLValidationError) as context:
+            self.validator.check(
+                "SELECT a.last_name FROM actor a JOIN films f ON 1 = 1"
+            )
+
+        self.assertEqual(
+            sorted(issue.kind for issue in context.exception.issues),
+            ["unknown_column", "unknown_table"],
+        )
+
+    def test_unqualified_unknown_column(self):
+        issues = self.validator.validate("SELECT firstname FROM actor")
+        self.assertEqual(issues[0].message, "Column firstname does not exist")
+
+    def test_insert(self):
+        self.assertEqual(
+            self.validator.validate(
+                "INSERT INTO actor (actor_id, first_name) VALUES (1, 'Nick') "
+                "ON CONFLICT (actor_id) DO UPDATE SET first_name = EXCLUDED.first_name"
+            ),
+            [],
+        )
+        issues = self.validator.validate(
+            "INSERT INTO actor (actor_id, last_name) VALUES (1, 'Nick')"
+        )
+        self.assertEqual(
+            [issue.message for issue in issues], ["Column last_name does not exist"]
+        )
+
+    def test_update(self):
+        self.assertEqual(
+            self.validator.validate(
+                "UPDATE actor SET first_name = 'Nick' WHERE actor_id = 1"
+            ),
+            [],
+        )
+        self.assertEqual(
+            self.validator.validate(
+                "UPDATE public.actor a SET first_name = 'Nick' FROM film_actor fa "
+                "WHERE fa.actor_id = a.actor_id"
+            ),
+            [],
+        )
+        issues = self.validator.validate("UPDATE actors SET first_name = 'Nick'")
+        self.assertEqual([issue.kind for issue in issues], ["unknown_table"])
+
+    def test_empty_catalog_only_checks_syntax(self):
+        validator = SQLValidator({})
+        self.assertEqual(validator.validate("SELECT * FROM Employees;"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import sys
+import unittest
+
+from pandas import DataFrame
+
+# Add the absolute path of the root folder to Python path
+root_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(root_folder)
+
+from pipableai.core.sqlite_connector import SQLiteConfig, SQLiteConnector
+
+
+class TestSQLiteConnector(unittest.TestCase):
+    def setUp(self):
+        self.connector = SQLiteConnector(SQLiteConfig(database=":memory:"))
+        self.connector.connect()
+
+    def tearDown(self):
+        self.connector.disconnect()
+
+    def test_execute_query(self):
+        self.connector.load_dataframe(
+            "actor", DataFrame({"actor_id": [1, 2], "first_name": ["Penelope", "Nick"]})
+        )
+
+        result_df = self.connector.execute_query(
+            "SELECT first_name FROM actor ORDER BY actor_id"
+        )
+
+        self.assertEqual(list(result_df["first_name"]), ["Penelope", "Nick"])
+
+    def test_execute_query_error(self):
+        with self.assertRaises(ValueError):
+            self.connector.execute_query("SELECT * FROM missing_table")
+
+    def test_execute_query_timeout(self):
+        endless = (
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) "
+            "SELECT max(i) FROM n"
+        )
+        with self.assertRaises(TimeoutError):
+            self.connector.execute_query(endless, timeout=0.05)
+
+        # The connection is usable again without a timeout
+        result_df = self.connector.execute_query("SELECT 1 AS one")
+        self.assertEqual(list(result_df["one"]), [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import sys
+import unittest
+
+# Add the absolute path of the root folder to Python path
+root_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(root_folder)
+
+from pipableai.llm_client import transport
+
+CONTEXT = ";".join(
+    f"CREATE TABLE table_{i} (id integer, name text, created_at timestamp)"
+    for i in range(100)
+)
+
+
+class TestTransport(unittest.TestCase):
+    def test_json_round_trip(self):
+        data = {"context": CONTEXT, "question": "How many rows?"}
+
+        body = transport.serialize(data, transport.JSON)
+
+        self.assertEqual(
+            transport.deserialize(body, "application/json; charset=utf-8"), data
+        )
+
+    @unittest.skipIf(transport.msgpack is None, "msgpack is not installed")
+    def test_msgpack_round_trip_is_smaller_than_json(self):
+        data = {
+            "context": CONTEXT,
+            "question": "How many rows?",
+            "generated_tokens": 12,
+        }
+
+        body = transport.serialize(data, transport.MSGPACK)
+
+        self.assertEqual(transport.deserialize(body, transport.MSGPACK), data)
+        self.assertLess(len(body), len(transport.serialize(data, transport.JSON)))
+
+    def test_large_bodies_are_compressed(self):
+        body, headers = transport.encode_request({"context": CONTEXT}, transport.JSON)
+
+        encoding = headers["Content-Encoding"]
+        self.assertEqual(encoding, transport.content_encodings()[0])
+        self.assertEqual(
+            transport.deserialize(transport.decompress(body, encoding), transport.JSON),
+            {"context": CONTEXT},
+        )
+
+    def test_small_bodies_are_not_compressed(self):
+        body, headers = transport.encode_request({"question": "One?"}, transport.JSON)
+
+        self.assertNotIn("Content-Encoding", headers)
+        self.assertEqual(
+            transport.deserialize(body, transport.JSON), {"question": "One?"}
+        )
+
+    def test_gzip_round_trip(self):
+        body = transport.serialize({"context": CONTEXT}, transport.JSON)
+
+        compressed = transport.compress(body, transport.GZIP)
+
+        self.assertLess(len(compressed), len(body))
+        self.assertEqual(transport.decompress(compressed, transport.GZIP), body)
+
+    @unittest.skipIf(transport.zstandard is None, "zstandard is not installed")
+    def test_zstd_round_trip(self):
+        body = transport.serialize({"context": CONTEXT}, transport.JSON)
+
+        compressed = transport.compress(body, transport.ZSTD)
+
+        self.assertLess(len(compressed), len(body))
+        self.assertEqual(transport.decompress(compressed, transport.ZSTD), body)
+
+    def test_already_decoded_bodies_are_returned_unchanged(self):
+        body = transport.serialize({"question": "One?"}, transport.JSON)
+
+        self.assertEqual(transport.decompress(body, transport.GZIP), body)
+        self.assertEqual(transport.decompress(body, transport.ZSTD), body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Admission control of the server, configured with environment variables:
+#   PIPABLE_MAX_QUEUE               requests waiting for the model before new ones are
+#                                   rejected with 503 (16)
+#   PIPABLE_MAX_CLIENT_CONCURRENCY  requests of one client, waiting or running, before
+#                                   its new ones are rejected with 429 (2)
+#   PIPABLE_DRAIN_TIMEOUT           seconds in-flight requests get to finish on shutdown (30)
+# Clients are told apart by the X-Client-Id header, or by their address without it.
+# X-Request-Timeout carries the seconds the client still waits for the answer, requests
+# which cannot be answered in time are dropped with 504.
+DEADLINE_HEADER = "X-Request-Timeout"
+MAX_QUEUE_ENV = "PIPABLE_MAX_QUEUE"
+MAX_CLIENT_CONCURRENCY_ENV = "PIPABLE_MAX_CLIENT_CONCURRENCY"
+DRAIN_TIMEOUT_ENV = "PIPABLE_DRAIN_TIMEOUT"
+
+
+class Rejected(Exception):
+    """
+    A request which was not admitted, with the HTTP status and the seconds after
+    which the client should retry.
+    """
+
+    def __init__(self, status, message, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """
+    A request whose client stopped waiting before it could be answered.
+    """
+
+    status = 504
+
+
+def request_deadline(headers):
+    """
+    Return the time.monotonic() deadline of a request from its X-Request-Timeout
+    header, or None when it has no deadline.
+
+    Raises ValueError when the header is not a number of seconds.
+    """
+    value = headers.get(DEADLINE_HEADER)
+    if value is None:
+        return None
+    try:
+        return time.monotonic() + float(value)
+    except ValueError:
+        raise ValueError(f"{DEADLINE_HEADER} must be a number of seconds, not {value!r}")
+
+
+def remaining_seconds(deadline):
+    """
+    Return the seconds left until deadline, raising DeadlineExceeded when none are.
+    """
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("The request deadline passed.")
+    return remaining
+
+
+class AdmissionController:
+    """
+    Admit requests to the model, which runs one request at a time.
+
+    Admitted requests wait in a bounded queue for the model lock. Requests are
+    rejected right away instead of queuing until the client times out: with 503
+    when the queue is full or the server is draining, with 429 when their client
+    already has max_client_concurrency requests in flight. Retry-After is estimated
+    from the average time the model spends on a request and the requests ahead.
+    Requests with a deadline only wait for the model until it passes, and are then
+    dropped with DeadlineExceeded instead of running for a client that has left.
+    """
+
+    def __init__(self, max_queue=16, max_client_concurrency=2):
+        self.max_queue = max_queue
+        self.max_client_concurrency = max_client_concurrency
+        self.model_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.draining = False
+        self.waiting = 0
+        self.running = 0
+        self.client_requests = defaultdict(int)
+        self.service_seconds = 1.0
+        self.counts = {
+            "admitted": 0,
+            "rejected_queue_full": 0,
+            "rejected_client_limit": 0,
+            "rejected_draining": 0,
+            "expired_in_queue": 0,
+        }
+
+    def _retry_after(self, requests_ahead):
+        return max(1, math.ceil(self.service_seconds * max(1, requests_ahead)))
+
+    def _admit(self, client_id):
+        with self.lock:
+            if self.draining:
+                self.counts["rejected_draining"] += 1
+                raise Rejected(503, "The server is shutting down.", self._retry_after(self.running))
+            if self.client_requests[client_id] >= self.max_client_concurrency:
+                self.counts["rejected_client_limit"] += 1
+                raise Rejected(
+                    429,
+                    f"Too many concurrent requests, at most {self.max_client_concurrency} per client.",
+                    self._retry_after(self.client_requests[client_id]),
+                )
+            if self.waiting >= self.max_queue:
+                self.counts["rejected_queue_full"] += 1
+                raise Rejected(
+                    503, "The server is overloaded.", self._retry_after(self.waiting + self.running)
+                )
+            self.waiting += 1
+            self.client_requests[client_id] += 1
+            self.counts["admitted"] += 1
+
+    def _release(self, client_id, elapsed):
+        with self.lock:
+            if elapsed is None:
+                self.waiting -= 1
+            else:
+                self.running -= 1
+                # Exponential moving average of the time a request holds the model
+                self.service_seconds = 0.8 * self.service_seconds + 0.2 * elapsed
+            self.client_requests[client_id] -= 1
+            if not self.client_requests[client_id]:
+                del self.client_requests[client_id]
+            if not self.waiting and not self.running:
+                self.idle.notify_all()
+
+    @contextmanager
+    def admit(self, client_id, deadline=None):
+        """
+        Admit a request of client_id and hold the model for it, or raise Rejected.
+
+        Raises DeadlineExceeded when the time.monotonic() deadline passes before the
+        model is free.
+        """
+        self._admit(client_id)
+        start = None
+        try:
+            if deadline is None:
+                self.model_lock.acquire()
+            elif not self.model_lock.acquire(timeout=max(0, deadline - time.monotonic())):
+                with self.lock:
+                    self.counts["expired_in_queue"] += 1
+                raise DeadlineExceeded("The request deadline passed while it was queued.")
+            with self.lock:
+                self.waiting -= 1
+                self.running += 1
+            start = time.monotonic()
+            yield
+        finally:
+            if start is None:
+                self._release(client_id, None)
+            else:
+                self._release(client_id, time.monotonic() - start)
+                self.model_lock.release()
+
+    def drain(self, timeout=30):
+        """
+        Reject new requests and wait up to timeout seconds for the admitted ones to
+        finish. Returns whether all of them finished.
+        """
+        with self.lock:
+            self.draining = True
+            return self.idle.wait_for(lambda: not self.waiting and not self.running, timeout)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "waiting": self.waiting,
+                "running": self.running,
+                "max_queue": self.max_queue,
+                "max_client_concurrency": self.max_client_concurrency,
+                "draining": self.draining,
+                "average_service_seconds": round(self.service_seconds, 3),
+                **self.counts,
+            }
+
+
+def create_admission_controller():
+    """
+    Create the admission controller configured by the PIPABLE_MAX_* variables.
+    """
+    return AdmissionController(
+        max_queue=int(os.environ.get(MAX_QUEUE_ENV, 16)),
+        max_client_concurrency=int(os.environ.get(MAX_CLIENT_CONCURRENCY_ENV, 2)),
+    )
+
+
+def drain_timeout():
+    return float(os.environ.get(DRAIN_TIMEOUT_ENV, 30))
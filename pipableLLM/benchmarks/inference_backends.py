@@ -0,0 +1,123 @@
+"""
+Compare the latency and memory of the inference backends on a small model.
+
+Loads the model with every requested backend, generates a fixed number of tokens
+for a few text-to-SQL prompts and reports the load time, the p50/p95 generation
+latency, the generated tokens/sec and the memory of the model weights. Without
+--model a randomly initialized small Llama model is used, which is enough to
+compare the backends but not the output quality.
+
+    python benchmarks/inference_backends.py --tokenizer ./checkpoints/base-llama-7b-chat-hf
+    python benchmarks/inference_backends.py --model <PATH> --backends cpu_fp32 cpu_int8 cuda_bf16
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import torch
+from transformers import AutoTokenizer, LlamaConfig, LlamaForCausalLM
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from evaluation import percentile
+from inference_backends import create_backend
+from prompt_renderer import render_prompt
+
+PROMPTS = [
+    ("CREATE TABLE employees (id INT, name TEXT, department TEXT, salary NUMERIC)",
+     "What is the average salary per department?"),
+    ("CREATE TABLE orders (id INT, customer_id INT, amount NUMERIC, created_at DATE);"
+     "CREATE TABLE customers (id INT, name TEXT, country TEXT)",
+     "Which customers from Germany ordered for more than 1000 in total?"),
+    ("CREATE TABLE products (id INT, name TEXT, price NUMERIC, stock INT)",
+     "List the five most expensive products that are out of stock."),
+]
+
+
+def small_llama(path, vocab_size):
+    config = LlamaConfig(
+        vocab_size=vocab_size,
+        hidden_size=512,
+        intermediate_size=1376,
+        num_hidden_layers=6,
+        num_attention_heads=8,
+        max_position_embeddings=2048,
+    )
+    torch.manual_seed(0)
+    LlamaForCausalLM(config).save_pretrained(path)
+
+
+def weights_mb(model):
+    """
+    Size of the serialized weights, which includes the packed int8 weights of
+    dynamically quantized layers that parameters() does not report.
+    """
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 2**20
+
+
+def benchmark(backend, model_path, tokenizer, max_new_tokens, repeats):
+    start = time.perf_counter()
+    model = backend.load_model(model_path)
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    generated = 0
+    for _ in range(repeats):
+        for context, question in PROMPTS:
+            inputs = tokenizer([render_prompt(context, question)], return_tensors="pt").to(
+                backend.device
+            )
+            start = time.perf_counter()
+            with torch.no_grad():
+                output = model.generate(
+                    **inputs,
+                    max_new_tokens=max_new_tokens,
+                    min_new_tokens=max_new_tokens,
+                    do_sample=False,
+                )
+            if backend.device == "cuda":
+                torch.cuda.synchronize()
+            latencies.append(time.perf_counter() - start)
+            generated += output.shape[1] - inputs["input_ids"].shape[1]
+            backend.release_memory()
+
+    return {
+        "backend": backend.name,
+        "load_seconds": round(load_seconds, 2),
+        "latency_p50_seconds": round(percentile(latencies, 50), 4),
+        "latency_p95_seconds": round(percentile(latencies, 95), 4),
+        "tokens_per_second": round(generated / sum(latencies), 1),
+        "weights_mb": round(weights_mb(model), 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the inference backends")
+    parser.add_argument("--model", help="Model to benchmark, defaults to a small random Llama model.")
+    parser.add_argument("--tokenizer", default="./checkpoints/base-llama-7b-chat-hf")
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=["cpu_fp32", "cpu_int8"] + (["cuda_bf16"] if torch.cuda.is_available() else []),
+    )
+    parser.add_argument("--threads", type=int, default=None, help="Threads of the CPU backends.")
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer, use_fast=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_path = args.model
+        if model_path is None:
+            model_path = os.path.join(tmp_dir, "small-llama")
+            small_llama(model_path, len(tokenizer))
+
+        for name in args.backends:
+            backend = create_backend(name, num_threads=args.threads)
+            print(json.dumps(benchmark(backend, model_path, tokenizer, args.max_new_tokens, args.repeats)))
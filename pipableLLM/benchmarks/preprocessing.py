@@ -0,0 +1,118 @@
+"""
+Benchmark the preprocessing of a training dataset.
+
+Compares the previous path, rendering and encoding one example at a time with the
+slow sentencepiece tokenizer, with batched rendering and encoding by the fast
+tokenizer through datasets.map(batched=True, num_proc=N).
+
+    python benchmarks/preprocessing.py --tokenizer ./checkpoints/base-llama-7b-chat-hf
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from datasets import load_dataset
+from transformers import AutoTokenizer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_preprocessor import DataProcessor, PROMPT_TEMPLATE_VERSION
+from dataset_cache import TokenizedDatasetCache
+
+COLUMN_TYPES = ["integer", "varchar", "text", "date", "numeric", "boolean"]
+
+
+def synthetic_example(rng, index):
+    tables = []
+    for t in range(rng.randint(1, 3)):
+        columns = ", ".join(
+            f"col_{c} {rng.choice(COLUMN_TYPES)}" for c in range(rng.randint(3, 12))
+        )
+        tables.append(f"CREATE TABLE table_{index % 500}_{t} ({columns})")
+    return {
+        "context": "; ".join(tables),
+        "question": f"How many rows of table_{index % 500}_0 have col_1 above {index}?",
+        "answer": f"SELECT COUNT(*) FROM table_{index % 500}_0 WHERE col_1 > {index}",
+    }
+
+
+def write_dataset(path, n_examples, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for i in range(n_examples):
+            f.write(json.dumps(synthetic_example(rng, i)) + "\n")
+
+
+def sequential_tokenization(processor, tokenizer, dataset):
+    total_tokens = 0
+    for example in dataset:
+        total_tokens += len(tokenizer(processor.prepare_sample_text(example))["input_ids"])
+    return total_tokens
+
+
+def batched_tokenization(processor, tokenizer, dataset, num_proc, cache_dir):
+    cache = TokenizedDatasetCache(
+        cache_dir, tokenizer, 1024, PROMPT_TEMPLATE_VERSION, num_proc=num_proc
+    )
+    tokenized = cache.tokenize(dataset, processor.prepare_sample_text)
+    return sum(len(ids) for ids in tokenized["input_ids"])
+
+
+def report(name, n_examples, n_tokens, seconds, baseline=None):
+    line = (
+        f"{name:<32} {seconds:8.2f} s {n_examples / seconds:10.0f} examples/s"
+        f" {n_tokens / seconds:12.0f} tokens/s"
+    )
+    if baseline is not None:
+        line += f"   x{baseline / seconds:.1f}"
+    print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark training data preprocessing")
+    parser.add_argument("--tokenizer", default="./checkpoints/base-llama-7b-chat-hf")
+    parser.add_argument("--examples", type=int, default=100000)
+    parser.add_argument("--num-proc", type=int, default=min(8, os.cpu_count() or 1))
+    parser.add_argument(
+        "--skip-sequential",
+        action="store_true",
+        help="Only run the batched path, the sequential one takes minutes on 100k examples.",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dataset_path = os.path.join(tmp_dir, "dataset.json")
+        write_dataset(dataset_path, args.examples)
+        dataset = load_dataset("json", data_files={"train": dataset_path})["train"]
+
+        slow_tokenizer = AutoTokenizer.from_pretrained(args.tokenizer, use_fast=False)
+        fast_tokenizer = AutoTokenizer.from_pretrained(args.tokenizer, use_fast=True)
+        processor = DataProcessor.__new__(DataProcessor)
+        print(f"{args.examples} examples, {args.num_proc} processes")
+
+        baseline = None
+        if not args.skip_sequential:
+            start = time.perf_counter()
+            n_tokens = sequential_tokenization(processor, slow_tokenizer, dataset)
+            baseline = time.perf_counter() - start
+            report("sequential, slow tokenizer", args.examples, n_tokens, baseline)
+
+        for name, tokenizer, num_proc in [
+            ("batched, fast tokenizer", fast_tokenizer, None),
+            (f"batched x{args.num_proc}, fast tokenizer", fast_tokenizer, args.num_proc),
+        ]:
+            start = time.perf_counter()
+            n_tokens = batched_tokenization(
+                processor, tokenizer, dataset, num_proc, os.path.join(tmp_dir, "cache")
+            )
+            report(name, args.examples, n_tokens, time.perf_counter() - start, baseline)
+
+        for name, tokenizer in [("slow", slow_tokenizer), ("fast", fast_tokenizer)]:
+            processor.tokenizer = tokenizer
+            start = time.perf_counter()
+            processor.chars_token_ratio(dataset)
+            print(f"chars_token_ratio, {name} tokenizer: {time.perf_counter() - start:.3f} s")
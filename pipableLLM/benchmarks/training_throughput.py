@@ -0,0 +1,116 @@
+"""
+CPU smoke benchmark of the fine-tuning pipeline.
+
+Trains a tiny, randomly initialized Llama model through the same SFT and
+DataProcessor path as the /train endpoint with the "cpu_smoke" training profile,
+and reports the training throughput in tokens/sec and the peak host memory. The
+numbers are only comparable between runs on the same machine, they are meant to
+catch throughput regressions of the data and training pipeline without a GPU.
+
+    python benchmarks/training_throughput.py --tokenizer ./checkpoints/base-llama-7b-chat-hf
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import torch
+from transformers import AutoTokenizer, LlamaConfig, LlamaForCausalLM, TrainerCallback
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.preprocessing import write_dataset
+from sft import SFT
+
+
+class StepTimer(TrainerCallback):
+    """
+    Time the optimizer steps after the first one, which includes one-off setup work.
+    """
+
+    def __init__(self):
+        self.start = None
+        self.end = None
+        self.steps = 0
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if self.start is None:
+            self.start = time.perf_counter()
+        else:
+            self.steps += 1
+        self.end = time.perf_counter()
+        return control
+
+
+def tiny_llama(vocab_size):
+    config = LlamaConfig(
+        vocab_size=vocab_size,
+        hidden_size=128,
+        intermediate_size=344,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        max_position_embeddings=2048,
+    )
+    return LlamaForCausalLM(config)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU smoke benchmark of SFT training throughput")
+    parser.add_argument("--tokenizer", default="./checkpoints/base-llama-7b-chat-hf")
+    parser.add_argument("--examples", type=int, default=2000)
+    parser.add_argument("--profile", default="cpu_smoke")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer, use_fast=True, add_eos_token=True)
+    tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "right"
+    model = tiny_llama(len(tokenizer))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dataset_path = os.path.join(tmp_dir, "dataset.json")
+        write_dataset(dataset_path, args.examples)
+
+        start = time.perf_counter()
+        sft = SFT(
+            model,
+            tokenizer,
+            dataset_path,
+            os.path.join(tmp_dir, "run"),
+            profile=args.profile,
+            cache_dir=os.path.join(tmp_dir, "tokenized"),
+        )
+        setup_seconds = time.perf_counter() - start
+
+        timer = StepTimer()
+        sft.trainer.add_callback(timer)
+        sft.train(resume=False)
+
+    profile = sft.profile
+    tokens_per_step = (
+        profile["per_device_train_batch_size"]
+        * profile["gradient_accumulation_steps"]
+        * profile["seq_length"]
+    )
+    train_seconds = timer.end - timer.start
+    print(
+        json.dumps(
+            {
+                "profile": args.profile,
+                "data_preparation_seconds": round(setup_seconds, 3),
+                "timed_steps": timer.steps,
+                "train_seconds": round(train_seconds, 3),
+                "tokens_per_second": round(timer.steps * tokens_per_step / train_seconds, 1),
+                # ru_maxrss is reported in kilobytes on Linux
+                "peak_memory_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            },
+            indent=2,
+        )
+    )
@@ -0,0 +1,113 @@
+"""
+Benchmark the encodings of /generate requests and responses.
+
+Builds the context of a database with --tables tables, the way Pipable sends it, and
+reports for every content type and compression the bytes of a request and a response
+on the wire and the time per request to encode them on one side and decode them on
+the other.
+
+    python benchmarks/transport.py --tables 50 500 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transport import (
+    JSON,
+    MIN_COMPRESS_BYTES,
+    MSGPACK,
+    compress,
+    content_encodings,
+    content_types,
+    decompress,
+    deserialize,
+    serialize,
+)
+
+COLUMN_TYPES = ["integer", "character varying", "text", "date", "numeric", "boolean", "timestamp"]
+
+
+def wide_context(tables, seed=0):
+    rng = random.Random(seed)
+    statements = []
+    for t in range(tables):
+        columns = ", ".join(
+            f"column_{c} {rng.choice(COLUMN_TYPES)}" for c in range(rng.randint(5, 40))
+        )
+        statements.append(f"CREATE TABLE public.table_{t} ({columns})")
+    return ";".join(statements)
+
+
+def measure(payload, content_type, encoding, repeats):
+    """
+    Return the encoded size and the encode and decode time of payload in seconds.
+    """
+    compressed = bool(encoding) and len(serialize(payload, content_type)) >= MIN_COMPRESS_BYTES
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        body = serialize(payload, content_type)
+        if compressed:
+            body = compress(body, encoding)
+    encode_seconds = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        deserialize(decompress(body, encoding) if compressed else body, content_type)
+    decode_seconds = (time.perf_counter() - start) / repeats
+    return len(body), encode_seconds, decode_seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the /generate encodings")
+    parser.add_argument("--tables", type=int, nargs="+", default=[50, 500, 2000])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    variants = [
+        (content_type, encoding)
+        for content_type in reversed(content_types())
+        for encoding in [None] + content_encodings()
+    ]
+    if MSGPACK not in content_types():
+        print("msgpack is not installed, only JSON is measured")
+
+    for tables in args.tables:
+        request = {
+            "context": wide_context(tables),
+            "question": "What is the total of column_3 per column_1?",
+        }
+        response = {
+            "output": "SELECT column_1, SUM(column_3) FROM public.table_7 GROUP BY column_1",
+            "generated_tokens": 24,
+        }
+        baseline = None
+        for content_type, encoding in variants:
+            request_bytes, request_encode, request_decode = measure(
+                request, content_type, encoding, args.repeats
+            )
+            response_bytes, response_encode, response_decode = measure(
+                response, content_type, encoding, args.repeats
+            )
+            wire_bytes = request_bytes + response_bytes
+            if content_type == JSON and encoding is None:
+                baseline = wire_bytes
+            print(
+                json.dumps(
+                    {
+                        "tables": tables,
+                        "content_type": content_type,
+                        "content_encoding": encoding or "identity",
+                        "request_bytes": request_bytes,
+                        "response_bytes": response_bytes,
+                        "wire_bytes_vs_json": round(wire_bytes / baseline, 3),
+                        "client_ms": round((request_encode + response_decode) * 1000, 3),
+                        "server_ms": round((request_decode + response_encode) * 1000, 3),
+                    }
+                )
+            )
@@ -0,0 +1,150 @@
+"""
+Compare the latency of the first request after boot with the steady-state latency.
+
+Every configuration runs in a fresh process, which loads the model, optionally
+compiles it (--compile, as PIPABLE_COMPILE=1) and runs the startup warmup, then
+times the first request and --repeats more. Without --model a randomly initialized
+small Llama model is used.
+
+    python benchmarks/warmup.py --tokenizer ./checkpoints/base-llama-7b-chat-hf
+    python benchmarks/warmup.py --model <PATH> --backend cuda_bf16 --compile
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import torch
+from transformers import AutoTokenizer, LlamaConfig, LlamaForCausalLM
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from evaluation import percentile
+from inference_backends import create_backend
+from prompt_renderer import render_prompt
+from warmup import DEFAULT_LENGTH_BUCKETS, LengthBuckets, Warmup, compile_model, int_list
+
+PROMPTS = [
+    ("CREATE TABLE employees (id INT, name TEXT, department TEXT, salary NUMERIC)",
+     "What is the average salary per department?"),
+    ("CREATE TABLE orders (id INT, customer_id INT, amount NUMERIC, created_at DATE);"
+     "CREATE TABLE customers (id INT, name TEXT, country TEXT)",
+     "Which customers from Germany ordered for more than 1000 in total?"),
+]
+
+
+def small_llama(path, vocab_size):
+    config = LlamaConfig(
+        vocab_size=vocab_size,
+        hidden_size=512,
+        intermediate_size=1376,
+        num_hidden_layers=6,
+        num_attention_heads=8,
+        max_position_embeddings=2048,
+    )
+    torch.manual_seed(0)
+    LlamaForCausalLM(config).save_pretrained(path)
+
+
+def run(args):
+    """
+    Measure one configuration in this process.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer, use_fast=True)
+    tokenizer.pad_token = tokenizer.eos_token
+    backend = create_backend(args.backend)
+
+    start = time.perf_counter()
+    model = backend.load_model(args.model)
+    load_seconds = time.perf_counter() - start
+
+    length_buckets = None
+    if args.compile:
+        model = compile_model(model)
+        length_buckets = LengthBuckets(int_list(args.buckets), tokenizer.pad_token_id)
+
+    def generate(inputs):
+        if length_buckets is not None:
+            inputs = length_buckets.pad(inputs)
+        kwargs = {"cache_implementation": "static"} if length_buckets is not None else {}
+        model.generate(
+            **inputs,
+            max_new_tokens=args.max_new_tokens,
+            min_new_tokens=args.max_new_tokens,
+            do_sample=False,
+            **kwargs,
+        )
+        if backend.device == "cuda":
+            torch.cuda.synchronize()
+        backend.release_memory()
+
+    warmup_seconds = None
+    if args.warmup:
+        lengths = int_list(args.buckets if args.compile else args.warmup_lengths)
+        warmup = Warmup(lengths, [1])
+        warmup.run(generate, tokenizer, backend.device)
+        warmup_seconds = warmup.seconds
+
+    latencies = []
+    for i in range(args.repeats + 1):
+        context, question = PROMPTS[i % len(PROMPTS)]
+        inputs = tokenizer([render_prompt(context, question)], return_tensors="pt").to(backend.device)
+        start = time.perf_counter()
+        generate(dict(inputs))
+        latencies.append(time.perf_counter() - start)
+
+    first, steady = latencies[0], latencies[1:]
+    return {
+        "backend": backend.name,
+        "compile": args.compile,
+        "warmup": args.warmup,
+        "load_seconds": round(load_seconds, 2),
+        "warmup_seconds": warmup_seconds,
+        "first_request_seconds": round(first, 4),
+        "steady_p50_seconds": round(percentile(steady, 50), 4),
+        "steady_p95_seconds": round(percentile(steady, 95), 4),
+        "first_vs_steady": round(first / percentile(steady, 50), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare first-request and steady-state latency")
+    parser.add_argument("--model", help="Model to benchmark, defaults to a small random Llama model.")
+    parser.add_argument("--tokenizer", default="./checkpoints/base-llama-7b-chat-hf")
+    parser.add_argument("--backend", default="auto")
+    parser.add_argument("--compile", action="store_true", help="Compile the model, as PIPABLE_COMPILE=1.")
+    parser.add_argument("--buckets", default=DEFAULT_LENGTH_BUCKETS)
+    parser.add_argument("--warmup-lengths", default="64,256,1024")
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=10)
+    # Set in the child processes, which measure one configuration each
+    parser.add_argument("--warmup", type=int, choices=[0, 1], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.warmup is not None:
+        print(json.dumps(run(args)))
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.model is None:
+            args.model = os.path.join(tmp_dir, "small-llama")
+            small_llama(args.model, len(AutoTokenizer.from_pretrained(args.tokenizer)))
+
+        child_args = [
+            "--model", args.model,
+            "--tokenizer", args.tokenizer,
+            "--backend", args.backend,
+            "--buckets", args.buckets,
+            "--warmup-lengths", args.warmup_lengths,
+            "--max-new-tokens", str(args.max_new_tokens),
+            "--repeats", str(args.repeats),
+        ] + (["--compile"] if args.compile else [])
+        for warmup in (0, 1):
+            # A fresh process, so the first request pays for the lazy initialization again
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), *child_args, "--warmup", str(warmup)],
+                check=True,
+            )
@@ -0,0 +1,154 @@
+import dataclasses
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+
+import torch
+from peft import get_peft_model_state_dict
+from safetensors.torch import save_file
+from transformers import TrainerCallback
+
+CHECKPOINT_PATTERN = re.compile(r"^checkpoint-(\d+)$")
+
+
+def _to_cpu(obj):
+    """
+    Copy every tensor of a (nested) state dict to host memory.
+    """
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to("cpu", copy=True).contiguous()
+    if isinstance(obj, dict):
+        return {key: _to_cpu(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_to_cpu(value) for value in obj)
+    return obj
+
+
+def list_checkpoints(output_dir):
+    """
+    Return the complete checkpoints of a run, oldest first.
+    """
+    if not os.path.isdir(output_dir):
+        return []
+    steps = []
+    for name in os.listdir(output_dir):
+        match = CHECKPOINT_PATTERN.match(name)
+        if match and os.path.isdir(os.path.join(output_dir, name)):
+            steps.append(int(match.group(1)))
+    return [os.path.join(output_dir, f"checkpoint-{step}") for step in sorted(steps)]
+
+
+def latest_checkpoint(output_dir):
+    """
+    Return the most recent complete checkpoint of a run, or None.
+    """
+    checkpoints = list_checkpoints(output_dir)
+    return checkpoints[-1] if checkpoints else None
+
+
+class AsyncCheckpointCallback(TrainerCallback):
+    """
+    Save adapter-only checkpoints from a background thread.
+
+    Every save_steps steps the LoRA weights, the optimizer and scheduler states and
+    the trainer state are copied to host memory, which is quick for adapter weights,
+    and written to disk by a writer thread while training continues. A checkpoint is
+    written into a temporary directory and renamed once complete, so an interrupted
+    write never leaves a partial checkpoint-<step> directory behind. Only the
+    keep_last most recent checkpoints are kept.
+
+    The layout is the one of the trainer's own checkpoints, so a run resumes with
+    trainer.train(resume_from_checkpoint=latest_checkpoint(output_dir)).
+    """
+
+    def __init__(self, output_dir, save_steps=50, keep_last=3):
+        self.output_dir = output_dir
+        self.save_steps = save_steps
+        self.keep_last = keep_last
+        # A single pending checkpoint: training waits rather than piling up copies in memory
+        self.pending = queue.Queue(maxsize=1)
+        self.error = None
+        self.writer = None
+
+    def _start_writer(self):
+        if self.writer is None or not self.writer.is_alive():
+            self.writer = threading.Thread(target=self._write_loop, daemon=True)
+            self.writer.start()
+
+    def _write_loop(self):
+        while True:
+            checkpoint = self.pending.get()
+            try:
+                if checkpoint is None:
+                    return
+                self._write(*checkpoint)
+                self._prune()
+            except Exception as e:
+                self.error = e
+                print(f"Failed to write checkpoint: {e}")
+            finally:
+                self.pending.task_done()
+
+    def _write(self, step, adapter_config, adapter_state, optimizer_state, scheduler_state, trainer_state):
+        checkpoint_dir = os.path.join(self.output_dir, f"checkpoint-{step}")
+        tmp_dir = f"{checkpoint_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        adapter_config.save_pretrained(tmp_dir)
+        save_file(adapter_state, os.path.join(tmp_dir, "adapter_model.safetensors"))
+        if optimizer_state is not None:
+            torch.save(optimizer_state, os.path.join(tmp_dir, "optimizer.pt"))
+        if scheduler_state is not None:
+            torch.save(scheduler_state, os.path.join(tmp_dir, "scheduler.pt"))
+        with open(os.path.join(tmp_dir, "trainer_state.json"), "w") as f:
+            f.write(trainer_state)
+
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        os.replace(tmp_dir, checkpoint_dir)
+
+    def _prune(self):
+        for checkpoint_dir in list_checkpoints(self.output_dir)[: -self.keep_last or None]:
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+    def save(self, state, model, optimizer=None, lr_scheduler=None):
+        """
+        Snapshot the training state and queue it for writing.
+        """
+        if self.error is not None:
+            raise RuntimeError("Writing the previous checkpoint failed") from self.error
+        adapter_name = getattr(model, "active_adapter", "default")
+        if not isinstance(adapter_name, str):
+            adapter_name = adapter_name[0]
+        checkpoint = (
+            state.global_step,
+            model.peft_config[adapter_name],
+            _to_cpu(get_peft_model_state_dict(model, adapter_name=adapter_name)),
+            _to_cpu(optimizer.state_dict()) if optimizer is not None else None,
+            lr_scheduler.state_dict() if lr_scheduler is not None else None,
+            json.dumps(dataclasses.asdict(state), indent=2, sort_keys=True) + "\n",
+        )
+        self._start_writer()
+        self.pending.put(checkpoint)
+
+    def wait(self):
+        """
+        Block until every queued checkpoint is written.
+        """
+        self.pending.join()
+
+    def on_step_end(self, args, state, control, model=None, optimizer=None, lr_scheduler=None, **kwargs):
+        if state.global_step % self.save_steps == 0 and state.is_world_process_zero:
+            self.save(state, model, optimizer, lr_scheduler)
+        return control
+
+    def on_train_end(self, args, state, control, model=None, optimizer=None, lr_scheduler=None, **kwargs):
+        if state.is_world_process_zero:
+            if state.global_step % self.save_steps != 0:
+                self.save(state, model, optimizer, lr_scheduler)
+            self.pending.put(None)
+            self.wait()
+        return control
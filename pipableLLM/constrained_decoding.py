@@ -0,0 +1,303 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import torch
+from transformers import LogitsProcessor
+
+from prompt_renderer import parse_schema
+
+# Constrained decoding is used for the requests which ask for it with "constrained",
+# PIPABLE_CONSTRAINED_DECODING=1 makes it the default for every request.
+CONSTRAINED_DECODING_ENV = "PIPABLE_CONSTRAINED_DECODING"
+
+# Keywords which may follow FROM or JOIN in place of a table name
+TABLE_POSITION_KEYWORDS = ("LATERAL", "ONLY")
+
+# A table name follows these keywords, a column name follows "<table or alias>."
+# Other identifiers, e.g. the columns of the SELECT list or WHERE, are not constrained.
+_TABLE_TRIGGER = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)$", re.IGNORECASE)
+_COLUMN_TRIGGER = re.compile(r"(?:^|[^\w.])([A-Za-z_][\w.]*)\.$")
+# FROM which compares values instead of naming a table, as in a IS DISTINCT FROM b
+_DISTINCT_FROM = re.compile(r"\bDISTINCT\s+FROM$", re.IGNORECASE)
+# A parenthesis holding a query rather than the arguments of a function
+_QUERY_START = re.compile(r"\s*(?:SELECT|WITH|VALUES)\b", re.IGNORECASE)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+# Names the generated query defines itself: common table expressions and subquery aliases
+_CTE_NAME = re.compile(
+    r"(?:\bWITH(?:\s+RECURSIVE)?|,)\s*([A-Za-z_]\w*)\s*(?:\([\w\s,]*\)\s*)?AS\s*"
+    r"(?:NOT\s+)?(?:MATERIALIZED\s*)?\(",
+    re.IGNORECASE,
+)
+_ALIAS = re.compile(r"\s*(?:AS\s+)?([A-Za-z_]\w*)", re.IGNORECASE)
+_NOT_ALIASES = {
+    "as", "on", "using", "where", "group", "order", "having", "limit", "offset", "union",
+    "intersect", "except", "join", "inner", "left", "right", "full", "cross", "natural",
+    "and", "or", "select", "from", "window", "fetch", "for", "returning",
+}
+
+# Longest identifier, in tokens, that is looked for behind the last generated token
+_MAX_IDENTIFIER_TOKENS = 16
+
+_TERMINAL = None
+
+
+def _insert(trie, token_ids):
+    node = trie
+    for token_id in token_ids:
+        node = node.setdefault(token_id, {})
+    node[_TERMINAL] = True
+
+
+def _walk(trie, token_ids):
+    node = trie
+    for token_id in token_ids:
+        node = node.get(token_id)
+        if node is None:
+            return None
+    return node
+
+
+def _with_names(trie, paths):
+    """
+    Return a copy of trie with the token_ids in paths added, leaving trie unchanged.
+    """
+    root = dict(trie)
+    for token_ids in paths:
+        node = root
+        for token_id in token_ids:
+            child = dict(node.get(token_id, {}))
+            node[token_id] = child
+            node = child
+        node[_TERMINAL] = True
+    return root
+
+
+def _scan_query(text):
+    """
+    Scan the generated query text for its open parentheses and the names it defines.
+
+    Returns whether the innermost open parenthesis holds the arguments of a function,
+    as in EXTRACT(YEAR FROM, and the names of the common table expressions and the
+    subquery aliases. String literals are skipped.
+    """
+    text = _STRING_LITERAL.sub("''", text)
+    names = {match.group(1) for match in _CTE_NAME.finditer(text)}
+    # True for the open parentheses which hold a query
+    queries = []
+    for position, char in enumerate(text):
+        if char == "(":
+            queries.append(bool(_QUERY_START.match(text, position + 1)))
+        elif char == ")" and queries:
+            if queries.pop():
+                match = _ALIAS.match(text, position + 1)
+                if match and match.group(1).lower() not in _NOT_ALIASES:
+                    names.add(match.group(1))
+    return bool(queries) and not queries[-1], names
+
+
+class SchemaTries:
+    """
+    Token tries of the identifiers of one schema.
+
+    table_trie holds the table names, bare and schema qualified, as they are
+    tokenized after a keyword, i.e. starting a new word. column_tries holds the
+    column names of every table, and of all tables under None for aliases, as they
+    are tokenized right after a ".". Names are added as written in the schema and in
+    lower case.
+    """
+
+    def __init__(self, tokenizer, context):
+        self.tokenizer = tokenizer
+        self.table_trie = {}
+        self.column_tries = {None: {}}
+        for table, columns in parse_schema(context):
+            names = {table, table.split(".")[-1]}
+            for name in names | {name.lower() for name in names}:
+                _insert(self.table_trie, self._word_ids(tokenizer, name))
+            column_trie = {}
+            for column in set(columns) | {column.lower() for column in columns}:
+                column_ids = self._continuation_ids(tokenizer, column)
+                _insert(column_trie, column_ids)
+                _insert(self.column_tries[None], column_ids)
+            for name in names | {name.lower() for name in names}:
+                self.column_tries[name] = column_trie
+        for keyword in TABLE_POSITION_KEYWORDS:
+            _insert(self.table_trie, self._word_ids(tokenizer, keyword))
+            _insert(self.table_trie, self._word_ids(tokenizer, keyword.lower()))
+        # Table tries extended with the names a query defines, by those names
+        self._derived_tries = {}
+
+    @staticmethod
+    def _word_ids(tokenizer, word):
+        return tokenizer.encode(word, add_special_tokens=False)
+
+    @staticmethod
+    def _continuation_ids(tokenizer, word):
+        # Tokenize after a "." and drop the tokens of the "." itself
+        dot_ids = tokenizer.encode(".", add_special_tokens=False)
+        ids = tokenizer.encode(f".{word}", add_special_tokens=False)
+        if ids[: len(dot_ids)] == dot_ids:
+            return ids[len(dot_ids) :]
+        return ids
+
+    def _table_trie_with(self, names):
+        if not names:
+            return self.table_trie
+        key = frozenset(names)
+        trie = self._derived_tries.get(key)
+        if trie is None:
+            trie = _with_names(
+                self.table_trie, [self._word_ids(self.tokenizer, name) for name in key]
+            )
+            if len(self._derived_tries) >= 256:
+                self._derived_tries.clear()
+            self._derived_tries[key] = trie
+        return trie
+
+    def trie_for(self, text):
+        """
+        Return the trie constraining the identifier which follows text, if any.
+
+        text is the generated query up to the identifier. FROM inside the arguments
+        of a function or after DISTINCT does not name a table, and the common table
+        expressions and subquery aliases of the query are allowed as table names.
+        Qualified columns of those are not constrained, they are defined by the query.
+        """
+        table_position = _TABLE_TRIGGER.search(text)
+        match = None if table_position else _COLUMN_TRIGGER.search(text)
+        if not table_position and not match:
+            return None
+        if text.count("'") % 2:
+            # Inside a string literal
+            return None
+        in_function, names = _scan_query(text)
+        if table_position:
+            if in_function or _DISTINCT_FROM.search(text):
+                return None
+            return self._table_trie_with(names)
+        qualifier = match.group(1)
+        if qualifier.split(".")[-1] in names:
+            return None
+        return self.column_tries.get(
+            qualifier,
+            self.column_tries.get(qualifier.split(".")[-1], self.column_tries[None]),
+        )
+
+
+class ConstrainedDecoding:
+    """
+    Build and cache the identifier tries of schemas for one tokenizer.
+
+    Tries are cached per context, so a schema is tokenized once and then reused by
+    every request on it. The masks of the tokens which may follow a complete
+    identifier are computed once per vocabulary.
+    """
+
+    def __init__(self, tokenizer, cache_size=256):
+        self.tokenizer = tokenizer
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        vocabulary = tokenizer.convert_ids_to_tokens(list(range(len(tokenizer))))
+        # Text of every token, with the sentencepiece word marker turned into a space
+        self.token_texts = [(piece or "").replace("▁", " ") for piece in vocabulary]
+        # Tokens which do not continue a word, they may follow a complete identifier
+        boundary = [
+            not text or not (text[0].isalnum() or text[0] == "_") for text in self.token_texts
+        ]
+        for token_id in tokenizer.all_special_ids:
+            boundary[token_id] = True
+        self.boundary_mask = torch.tensor(boundary, dtype=torch.bool)
+        # Tokens which leave a table position without naming a table, e.g. a subquery
+        self.escape_ids = [
+            token_id
+            for token_id, text in enumerate(self.token_texts)
+            if text.strip() in ("(", '"')
+        ]
+
+    def tries(self, context):
+        with self.lock:
+            tries = self.cache.get(context)
+            if tries is not None:
+                self.cache.move_to_end(context)
+                return tries
+        tries = SchemaTries(self.tokenizer, context)
+        with self.lock:
+            self.cache[context] = tries
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return tries
+
+    def logits_processor(self, context, prompt_length):
+        return SchemaLogitsProcessor(self, self.tries(context), prompt_length)
+
+
+class SchemaLogitsProcessor(LogitsProcessor):
+    """
+    Mask the logits of tokens which would produce an unknown identifier.
+
+    In identifier positions, after FROM, JOIN, UPDATE or INTO and after "<table>.",
+    only tokens continuing a known identifier are allowed, and once the identifier
+    is complete also tokens ending it. The state is derived from the generated
+    tokens at every step, so the processor also works when several tokens are
+    verified at once, as in speculative decoding.
+    """
+
+    def __init__(self, constrained_decoding, tries, prompt_length):
+        self.decoding = constrained_decoding
+        self.tries = tries
+        self.prompt_length = prompt_length
+
+    def _node(self, generated_ids):
+        """
+        Find the trie node of the identifier being generated, or None when the
+        next token is not in an identifier position.
+
+        Every suffix of the generated tokens is tried as the start of an identifier,
+        the longest one that follows a trigger and is a path in its trie wins.
+        """
+        texts = self.decoding.token_texts
+        n = len(generated_ids)
+        pieces = [texts[token_id] if token_id < len(texts) else "" for token_id in generated_ids]
+        # Offset in the generated text of the start of every token
+        offsets = [0]
+        for piece in pieces:
+            offsets.append(offsets[-1] + len(piece))
+        text = "".join(pieces)
+        for k in range(min(_MAX_IDENTIFIER_TOKENS, n), -1, -1):
+            start = n - k
+            trie = self.tries.trie_for(text[: offsets[start]])
+            if trie is None:
+                continue
+            node = _walk(trie, generated_ids[start:])
+            if node is not None:
+                return node, k == 0
+        return None, False
+
+    def __call__(self, input_ids, scores):
+        boundary_mask = self.decoding.boundary_mask.to(scores.device)
+        vocab_size = scores.shape[-1]
+        for row in range(input_ids.shape[0]):
+            generated_ids = input_ids[row, self.prompt_length :].tolist()
+            node, at_root = self._node(generated_ids)
+            if node is None:
+                continue
+            allowed = torch.zeros(vocab_size, dtype=torch.bool, device=scores.device)
+            children = [token_id for token_id in node if token_id is not _TERMINAL]
+            allowed[[token_id for token_id in children if token_id < vocab_size]] = True
+            if at_root:
+                allowed[self.decoding.escape_ids] = True
+            if node.get(_TERMINAL):
+                size = min(vocab_size, boundary_mask.shape[0])
+                allowed[:size] |= boundary_mask[:size]
+            scores[row] = scores[row].masked_fill(~allowed, float("-inf"))
+        return scores
+
+
+def constrained_by_default():
+    """
+    Return whether requests are constrained unless they ask otherwise.
+    """
+    return os.environ.get(CONSTRAINED_DECODING_ENV, "0").lower() in ("1", "true", "yes")
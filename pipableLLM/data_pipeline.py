@@ -0,0 +1,146 @@
+import random
+import re
+import zlib
+
+import numpy as np
+
+_SQL_TOKEN_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\w+|[^\w\s]")
+_WORD_PATTERN = re.compile(r"\w+")
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def normalize_sql(sql):
+    """
+    Normalize a SQL query so that formatting differences do not matter.
+
+    Keywords and identifiers are lowercased and whitespace is collapsed, quoted
+    literals and identifiers are kept as they are.
+    """
+    tokens = _SQL_TOKEN_PATTERN.findall(sql.strip().rstrip(";"))
+    return " ".join(token if token[0] in "'\"" else token.lower() for token in tokens)
+
+
+def normalize_question(question):
+    return " ".join(_WORD_PATTERN.findall(question.lower()))
+
+
+class MinHash:
+    """
+    MinHash signatures of the character shingles of a text.
+
+    The Jaccard similarity of two shingle sets is estimated by the share of equal
+    signature values.
+    """
+
+    def __init__(self, num_perm=64, shingle_size=5, seed=0):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.shingle_size = shingle_size
+
+    def signature(self, text):
+        size = self.shingle_size
+        shingles = {text[i : i + size] for i in range(max(1, len(text) - size + 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode()) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+
+def deduplicate_examples(dataset, threshold=0.8, num_perm=64, bands=16):
+    """
+    Find the examples which duplicate an earlier example of the dataset.
+
+    Two examples are exact duplicates when their context, normalized SQL answer and
+    normalized question are equal. They are near duplicates when context and
+    normalized SQL are equal and the estimated Jaccard similarity of their question
+    shingles reaches the threshold. Candidate pairs are found with MinHash LSH, so
+    examples are never compared pairwise. The first occurrence is kept.
+
+    Returns the indices of the examples to keep and the number of exact and near
+    duplicates removed.
+    """
+    rows_per_band = num_perm // bands
+    min_hash = MinHash(num_perm=num_perm)
+    exact_keys = set()
+    lsh_buckets = {}
+    signatures = []
+    keep = []
+    stats = {"exact_duplicates": 0, "near_duplicates": 0}
+
+    for index, example in enumerate(dataset):
+        group = (example["context"].strip(), normalize_sql(example["answer"]))
+        question = normalize_question(example["question"])
+        if group + (question,) in exact_keys:
+            stats["exact_duplicates"] += 1
+            continue
+
+        signature = min_hash.signature(question)
+        band_keys = [
+            (group, band, signature[band * rows_per_band : (band + 1) * rows_per_band].tobytes())
+            for band in range(bands)
+        ]
+        candidates = {kept for key in band_keys for kept in lsh_buckets.get(key, ())}
+        if any(np.mean(signatures[kept] == signature) >= threshold for kept in candidates):
+            stats["near_duplicates"] += 1
+            continue
+
+        exact_keys.add(group + (question,))
+        position = len(signatures)
+        signatures.append(signature)
+        for key in band_keys:
+            lsh_buckets.setdefault(key, []).append(position)
+        keep.append(index)
+
+    return keep, stats
+
+
+def length_grouped_batches(lengths, batch_size, megabatch_mult=50, seed=0):
+    """
+    Group examples of similar length into batches.
+
+    Follows the LengthGroupedSampler used by the trainer with group_by_length: a
+    random permutation is split into megabatches of megabatch_mult batches, which
+    are sorted by length before being cut into batches.
+    """
+    indices = list(range(len(lengths)))
+    random.Random(seed).shuffle(indices)
+    megabatch_size = batch_size * megabatch_mult
+    batches = []
+    for start in range(0, len(indices), megabatch_size):
+        megabatch = sorted(
+            indices[start : start + megabatch_size], key=lambda i: lengths[i], reverse=True
+        )
+        batches.extend(
+            megabatch[i : i + batch_size] for i in range(0, len(megabatch), batch_size)
+        )
+    return batches
+
+
+def padding_tokens(lengths, batches):
+    """
+    Count the padding tokens needed to pad every batch to its longest example.
+    """
+    return sum(
+        max(lengths[i] for i in batch) * len(batch) - sum(lengths[i] for i in batch)
+        for batch in batches
+    )
+
+
+def padding_stats(lengths, batch_size, seed=0):
+    """
+    Compare the padding of random batches with length grouped batches.
+    """
+    indices = list(range(len(lengths)))
+    random.Random(seed).shuffle(indices)
+    random_batches = [indices[i : i + batch_size] for i in range(0, len(indices), batch_size)]
+    random_padding = padding_tokens(lengths, random_batches)
+    grouped_padding = padding_tokens(lengths, length_grouped_batches(lengths, batch_size, seed=seed))
+    return {
+        "tokens": sum(lengths),
+        "random_padding_tokens": random_padding,
+        "grouped_padding_tokens": grouped_padding,
+        "padding_tokens_saved": random_padding - grouped_padding,
+    }
@@ -1,16 +1,86 @@
 from datasets import load_dataset
 from tqdm import tqdm
 from trl.trainer import ConstantLengthDataset
-import re
+from dataset_cache import TokenizedDatasetCache
+from streaming_dataset import StreamingPackedDataset, dataset_files
+from prompt_renderer import TEMPLATE_VERSION as PROMPT_TEMPLATE_VERSION
+from prompt_renderer import render_prompt, render_training_text
+from data_pipeline import deduplicate_examples, padding_stats
+import os
 
 class DataProcessor:
-    def __init__(self, dataset_path, tokenizer):
+    def __init__(
+        self,
+        dataset_path,
+        tokenizer,
+        cache_dir="./datasets/tokenized",
+        seq_length=1024,
+        num_proc=None,
+        streaming=False,
+        deduplicate=True,
+        packing=True,
+        batch_size=8,
+        ledger=None,
+    ):
         self.dataset_path = dataset_path
         self.tokenizer = tokenizer
+        # Worker processes used to render and tokenize the dataset in batches
+        self.num_proc = num_proc or min(8, os.cpu_count() or 1)
+        self.deduplicate = deduplicate
+        # Only examples missing from the ledger are trained on, their hashes are kept
+        # in new_example_hashes so the ledger can be updated once training succeeded
+        self.ledger = ledger
+        self.new_example_hashes = None
+        self.stats = {}
+
+        if streaming:
+            # Read JSON Lines shards lazily, for datasets which do not fit in memory
+            self.train_dataset = StreamingPackedDataset(
+                dataset_files(self.dataset_path),
+                self.tokenizer,
+                formatting_func=self.prepare_sample_text,
+                seq_length=seq_length,
+            )
+            return
+
+        if not packing:
+            # Examples are padded per batch, the trainer groups them by length
+            dataset = load_dataset("json", data_files={"train": self.dataset_path})
+            self.train_dataset = self.preprocess(dataset["train"])
+            lengths = [
+                min(length, seq_length) for length in self.token_lengths(self.train_dataset)
+            ]
+            self.stats.update(padding_stats(lengths, batch_size))
+            print(
+                f"Grouping by length saves {self.stats['padding_tokens_saved']} padding tokens "
+                f"per epoch ({self.stats['random_padding_tokens']} with random batches)"
+            )
+            return
+
+        if cache_dir is not None:
+            cache = TokenizedDatasetCache(
+                cache_dir,
+                self.tokenizer,
+                seq_length,
+                [PROMPT_TEMPLATE_VERSION, "deduplicated" if deduplicate else None],
+                num_proc=self.num_proc,
+            )
+            self.train_dataset = cache.load(
+                self.dataset_path,
+                self.prepare_sample_text,
+                preprocess=self.preprocess,
+                preprocess_key=ledger.fingerprint() if ledger is not None else None,
+            )
+            if ledger is not None and self.new_example_hashes is None:
+                # Served from the cache without preprocessing, only hash the examples
+                dataset = load_dataset("json", data_files={"train": self.dataset_path})
+                _, self.new_example_hashes = ledger.unseen(dataset["train"])
+            print(f"Packed {len(self.train_dataset)} sequences of {seq_length} tokens")
+            return
 
         dataset = load_dataset("json", data_files={"train": self.dataset_path})
 
-        train_dataset = dataset["train"]
+        train_dataset = self.preprocess(dataset["train"])
         chars_per_token = self.chars_token_ratio(train_dataset)
         print(f"The character to token ratio of the dataset is: {chars_per_token:.2f}")
 
@@ -19,58 +89,73 @@ class DataProcessor:
             train_dataset,
             formatting_func=self.prepare_sample_text,
             infinite=True,
+            seq_length=seq_length,
             chars_per_token=chars_per_token,
         )
 
-    def parse_create_table(self, query):
-        table_name_match = re.search(r'CREATE TABLE (\w+) \((.*?)\)', query)
-        
-        if table_name_match:
-            table_name = table_name_match.group(1)
-            column_defs = table_name_match.group(2)
-            
-            columns = [col.strip() for col in column_defs.split(',')]
-            
-            schema = f"table schema: {table_name}:"
-            for col in columns:
-                col_match = re.match(r'(\w+) (\w+)', col)
-                if col_match:
-                    col_name = col_match.group(1)
-                    col_type = col_match.group(2)
-                    schema += f' "{col_name}" [ {col_type.upper()}]'
-            
-            return schema
-
     def parse_prompt(self, context, question):
-        llm_input = "[INST] Here is a database schema: "
-        for table in context.split(';'):
-            llm_input += self.parse_create_table(table) + " "
-        
-        llm_input += "Please write me a syntactically correct SQL statement that answers the following question:"
-        llm_input += question + "[/INST]"
-
-        return llm_input
+        return render_prompt(context, question)
 
     def prepare_sample_text(self, example):
         """
         Prepare a sample text from the dataset.
         """
-        return f"{self.parse_prompt(example['context'], example['question'])} {example['answer']}"
+        return render_training_text(example)
+
+    def prepare_sample_texts(self, batch):
+        """
+        Prepare the sample texts of a batch of examples.
+        """
+        return [
+            render_training_text(dict(zip(batch, values))) for values in zip(*batch.values())
+        ]
+
+    def token_lengths(self, dataset, batch_size=1000):
+        """
+        Count the tokens of every example of the dataset.
+        """
+        lengths = []
+        for start in range(0, len(dataset), batch_size):
+            texts = self.prepare_sample_texts(dataset[start : start + batch_size])
+            lengths.extend(len(ids) for ids in self.tokenizer(texts)["input_ids"])
+        return lengths
+
+    def preprocess(self, dataset):
+        """
+        Drop the examples already trained on and remove duplicate examples.
+        """
+        if self.ledger is not None:
+            indices, self.new_example_hashes = self.ledger.unseen(dataset)
+            self.stats["seen_examples"] = len(dataset) - len(indices)
+            print(f"Skipping {self.stats['seen_examples']} examples already trained on")
+            dataset = dataset.select(indices)
+
+        if self.deduplicate:
+            keep, stats = deduplicate_examples(dataset)
+            kept = set(keep)
+            removed = dataset.select([i for i in range(len(dataset)) if i not in kept])
+            stats["tokens_saved_per_epoch"] = sum(self.token_lengths(removed))
+            self.stats.update(stats)
+            print(
+                f"Removed {stats['exact_duplicates']} exact and {stats['near_duplicates']} near "
+                f"duplicate examples, saving {stats['tokens_saved_per_epoch']} tokens per epoch"
+            )
+            dataset = dataset.select(keep)
+
+        self.stats["examples"] = len(dataset)
+        return dataset
 
     def chars_token_ratio(self, dataset, nb_examples=400):
         """
         Estimate the average number of characters per token in the dataset.
         """
 
-        total_characters, total_tokens = 0, 0
-        for _, example in tqdm(
-            zip(range(nb_examples), iter(dataset)), total=nb_examples
-        ):
-            text = self.prepare_sample_text(example)
-            total_characters += len(text)
-            if self.tokenizer.is_fast:
-                total_tokens += len(self.tokenizer(text).tokens())
-            else:
-                total_tokens += len(self.tokenizer.tokenize(text))
-
-        return total_characters / total_tokens
\ No newline at end of file
+        sample = dataset.select(range(min(nb_examples, len(dataset))))
+        texts = [self.prepare_sample_text(example) for example in sample]
+        total_characters = sum(len(text) for text in texts)
+        if self.tokenizer.is_fast:
+            total_tokens = sum(len(ids) for ids in self.tokenizer(texts)["input_ids"])
+        else:
+            total_tokens = sum(len(self.tokenizer.tokenize(text)) for text in tqdm(texts))
+
+        return total_characters / total_tokens
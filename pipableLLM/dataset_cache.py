@@ -0,0 +1,215 @@
+import bisect
+import hashlib
+import itertools
+import json
+import os
+
+import numpy as np
+import torch
+from datasets import load_dataset
+from torch.utils.data import Dataset
+
+# Number of examples tokenized into one shard. Shards are keyed by their content, so
+# appending examples to a dataset only tokenizes the last, changed shard and new ones.
+CHUNK_SIZE = 10000
+
+
+def file_sha256(path, block_size=1 << 20):
+    """
+    Hash the content of a file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def tokenizer_fingerprint(tokenizer):
+    """
+    Identify a tokenizer by its vocabulary and the options which change its output.
+    """
+    description = {
+        "class": type(tokenizer).__name__,
+        "name_or_path": tokenizer.name_or_path,
+        "vocab_size": len(tokenizer),
+        "eos_token_id": tokenizer.eos_token_id,
+        "init_kwargs": {k: str(v) for k, v in sorted(tokenizer.init_kwargs.items())},
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+def _save_atomic(path, array):
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+class PackedTokenDataset(Dataset):
+    """
+    Fixed length training sequences read from memory-mapped shards.
+
+    Yields the same samples as trl's ConstantLengthDataset, {"input_ids", "labels"}
+    tensors of seq_length tokens, but as a map-style dataset so the trainer can
+    shuffle it and the token blocks are paged in from disk on demand.
+    """
+
+    def __init__(self, shards, extra_blocks):
+        self.shards = [shard for shard in shards if len(shard)]
+        if len(extra_blocks):
+            self.shards.append(extra_blocks)
+        self.offsets = [0]
+        for shard in self.shards:
+            self.offsets.append(self.offsets[-1] + len(shard))
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        shard_index = bisect.bisect_right(self.offsets, index) - 1
+        block = self.shards[shard_index][index - self.offsets[shard_index]]
+        input_ids = torch.from_numpy(np.asarray(block, dtype=np.int64))
+        return {"input_ids": input_ids, "labels": input_ids.clone()}
+
+
+class TokenizedDatasetCache:
+    """
+    Cache of tokenized and packed training datasets.
+
+    Datasets are keyed by the content hash of the dataset file, the tokenizer, the
+    prompt template version and the sequence length. A repeated run on the same data
+    memory-maps the cached shards without reading the JSON file at all; a run on
+    extended data only tokenizes the examples which are not in a cached shard yet.
+    """
+
+    def __init__(
+        self, cache_dir, tokenizer, seq_length, template_version, num_proc=None, batch_size=1000
+    ):
+        self.cache_dir = cache_dir
+        self.tokenizer = tokenizer
+        self.seq_length = seq_length
+        self.num_proc = num_proc
+        self.batch_size = batch_size
+        self.dtype = np.uint16 if len(tokenizer) < 2**16 else np.uint32
+        self.config_key = hashlib.sha256(
+            json.dumps(
+                [tokenizer_fingerprint(tokenizer), template_version, seq_length]
+            ).encode()
+        ).hexdigest()
+        os.makedirs(os.path.join(cache_dir, "manifests"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "shards"), exist_ok=True)
+
+    def _manifest_path(self, dataset_hash, preprocess_key=None):
+        key = hashlib.sha256(
+            f"{dataset_hash}:{self.config_key}:{preprocess_key}".encode()
+        ).hexdigest()
+        return os.path.join(self.cache_dir, "manifests", f"{key}.json")
+
+    def _shard_dir(self, shard_key):
+        return os.path.join(self.cache_dir, "shards", shard_key)
+
+    def load(self, dataset_path, formatting_func, preprocess=None, preprocess_key=None):
+        """
+        Return the packed dataset for a JSON dataset, building missing shards.
+
+        preprocess, if given, filters the loaded dataset before it is split into shards.
+        Its result must be determined by the template_version and preprocess_key keys.
+        """
+        manifest_path = self._manifest_path(file_sha256(dataset_path), preprocess_key)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                shard_keys = json.load(f)["shards"]
+            if all(os.path.exists(self._shard_dir(key)) for key in shard_keys):
+                print(f"Using tokenized dataset cache {manifest_path}")
+                return self._open(shard_keys)
+
+        dataset = load_dataset("json", data_files={"train": dataset_path})["train"]
+        if preprocess is not None:
+            dataset = preprocess(dataset)
+        shard_keys = []
+        missing = []
+        for start in range(0, len(dataset), CHUNK_SIZE):
+            rows = dataset[start : start + CHUNK_SIZE]
+            shard_key = hashlib.sha256(
+                (
+                    json.dumps(rows, sort_keys=True, default=str) + self.config_key
+                ).encode()
+            ).hexdigest()
+            if not os.path.exists(self._shard_dir(shard_key)):
+                missing.append((shard_key, start, min(start + CHUNK_SIZE, len(dataset))))
+            shard_keys.append(shard_key)
+
+        if missing:
+            print(f"Tokenizing {len(missing)} of {len(shard_keys)} dataset shards")
+            indices = [i for _, start, end in missing for i in range(start, end)]
+            tokenized = self.tokenize(dataset.select(indices), formatting_func)
+            offset = 0
+            for shard_key, start, end in missing:
+                self._build_shard(shard_key, tokenized[offset : offset + end - start]["input_ids"])
+                offset += end - start
+
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"dataset_path": dataset_path, "shards": shard_keys}, f)
+        os.replace(tmp_path, manifest_path)
+        return self._open(shard_keys)
+
+    def tokenize(self, dataset, formatting_func):
+        """
+        Render and tokenize every example of a dataset in batches.
+
+        Each example becomes an "input_ids" list terminated by the EOS token, the same
+        token stream ConstantLengthDataset builds. Batches are spread over num_proc
+        processes, which pays off with fast tokenizers encoding a whole batch at once.
+        """
+        eos_token_id = self.tokenizer.eos_token_id
+
+        def encode(batch):
+            examples = [dict(zip(batch, values)) for values in zip(*batch.values())]
+            texts = [formatting_func(example) for example in examples]
+            token_ids = self.tokenizer(texts, truncation=False)["input_ids"]
+            return {"input_ids": [ids + [eos_token_id] for ids in token_ids]}
+
+        return dataset.map(
+            encode,
+            batched=True,
+            batch_size=self.batch_size,
+            num_proc=self.num_proc if len(dataset) >= 2 * self.batch_size else None,
+            remove_columns=dataset.column_names,
+        )
+
+    def _build_shard(self, shard_key, token_ids):
+        """
+        Concatenate tokenized examples into one stream and cut it into seq_length blocks.
+
+        The remainder shorter than a block is kept as the shard's tail and packed
+        together with the tails of the other shards when the dataset is opened.
+        """
+        stream = np.fromiter(
+            itertools.chain.from_iterable(token_ids),
+            dtype=self.dtype,
+            count=sum(len(ids) for ids in token_ids),
+        )
+        n_blocks = len(stream) // self.seq_length
+        blocks = stream[: n_blocks * self.seq_length].reshape(n_blocks, self.seq_length)
+
+        shard_dir = self._shard_dir(shard_key)
+        tmp_dir = f"{shard_dir}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        _save_atomic(os.path.join(tmp_dir, "blocks.npy"), blocks)
+        _save_atomic(os.path.join(tmp_dir, "tail.npy"), stream[n_blocks * self.seq_length :])
+        os.replace(tmp_dir, shard_dir)
+
+    def _open(self, shard_keys):
+        shards = []
+        tails = []
+        for key in shard_keys:
+            shard_dir = self._shard_dir(key)
+            shards.append(np.load(os.path.join(shard_dir, "blocks.npy"), mmap_mode="r"))
+            tails.append(np.load(os.path.join(shard_dir, "tail.npy")))
+        tail = np.concatenate(tails) if tails else np.empty(0, dtype=self.dtype)
+        n_blocks = len(tail) // self.seq_length
+        extra_blocks = tail[: n_blocks * self.seq_length].reshape(n_blocks, self.seq_length)
+        return PackedTokenDataset(shards, extra_blocks)
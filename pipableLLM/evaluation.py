@@ -0,0 +1,268 @@
+"""
+Evaluate a text-to-SQL model on a labeled dataset.
+
+Every {"context", "question", "answer"} example is sent to the model, through a
+running server or in-process, and the predicted and the gold SQL are executed
+against a local SQLite or DuckDB fixture database. The report contains the
+execution accuracy, the exact match rate, the p50/p95 latency and the generation
+throughput, and the command fails when it is below the given thresholds.
+
+    python evaluation.py --dataset eval.jsonl --server http://127.0.0.1:5000 --database fixtures.sqlite
+    python evaluation.py --dataset eval.jsonl --model ./checkpoints/llama-7b-text-to-sql/final_merged_checkpoint
+
+Examples can name their own fixture database with "database". Without one, the
+tables are created from the example's CREATE TABLE statements in an in-memory
+SQLite database, and the optional "setup" list of SQL statements fills them.
+"""
+import argparse
+import json
+import math
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from prompt_renderer import extract_answer, render_prompt
+
+
+def percentile(values, q):
+    """
+    Return the q-th percentile of values, interpolating between the closest ranks.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def normalize_sql(sql):
+    return re.sub(r"\s+", " ", sql.strip().rstrip(";")).lower()
+
+
+class ServerGenerator:
+    """
+    Generate SQL with a running server's /generate endpoint.
+    """
+
+    def __init__(self, base_url, timeout=120):
+        self.url = f"{base_url.rstrip('/')}/generate"
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def __call__(self, context, question):
+        # One session per thread, so concurrent requests reuse their own connection
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        response = self.local.session.post(
+            self.url, json={"context": context, "question": question}, timeout=self.timeout
+        )
+        response.raise_for_status()
+        body = response.json()
+        return body["output"], body.get("generated_tokens")
+
+
+class InProcessGenerator:
+    """
+    Generate SQL with a model loaded in this process.
+    """
+
+    def __init__(self, model_path, tokenizer_path=None, device=None, max_new_tokens=256):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self.torch = torch
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_path or model_path, use_fast=True)
+        self.model = AutoModelForCausalLM.from_pretrained(
+            model_path,
+            torch_dtype=torch.bfloat16 if self.device == "cuda" else torch.float32,
+        ).to(self.device)
+        self.model.eval()
+        self.max_new_tokens = max_new_tokens
+        # A single model instance generates one request at a time
+        self.lock = threading.Lock()
+
+    def __call__(self, context, question):
+        prompt = render_prompt(context, question)
+        inputs = self.tokenizer([prompt], return_tensors="pt").to(self.device)
+        with self.lock, self.torch.no_grad():
+            generated_ids = self.model.generate(**inputs, max_new_tokens=self.max_new_tokens)
+        generated_tokens = generated_ids.shape[1] - inputs["input_ids"].shape[1]
+        output = self.tokenizer.batch_decode(generated_ids, skip_special_tokens=True)[0]
+        return extract_answer(output).strip(), generated_tokens
+
+
+class FixtureDatabases:
+    """
+    Open the fixture databases the SQL of the examples is executed against.
+    """
+
+    def __init__(self, default_database=None):
+        self.default_database = default_database
+
+    def connect(self, example):
+        database = example.get("database") or self.default_database
+        if database is None:
+            connection = sqlite3.connect(":memory:")
+            for statement in example["context"].split(";"):
+                if statement.strip():
+                    connection.execute(statement)
+            for statement in example.get("setup", []):
+                connection.execute(statement)
+            return connection
+        if database.endswith((".duckdb", ".ddb")):
+            import duckdb
+
+            return duckdb.connect(database, read_only=True)
+        return sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+
+
+def _normalize_value(value):
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+def execute(connection, sql):
+    rows = connection.execute(sql).fetchall()
+    return [tuple(_normalize_value(value) for value in row) for row in rows]
+
+
+def results_match(predicted_rows, gold_rows, ordered):
+    """
+    Compare two results, as sequences when the gold query orders its rows and as
+    multisets otherwise.
+    """
+    if ordered:
+        return predicted_rows == gold_rows
+    return sorted(map(repr, predicted_rows)) == sorted(map(repr, gold_rows))
+
+
+def evaluate_example(example, generator, databases):
+    start = time.perf_counter()
+    try:
+        predicted, generated_tokens = generator(example["context"], example["question"])
+        error = None
+    except Exception as e:
+        predicted, generated_tokens, error = None, None, f"generation failed: {e}"
+    latency = time.perf_counter() - start
+
+    result = {
+        "question": example["question"],
+        "gold": example["answer"],
+        "predicted": predicted,
+        "latency": latency,
+        "generated_tokens": generated_tokens,
+        "exact_match": predicted is not None
+        and normalize_sql(predicted) == normalize_sql(example["answer"]),
+        "execution_match": False,
+        "error": error,
+    }
+    if predicted is None:
+        return result
+
+    connection = databases.connect(example)
+    try:
+        try:
+            gold_rows = execute(connection, example["answer"])
+        except Exception as e:
+            result["error"] = f"gold query failed: {e}"
+            result["invalid_gold"] = True
+            return result
+        try:
+            predicted_rows = execute(connection, predicted)
+        except Exception as e:
+            result["error"] = f"predicted query failed: {e}"
+            return result
+        ordered = re.search(r"\border\s+by\b", example["answer"], re.IGNORECASE) is not None
+        result["execution_match"] = results_match(predicted_rows, gold_rows, ordered)
+    finally:
+        connection.close()
+    return result
+
+
+def evaluate(examples, generator, databases, concurrency=4):
+    """
+    Evaluate all examples with concurrency parallel requests and summarize the results.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(
+            executor.map(lambda example: evaluate_example(example, generator, databases), examples)
+        )
+    wall_seconds = time.perf_counter() - start
+
+    scored = [result for result in results if not result.get("invalid_gold")]
+    latencies = [result["latency"] for result in results]
+    token_counts = [result["generated_tokens"] for result in results if result["generated_tokens"]]
+    summary = {
+        "examples": len(results),
+        "scored_examples": len(scored),
+        "invalid_gold": len(results) - len(scored),
+        "errors": sum(1 for result in scored if result["error"]),
+        "execution_accuracy": sum(r["execution_match"] for r in scored) / len(scored)
+        if scored
+        else None,
+        "exact_match": sum(r["exact_match"] for r in scored) / len(scored) if scored else None,
+        "latency_p50_seconds": percentile(latencies, 50),
+        "latency_p95_seconds": percentile(latencies, 95),
+        "requests_per_second": len(results) / wall_seconds if wall_seconds else None,
+        "tokens_per_second": sum(token_counts) / wall_seconds
+        if token_counts and wall_seconds
+        else None,
+        "concurrency": concurrency,
+    }
+    return summary, results
+
+
+def load_examples(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the text-to-SQL model")
+    parser.add_argument("--dataset", required=True, help="JSON Lines file of labeled examples.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--server", help="Base URL of a running server.")
+    target.add_argument("--model", help="Path of a model to load in-process.")
+    parser.add_argument("--tokenizer", help="Tokenizer path for --model, defaults to the model path.")
+    parser.add_argument("--database", help="SQLite or DuckDB fixture database for all examples.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--min-accuracy", type=float, help="Fail below this execution accuracy.")
+    parser.add_argument("--max-p95", type=float, help="Fail above this p95 latency in seconds.")
+    parser.add_argument("--output", help="Write the per example results to this JSON Lines file.")
+    args = parser.parse_args()
+
+    if args.server:
+        generator = ServerGenerator(args.server)
+    else:
+        generator = InProcessGenerator(args.model, args.tokenizer)
+
+    summary, results = evaluate(
+        load_examples(args.dataset),
+        generator,
+        FixtureDatabases(args.database),
+        concurrency=args.concurrency,
+    )
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+
+    failed = False
+    if args.min_accuracy is not None and (summary["execution_accuracy"] or 0) < args.min_accuracy:
+        print(f"Execution accuracy is below {args.min_accuracy}")
+        failed = True
+    if args.max_p95 is not None and (summary["latency_p95_seconds"] or 0) > args.max_p95:
+        print(f"p95 latency is above {args.max_p95} s")
+        failed = True
+    sys.exit(1 if failed else 0)
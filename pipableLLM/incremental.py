@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import re
+from datetime import date
+
+import torch
+from peft import set_peft_model_state_dict
+from safetensors.torch import load_file
+from transformers import TrainerCallback
+
+from checkpointing import latest_checkpoint
+
+RUN_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}-v(\d+)$")
+
+
+def example_hash(example):
+    """
+    Hash the content of a training example.
+    """
+    content = {key: example[key] for key in ("context", "question", "answer")}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+class ExampleLedger:
+    """
+    Content hashes of the examples the model has already been trained on.
+
+    The ledger is a text file with one hash per line. It is only updated after a
+    successful run, by writing a new file and renaming it over the old one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hashes = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.hashes = {line.strip() for line in f if line.strip()}
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def fingerprint(self):
+        digest = hashlib.sha256()
+        for example_hash in sorted(self.hashes):
+            digest.update(example_hash.encode())
+        return digest.hexdigest()
+
+    def unseen(self, dataset):
+        """
+        Return the indices and content hashes of the examples not trained on yet.
+        """
+        indices, hashes = [], []
+        for index, example in enumerate(dataset):
+            content_hash = example_hash(example)
+            if content_hash not in self.hashes:
+                indices.append(index)
+                hashes.append(content_hash)
+        return indices, hashes
+
+    def add(self, hashes):
+        self.hashes.update(hashes)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(f"{example_hash}\n" for example_hash in sorted(self.hashes))
+        os.replace(tmp_path, self.path)
+
+
+def list_runs(runs_dir):
+    """
+    Return the run directories, oldest first.
+    """
+    if not os.path.isdir(runs_dir):
+        return []
+    runs = []
+    for name in os.listdir(runs_dir):
+        match = RUN_PATTERN.match(name)
+        if match:
+            runs.append((int(match.group(1)), name))
+    return [os.path.join(runs_dir, name) for _, name in sorted(runs)]
+
+
+def create_run_dir(runs_dir):
+    """
+    Create the output directory of a new run, <date>-v<version>.
+
+    The version increases with every run, so runs on the same day never share a
+    directory.
+    """
+    os.makedirs(runs_dir, exist_ok=True)
+    runs = list_runs(runs_dir)
+    version = int(RUN_PATTERN.match(os.path.basename(runs[-1])).group(1)) if runs else 0
+    while True:
+        version += 1
+        run_dir = os.path.join(runs_dir, f"{date.today()}-v{version}")
+        try:
+            os.makedirs(run_dir)
+            return run_dir
+        except FileExistsError:
+            continue
+
+
+def latest_run_checkpoint(runs_dir, exclude=None):
+    """
+    Return the latest checkpoint of the most recent run which has one.
+    """
+    for run_dir in reversed(list_runs(runs_dir)):
+        if exclude is not None and os.path.abspath(run_dir) == os.path.abspath(exclude):
+            continue
+        checkpoint = latest_checkpoint(run_dir)
+        if checkpoint is not None:
+            return checkpoint
+    return None
+
+
+def interrupted_run_dir(runs_dir):
+    """
+    Return the most recent run if it was interrupted, it then has a checkpoint but no
+    final_checkpoint, otherwise None.
+    """
+    runs = list_runs(runs_dir)
+    if not runs or os.path.isdir(os.path.join(runs[-1], "final_checkpoint")):
+        return None
+    return runs[-1] if latest_checkpoint(runs[-1]) is not None else None
+
+
+def load_adapter_weights(model, checkpoint_dir):
+    """
+    Load the adapter weights of a checkpoint into a PEFT model.
+    """
+    state_dict = load_file(os.path.join(checkpoint_dir, "adapter_model.safetensors"))
+    set_peft_model_state_dict(model, state_dict)
+
+
+class WarmStartCallback(TrainerCallback):
+    """
+    Start a new run from the optimizer state of a previous run's checkpoint.
+
+    Unlike resume_from_checkpoint, the step counter and the learning rate schedule
+    start from scratch, only the optimizer moments carry over.
+    """
+
+    def __init__(self, checkpoint_dir):
+        self.checkpoint_dir = checkpoint_dir
+
+    def on_train_begin(self, args, state, control, optimizer=None, **kwargs):
+        optimizer_path = os.path.join(self.checkpoint_dir, "optimizer.pt")
+        if optimizer is None or state.global_step > 0 or not os.path.exists(optimizer_path):
+            return control
+        try:
+            optimizer.load_state_dict(torch.load(optimizer_path, map_location="cpu"))
+        except (ValueError, KeyError) as e:
+            # The optimizer or the adapter layout changed since the previous run
+            print(f"Not restoring the optimizer state of {self.checkpoint_dir}: {e}")
+        return control
@@ -0,0 +1,115 @@
+import gc
+import os
+
+import torch
+from transformers import AutoModelForCausalLM
+
+# Backend and device of the server, configured with environment variables:
+#   PIPABLE_BACKEND      cuda_8bit (default), cuda_bf16, cpu_int8 or cpu_fp32, or "auto"
+#                        to use cuda_8bit when a GPU is available and cpu_int8 otherwise
+#   PIPABLE_NUM_THREADS  intra-op threads of the CPU backends, defaults to the core count
+BACKEND_ENV = "PIPABLE_BACKEND"
+NUM_THREADS_ENV = "PIPABLE_NUM_THREADS"
+
+
+class InferenceBackend:
+    """
+    Load a causal language model for generation on one kind of device.
+    """
+
+    name = None
+    device = None
+
+    def load_model(self, model_path):
+        raise NotImplementedError
+
+    def release_memory(self):
+        """
+        Return memory freed by the last generation to the device.
+        """
+
+
+class CudaBackend(InferenceBackend):
+    """
+    Generate on the GPU, with int8 weights through bitsandbytes or with bf16 weights.
+    """
+
+    device = "cuda"
+
+    def __init__(self, load_in_8bit=True):
+        self.load_in_8bit = load_in_8bit
+        self.name = "cuda_8bit" if load_in_8bit else "cuda_bf16"
+
+    def load_model(self, model_path):
+        from accelerate import Accelerator
+
+        return AutoModelForCausalLM.from_pretrained(
+            model_path,
+            device_map={"": Accelerator().local_process_index},
+            trust_remote_code=True,
+            torch_dtype=torch.bfloat16,
+            load_in_8bit=self.load_in_8bit,
+        )
+
+    def release_memory(self):
+        torch.cuda.empty_cache()
+
+
+class CpuBackend(InferenceBackend):
+    """
+    Generate on the CPU, optionally with int8 dynamic quantization.
+
+    Dynamic quantization stores the weights of every nn.Linear layer as int8 and
+    quantizes the activations on the fly, which roughly quarters the memory of the
+    linear layers and speeds up their matrix multiplications on x86 and ARM CPUs.
+    """
+
+    device = "cpu"
+
+    def __init__(self, quantize=True, num_threads=None):
+        self.quantize = quantize
+        self.name = "cpu_int8" if quantize else "cpu_fp32"
+        self.num_threads = num_threads or os.cpu_count() or 1
+
+    def load_model(self, model_path):
+        torch.set_num_threads(self.num_threads)
+        model = AutoModelForCausalLM.from_pretrained(
+            model_path,
+            trust_remote_code=True,
+            torch_dtype=torch.float32,
+            low_cpu_mem_usage=True,
+        )
+        model.eval()
+        if self.quantize:
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        return model
+
+    def release_memory(self):
+        gc.collect()
+
+
+def create_backend(name=None, num_threads=None):
+    """
+    Create the inference backend named by name or by the PIPABLE_BACKEND variable.
+
+    Raises ValueError for unknown backend names.
+    """
+    name = name or os.environ.get(BACKEND_ENV, "cuda_8bit")
+    if num_threads is None and os.environ.get(NUM_THREADS_ENV):
+        num_threads = int(os.environ[NUM_THREADS_ENV])
+    if name == "auto":
+        name = "cuda_8bit" if torch.cuda.is_available() else "cpu_int8"
+
+    if name == "cuda_8bit":
+        return CudaBackend(load_in_8bit=True)
+    if name == "cuda_bf16":
+        return CudaBackend(load_in_8bit=False)
+    if name == "cpu_int8":
+        return CpuBackend(quantize=True, num_threads=num_threads)
+    if name == "cpu_fp32":
+        return CpuBackend(quantize=False, num_threads=num_threads)
+    raise ValueError(
+        f"Unknown inference backend {name!r}, choose auto, cuda_8bit, cuda_bf16, cpu_int8 or cpu_fp32"
+    )
@@ -0,0 +1,189 @@
+import os
+import re
+from functools import lru_cache
+
+# Bump whenever the rendered prompt changes, cached tokenized datasets built with an
+# older template are then rebuilt instead of reused.
+TEMPLATE_VERSION = 1
+
+CREATE_TABLE_PATTERN = re.compile(r"CREATE TABLE ([\w.]+) \((.*?)\)")
+COLUMN_PATTERN = re.compile(r"(\w+) (\w+)")
+LIKE_PATTERN = re.compile(r"LIKE ([\w.]+)$")
+
+PROMPT_PREFIX = "[INST] Here is a database schema: "
+PROMPT_INSTRUCTION = (
+    "Please write me a syntactically correct SQL statement that answers the following question:"
+)
+PROMPT_SUFFIX = "[/INST]"
+
+# PIPABLE_MAX_PROMPT_TOKENS bounds the prompt of /generate, tables least relevant to the
+# question are left out of the schema until it fits (unset: no limit).
+MAX_PROMPT_TOKENS_ENV = "PIPABLE_MAX_PROMPT_TOKENS"
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+@lru_cache(maxsize=16384)
+def parse_table(statement):
+    """
+    Return the table name and the (column name, TYPE) pairs of one CREATE TABLE statement.
+
+    A "(LIKE other)" column list is returned as the name of the other table, and None
+    is returned when the statement is not a CREATE TABLE statement.
+    """
+    match = CREATE_TABLE_PATTERN.search(statement)
+    if not match:
+        return None
+    like_match = LIKE_PATTERN.match(match.group(2).strip())
+    if like_match:
+        return match.group(1), like_match.group(1)
+
+    columns = []
+    for column in match.group(2).split(","):
+        column_match = COLUMN_PATTERN.match(column.strip())
+        if column_match:
+            columns.append((column_match.group(1), column_match.group(2).upper()))
+    return match.group(1), tuple(columns)
+
+
+@lru_cache(maxsize=4096)
+def parse_tables(context):
+    """
+    Return the (table name, (column name, TYPE) pairs) of the CREATE TABLE statements of a
+    context, with "(LIKE other)" column lists replaced by the columns of the other table.
+    """
+    tables = []
+    columns_of = {}
+    for statement in context.split(";"):
+        table = parse_table(statement)
+        if table is None:
+            continue
+        name, columns = table
+        if isinstance(columns, str):
+            columns = columns_of.get(columns, ())
+        columns_of[name] = columns
+        tables.append((name, columns))
+    return tuple(tables)
+
+
+@lru_cache(maxsize=4096)
+def parse_schema(context):
+    """
+    Return the (table name, column names) pairs of the CREATE TABLE statements of a context.
+    """
+    return tuple(
+        (name, tuple(column for column, _ in columns)) for name, columns in parse_tables(context)
+    )
+
+
+@lru_cache(maxsize=16384)
+def render_table(name, columns):
+    """
+    Render the schema line of one table of a prompt.
+    """
+    parts = [f"table schema: {name}:"]
+    parts.extend(f'"{column}" [ {data_type}]' for column, data_type in columns)
+    return " ".join(parts)
+
+
+@lru_cache(maxsize=4096)
+def render_schema(context):
+    """
+    Render the ";" separated CREATE TABLE statements of a context.
+
+    Segments which are not CREATE TABLE statements, such as the empty one after a
+    trailing ";", are skipped.
+    """
+    return "".join(f"{render_table(name, columns)} " for name, columns in parse_tables(context))
+
+
+def render_prompt(context, question):
+    """
+    Render the instruction prompt for a question about the tables of a context.
+    """
+    return f"{PROMPT_PREFIX}{render_schema(context)}{PROMPT_INSTRUCTION}{question}{PROMPT_SUFFIX}"
+
+
+def words(text):
+    """
+    Return the lower-cased words of a text, without a plural "s".
+    """
+    return {
+        word[:-1] if len(word) > 3 and word.endswith("s") else word
+        for word in WORD_PATTERN.findall(text.lower())
+    }
+
+
+class PromptBudget:
+    """
+    Render prompts of at most max_tokens tokens.
+
+    When the schema of a context does not fit, tables are added in order of relevance to
+    the question, the words of the question found in their name and columns, until the
+    budget is used up, and rendered in their original order. Token counts are cached per
+    table line, the count of a prompt is the sum of the counts of its parts.
+    """
+
+    def __init__(self, tokenizer, max_tokens, cache_size=16384):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.count_tokens = lru_cache(maxsize=cache_size)(self._count_tokens)
+
+    def _count_tokens(self, text):
+        return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def render_prompt(self, context, question):
+        tables = parse_tables(context)
+        # The question changes with every request, so it is not cached
+        used = self._count_tokens(f"{PROMPT_PREFIX}{PROMPT_INSTRUCTION}{question}{PROMPT_SUFFIX}")
+        costs = [self.count_tokens(f"{render_table(name, columns)} ") for name, columns in tables]
+        if used + sum(costs) <= self.max_tokens:
+            return render_prompt(context, question)
+
+        question_words = words(question)
+
+        def relevance(index):
+            name, columns = tables[index]
+            name_words = words(name)
+            column_words = words(" ".join(column for column, _ in columns))
+            return 2 * len(name_words & question_words) + len(column_words & question_words)
+
+        selected = []
+        for index in sorted(range(len(tables)), key=lambda index: -relevance(index)):
+            if used + costs[index] <= self.max_tokens:
+                selected.append(index)
+                used += costs[index]
+        schema = "".join(f"{render_table(*tables[index])} " for index in sorted(selected))
+        return f"{PROMPT_PREFIX}{schema}{PROMPT_INSTRUCTION}{question}{PROMPT_SUFFIX}"
+
+
+def create_prompt_budget(tokenizer):
+    """
+    Create the prompt budget configured by PIPABLE_MAX_PROMPT_TOKENS, None when it is unset.
+    """
+    max_tokens = os.environ.get(MAX_PROMPT_TOKENS_ENV)
+    if not max_tokens:
+        return None
+    return PromptBudget(tokenizer, int(max_tokens))
+
+
+def render_prompts(pairs):
+    """
+    Render the prompts of many (context, question) pairs in one call.
+
+    Contexts shared by several pairs are only rendered once.
+    """
+    return [render_prompt(context, question) for context, question in pairs]
+
+
+def render_training_text(example):
+    """
+    Render a training example, the prompt followed by the expected SQL answer.
+    """
+    return f"{render_prompt(example['context'], example['question'])} {example['answer']}"
+
+
+def extract_answer(output):
+    """
+    Remove the prompt from a decoded generation.
+    """
+    return output.split(PROMPT_SUFFIX)[1]
@@ -1,94 +1,288 @@
 from flask import Flask, request
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from peft import AutoPeftModelForCausalLM
+from transformers import AutoTokenizer, LogitsProcessorList
+from peft import AutoPeftModelForCausalLM, PeftModel
 from accelerate import Accelerator
-from datetime import date
-import re
+import os
+import signal
+import sys
+import threading
 
 from sft import SFT
+from prompt_renderer import create_prompt_budget, extract_answer, render_prompt
+from incremental import ExampleLedger, create_run_dir, interrupted_run_dir, latest_run_checkpoint
+from inference_backends import create_backend
+from speculative_decoding import create_speculative_decoder
+from transport import UnsupportedBody, max_body_bytes, read_body, respond
+from constrained_decoding import ConstrainedDecoding, constrained_by_default
+from warmup import compile_model, create_length_buckets, create_warmup, uncompile_model
+from admission import (
+    DeadlineExceeded,
+    Rejected,
+    create_admission_controller,
+    drain_timeout,
+    remaining_seconds,
+    request_deadline,
+)
 
 app = Flask(__name__)
+# Larger request bodies are rejected with 413 before they are read, see transport.py
+app.config["MAX_CONTENT_LENGTH"] = max_body_bytes()
 
-model = AutoModelForCausalLM.from_pretrained(
-    "./checkpoints/llama-7b-text-to-sql/final_merged_checkpoint",
-    device_map={"": Accelerator().local_process_index},
-    trust_remote_code=True,
-    torch_dtype=torch.bfloat16,
-    load_in_8bit=True
+RUNS_DIR = "./checkpoints/runs"
+LEDGER_PATH = "./checkpoints/trained_examples.txt"
+
+MODEL_PATH = os.environ.get(
+    "PIPABLE_MODEL_PATH", "./checkpoints/llama-7b-text-to-sql/final_merged_checkpoint"
 )
 
+# The device and weight format come from PIPABLE_BACKEND, see inference_backends.py
+backend = create_backend()
+model = backend.load_model(MODEL_PATH)
+# Adapter of the last /train request served on top of the loaded model, None when
+# the served model has no separate adapter
+served_adapter = None
+# Optional draft model for speculative decoding, see speculative_decoding.py
+speculative_decoder = create_speculative_decoder(backend)
+
 
 infer_tokenizer = AutoTokenizer.from_pretrained(
-    "./checkpoints/base-llama-7b-chat-hf", trust_remote_code=True, use_fast=False
+    "./checkpoints/base-llama-7b-chat-hf", trust_remote_code=True, use_fast=True
 )
 
 infer_tokenizer.pad_token = infer_tokenizer.eos_token
 infer_tokenizer.padding_side = "right"
 
+# Static KV cache and prompts padded to length buckets when PIPABLE_COMPILE=1, see warmup.py
+length_buckets = create_length_buckets(infer_tokenizer)
+if length_buckets is not None:
+    model = compile_model(model)
+    if speculative_decoder is not None:
+        print("Speculative decoding is not used in compiled mode.")
+        speculative_decoder = None
+
+# Identifier tries of the schemas seen so far, see constrained_decoding.py
+constrained_decoding = ConstrainedDecoding(infer_tokenizer)
+
+# None unless PIPABLE_MAX_PROMPT_TOKENS is set
+prompt_budget = create_prompt_budget(infer_tokenizer)
+
+# Bounded queue and per-client limits in front of the model, see admission.py
+admission = create_admission_controller()
+
+# Representative generations run before the server reports ready, see warmup.py
+warmup = create_warmup()
+WARMUP_RETRY_AFTER = 5
+
+
+def client_id():
+    return request.headers.get("X-Client-Id") or request.remote_addr
+
+
+@app.errorhandler(Rejected)
+def rejected(error):
+    return respond(
+        {"status": "error", "message": error.message},
+        error.status,
+        {"Retry-After": str(error.retry_after)},
+    )
+
+
+@app.errorhandler(DeadlineExceeded)
+def deadline_exceeded(error):
+    return respond({"status": "error", "message": str(error)}, error.status)
+
+
+@app.errorhandler(UnsupportedBody)
+def unsupported_body(error):
+    # Clients fall back to plain JSON on 415, so it is always answered in JSON, as is 413
+    return {"status": "error", "message": str(error)}, error.status
+
+
+def check_ready():
+    """
+    Reject requests with 503 until the warmup has succeeded.
+    """
+    if not warmup.ready.is_set():
+        raise Rejected(503, "The model is warming up.", WARMUP_RETRY_AFTER)
+
+
+def shutdown(signum, frame):
+    """
+    Stop admitting requests and let the in-flight ones finish before exiting.
+    """
+    print("Shutting down, draining in-flight requests.")
+    if not admission.drain(drain_timeout()):
+        print("Drain timed out, exiting with requests still in flight.")
+    sys.exit(0)
+
+
+if threading.current_thread() is threading.main_thread():
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
 train_tokenizer = AutoTokenizer.from_pretrained(
     "./checkpoints/base-llama-7b-chat-hf",
     trust_remote_code=True,
-    use_fast=False,
+    use_fast=True,
     add_eos_token=True,
 )
 
 train_tokenizer.pad_token = train_tokenizer.eos_token
 train_tokenizer.padding_side = "right"
 
-def process_output(output):
-    """
-    Process the output to remove the prompt.
-    """
-    return output.split("[/INST]")[1]
-
-def parse_create_table(query):
-    table_name_match = re.search(r'CREATE TABLE (\w+) \((.*?)\)', query)
-    
-    if table_name_match:
-        table_name = table_name_match.group(1)
-        column_defs = table_name_match.group(2)
-        
-        columns = [col.strip() for col in column_defs.split(',')]
-        
-        schema = f"table schema: {table_name}:"
-        for col in columns:
-            col_match = re.match(r'(\w+) (\w+)', col)
-            if col_match:
-                col_name = col_match.group(1)
-                col_type = col_match.group(2)
-                schema += f' "{col_name}" [ {col_type.upper()}]'
-        
-        return schema
-
-def parse_prompt(context, question):
-    llm_input = "[INST] Here is a database schema: "
-    for table in context.split(';'):
-        llm_input += parse_create_table(table) + " "
-    
-    llm_input += "Please write me a syntactically correct SQL statement that answers the following question:"
-    llm_input += question + "[/INST]"
-
-    return llm_input
-
 
 @app.route("/generate", methods=["POST"])
 def generate():
     """
     Generate a text from a given prompt.
     """
-    data = request.json
+    try:
+        deadline = request_deadline(request.headers)
+    except ValueError as e:
+        return respond({"status": "error", "message": str(e)}, 400)
+    check_ready()
+    data = read_body()
     context = data.get("context").strip()
     question = data.get("question").strip()
-    prompt = parse_prompt(context, question)
-    input_ids = infer_tokenizer([prompt], return_tensors="pt").to("cuda")
-    generated_ids = model.generate(**input_ids)
+    if prompt_budget is None:
+        prompt = render_prompt(context, question)
+    else:
+        prompt = prompt_budget.render_prompt(context, question)
+    input_ids = infer_tokenizer([prompt], return_tensors="pt").to(backend.device)
+    if length_buckets is not None:
+        input_ids = length_buckets.pad(input_ids)
+    generate_kwargs = {}
+    if data.get("constrained", constrained_by_default()):
+        generate_kwargs["logits_processor"] = LogitsProcessorList(
+            [constrained_decoding.logits_processor(context, input_ids["input_ids"].shape[1])]
+        )
+    speculative = speculative_decoder is not None and data.get("speculative", True)
+    with admission.admit(client_id(), deadline):
+        if deadline is not None:
+            # Stop decoding when the client stops waiting
+            generate_kwargs["max_time"] = remaining_seconds(deadline)
+        generated_ids, speculative_metrics = run_generation(input_ids, speculative, **generate_kwargs)
+    if deadline is not None:
+        # A generation cut short by max_time is incomplete, and nobody waits for it
+        remaining_seconds(deadline)
+    generated_tokens = generated_ids.shape[1] - input_ids["input_ids"].shape[1]
     output = infer_tokenizer.batch_decode(generated_ids, skip_special_tokens=True)[0]
-    torch.cuda.empty_cache()
 
-    output = process_output(output).strip()
+    output = extract_answer(output).strip()
+
+    response = {"output": output, "generated_tokens": generated_tokens}
+    if speculative_metrics is not None:
+        response["speculative"] = speculative_metrics
+    return respond(response)
+
+
+def run_generation(input_ids, speculative=False, **generate_kwargs):
+    """
+    Generate from tokenized prompts with the served model.
+
+    Returns the generated ids and the speculative decoding metrics, None without it.
+    """
+    speculative_metrics = None
+    if length_buckets is not None:
+        generate_kwargs["cache_implementation"] = "static"
+    if speculative:
+        generated_ids, speculative_metrics = speculative_decoder.generate(
+            model, input_ids, **generate_kwargs
+        )
+    else:
+        generated_ids = model.generate(**input_ids, **generate_kwargs)
+    backend.release_memory()
+    return generated_ids, speculative_metrics
+
+
+def warmup_generation(inputs):
+    # Without speculative decoding, which only supports single prompts and whose
+    # acceptance metrics only count requests
+    if length_buckets is not None:
+        inputs = length_buckets.pad(inputs)
+    run_generation(inputs)
+
+
+def disable_compiled_mode():
+    """
+    Serve the uncompiled model with a dynamic KV cache, after compiled mode failed its warmup.
+    """
+    global model, length_buckets
+
+    model = uncompile_model(model)
+    length_buckets = None
 
-    return {"output": output}
+
+def warmup_fallback():
+    return disable_compiled_mode if length_buckets is not None else None
+
+
+def prepare_served_model():
+    """
+    Compile a newly trained model in compiled mode and warm it up before it serves requests.
+    """
+    global model
+
+    if length_buckets is not None:
+        model = compile_model(model)
+    if warmup.enabled:
+        warmup.ready.clear()
+        warmup.run(warmup_generation, infer_tokenizer, backend.device, warmup_fallback())
+
+
+def unadapted_model():
+    """
+    Return the served model without its compiled forward pass and trained adapter, to train a new adapter on.
+    """
+    global model
+
+    model = uncompile_model(model)
+    if isinstance(model, PeftModel):
+        model = model.unload()
+    return model
+
+
+def restore_served_model(trained):
+    """
+    Serve the previous adapter again after a /train request that did not produce a new model.
+
+    trained is the model the request trained, its base model without the new adapter is reused.
+    """
+    global model
+
+    model = trained.unload() if isinstance(trained, PeftModel) else trained
+    if served_adapter is not None:
+        model = PeftModel.from_pretrained(model, served_adapter)
+    model.config.use_cache = True
+    model.eval()
+
+
+warmup.start(warmup_generation, infer_tokenizer, backend.device, warmup_fallback())
+
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """
+    Report whether the server is ready for requests, which it is once the warmup has
+    succeeded and until it starts shutting down.
+    """
+    is_ready = warmup.ready.is_set() and not admission.draining
+    return respond(warmup.stats(), 200 if is_ready else 503)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Report the speculative decoding acceptance metrics accumulated since startup
+    and the state of the request queue.
+    """
+    return {
+        "backend": backend.name,
+        "admission": admission.stats(),
+        "warmup": warmup.stats(),
+        "speculative": speculative_decoder.summary() if speculative_decoder is not None else None,
+    }
 
 
 @app.route("/train", methods=["POST"])
@@ -96,19 +290,94 @@ def train():
     """
     Train the model on a given dataset.
     """
-    global model
+    if backend.device != "cuda":
+        return respond(
+            {
+                "status": "error",
+                "message": f"Training needs a CUDA backend, the server runs {backend.name}.",
+            }
+        )
+
+    check_ready()
+    data = read_body()
+    # Training replaces the served model, generation waits for it in the queue
+    with admission.admit(client_id()):
+        response = train_model(data)
+        # The served model is rebuilt by every request, also when no new model was trained
+        prepare_served_model()
+        return respond(response)
+
+
+def train_model(data):
+    """
+    Train the served model on the dataset of a /train request and serve the result.
+    """
+    global model, served_adapter
 
-    data = request.json
     dataset_path = data.get("dataset_path")
-    output_dir = f"./checkpoints/{date.today()}"
+    streaming = data.get("streaming", False)
+    packing = data.get("packing", True)
+    deduplicate = data.get("deduplicate", True)
+    save_merged = data.get("save_merged", False)
+    # Incremental runs only train on new examples, starting from the previous run's adapter
+    incremental = data.get("incremental", True)
+    profile = data.get("profile", "default")
+    # Continue the interrupted most recent run in its own directory, a finished run is never resumed
+    resume = data.get("resume", False)
+    output_dir = interrupted_run_dir(RUNS_DIR) if resume else None
+    if output_dir is None:
+        resume = False
+        output_dir = create_run_dir(RUNS_DIR)
+    ledger = ExampleLedger(LEDGER_PATH) if incremental else None
+    init_checkpoint = None
+    if incremental and not resume:
+        init_checkpoint = latest_run_checkpoint(RUNS_DIR, exclude=output_dir)
 
+    # A new adapter is trained on the base model, never on top of the adapter served so far,
+    # so the profile's LoRA settings apply and non incremental runs start from scratch
+    base_model = unadapted_model()
+    sft = None
+    merged = False
     try:
-        sft = SFT(model, train_tokenizer, dataset_path, output_dir)
+        sft = SFT(
+            base_model,
+            train_tokenizer,
+            dataset_path,
+            output_dir,
+            streaming=streaming,
+            packing=packing,
+            deduplicate=deduplicate,
+            ledger=ledger,
+            init_checkpoint=init_checkpoint,
+            profile=profile,
+        )
+
+        if sft.new_example_hashes is not None and not sft.new_example_hashes:
+            if not resume:
+                os.rmdir(output_dir)
+            restore_served_model(sft.trainer.model)
+            return {"status": "success", "message": "No new examples to train on."}
 
-        sft.trainer.train()
-        sft.trainer.save_model(output_dir)
+        sft.train(resume=resume)
+        if ledger is not None and sft.new_example_hashes is not None:
+            ledger.add(sft.new_example_hashes)
         sft.trainer.model.save_pretrained(f"{output_dir}/final_checkpoint")
 
+        if not save_merged:
+            # Serve the trained adapter on top of the loaded base model, no full weights are written
+            model = sft.trainer.model
+            served_adapter = f"{output_dir}/final_checkpoint"
+            model.config.use_cache = True
+            model.eval()
+            return {
+                "status": "success",
+                "message": "Model trained successfully.",
+                "output_dir": output_dir,
+                "data_stats": sft.data_stats,
+            }
+
+        merged = True
+        served_adapter = None
         del model
         torch.cuda.empty_cache()
 
@@ -126,15 +395,16 @@ def train():
         del model
         torch.cuda.empty_cache()
 
-        model = AutoModelForCausalLM.from_pretrained(
-            output_merged_dir,
-            device_map={"": Accelerator().local_process_index},
-            trust_remote_code=True,
-            torch_dtype=torch.bfloat16,
-            load_in_8bit=True
-        )
+        model = backend.load_model(output_merged_dir)
 
-        return {"status": "success", "message": "Model trained successfully."}
+        return {
+            "status": "success",
+            "message": "Model trained successfully.",
+            "output_dir": output_dir,
+            "data_stats": sft.data_stats,
+        }
 
     except Exception as e:
+        if not merged:
+            restore_served_model(sft.trainer.model if sft is not None else base_model)
         return {"status": "error", "message": str(e)}
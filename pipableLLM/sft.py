@@ -1,8 +1,13 @@
+import dataclasses
+
 from trl import SFTTrainer
 from peft import LoraConfig
 from transformers import TrainingArguments
 from datasets import load_dataset
 from data_preprocessor import DataProcessor
+from checkpointing import AsyncCheckpointCallback, latest_checkpoint
+from incremental import WarmStartCallback, load_adapter_weights
+from training_profiles import get_profile
 
 
 class SFT:
@@ -12,39 +17,76 @@ class SFT:
         tokenizer,
         dataset_path,
         output_dir,
+        streaming=False,
+        packing=True,
+        deduplicate=True,
+        save_steps=50,
+        keep_checkpoints=3,
+        ledger=None,
+        init_checkpoint=None,
+        profile="default",
+        cache_dir="./datasets/tokenized",
     ):
+        # Streamed datasets are always packed into fixed length blocks
+        packing = packing or streaming
         self.base_model = base_model
         self.tokenizer = tokenizer
         self.dataset_path = dataset_path
+        self.output_dir = output_dir
+        self.profile = get_profile(profile)
         self.lora_hyperparameters = LoraConfig(**{
-                            "lora_alpha": 16,
-                            "r": 8,
-                            "lora_dropout": 0.05,
-                            "target_modules": ["q_proj", "v_proj"],
+                            "lora_alpha": self.profile["lora_alpha"],
+                            "r": self.profile["lora_r"],
+                            "lora_dropout": self.profile["lora_dropout"],
+                            "target_modules": self.profile["lora_target_modules"],
                             "bias": "none",
                             "task_type": "CAUSAL_LM"
                         })
         
         self.sft_hyperparameters = TrainingArguments(**{
                             "output_dir": output_dir,
-                            "per_device_train_batch_size": 4,
-                            "gradient_accumulation_steps": 2,
+                            "per_device_train_batch_size": self.profile["per_device_train_batch_size"],
+                            "gradient_accumulation_steps": self.profile["gradient_accumulation_steps"],
                             "per_device_eval_batch_size": 1,
-                            "learning_rate": 1e-4,
+                            "learning_rate": self.profile["learning_rate"],
                             "logging_steps": 10,
-                            "max_steps": 500,
-                            "save_steps": 10,
-                            "group_by_length": False,
+                            "max_steps": self.profile["max_steps"],
+                            # Adapter checkpoints are written by AsyncCheckpointCallback instead
+                            "save_strategy": "no",
+                            # Unpacked examples are padded per batch, batch similar lengths together
+                            "group_by_length": not packing,
                             "lr_scheduler_type": "cosine",
-                            "warmup_steps": 100,
-                            "optim": "paged_adamw_32bit",
-                            "bf16": True,
-                            "remove_unused_columns": False,
-                            "run_name": "sft_llama2"
+                            "warmup_steps": self.profile["warmup_steps"],
+                            "optim": self.profile["optim"],
+                            "bf16": self.profile["precision"] == "bf16",
+                            "fp16": self.profile["precision"] == "fp16",
+                            "use_cpu": self.profile["device"] == "cpu",
+                            "remove_unused_columns": not packing,
+                            "run_name": "sft_llama2",
+                            # Every process reads its own part of a streamed dataset
+                            "accelerator_config": {"dispatch_batches": False} if streaming else None,
                         })
         
         processed_data = DataProcessor(
-            self.dataset_path , self.tokenizer,
+            self.dataset_path , self.tokenizer, streaming=streaming,
+            packing=packing, deduplicate=deduplicate, cache_dir=cache_dir,
+            seq_length=self.profile["seq_length"],
+            batch_size=self.sft_hyperparameters.per_device_train_batch_size,
+            ledger=None if streaming else ledger,
+        )
+        self.data_stats = processed_data.stats
+        self.new_example_hashes = processed_data.new_example_hashes
+        if init_checkpoint is not None and hasattr(processed_data.train_dataset, "__len__"):
+            # An incremental run makes a single pass over the new examples
+            args = self.sft_hyperparameters
+            sequences_per_step = args.per_device_train_batch_size * args.gradient_accumulation_steps
+            max_steps = -(-len(processed_data.train_dataset) // sequences_per_step)
+            max_steps = max(1, min(args.max_steps, max_steps))
+            self.sft_hyperparameters = dataclasses.replace(
+                args, max_steps=max_steps, warmup_steps=min(args.warmup_steps, max_steps // 10)
+            )
+        self.checkpointing = AsyncCheckpointCallback(
+            output_dir, save_steps=save_steps, keep_last=keep_checkpoints
         )
 
         self.trainer = SFTTrainer(
@@ -53,5 +95,30 @@ class SFT:
             peft_config=self.lora_hyperparameters,
             args=self.sft_hyperparameters,
             train_dataset=processed_data.train_dataset,
-            packing=True
-        ) 
\ No newline at end of file
+            packing=packing,
+            formatting_func=None if packing else processed_data.prepare_sample_texts,
+            max_seq_length=None if packing else self.profile["seq_length"],
+            callbacks=[self.checkpointing],
+        )
+
+        if init_checkpoint is not None:
+            # Continue from the adapter and optimizer state of a previous run
+            try:
+                load_adapter_weights(self.trainer.model, init_checkpoint)
+                self.trainer.add_callback(WarmStartCallback(init_checkpoint))
+                print(f"Initialized the adapter from {init_checkpoint}")
+            except RuntimeError as e:
+                # The LoRA rank or target modules of the profile changed
+                print(f"Training a new adapter, {init_checkpoint} does not fit: {e}")
+
+    def train(self, resume=False):
+        """
+        Train the adapter, with resume from the latest checkpoint in output_dir if there is one.
+        """
+        checkpoint = latest_checkpoint(self.output_dir) if resume else None
+        if checkpoint is not None:
+            print(f"Resuming training from {checkpoint}")
+        result = self.trainer.train(resume_from_checkpoint=checkpoint)
+        self.checkpointing.wait()
+        return result
+ 
@@ -0,0 +1,124 @@
+import os
+import threading
+
+# Speculative decoding is enabled by pointing PIPABLE_DRAFT_MODEL_PATH at a small model
+# sharing the tokenizer of the served model, e.g. a 1B Llama model for the 7B one.
+#   PIPABLE_DRAFT_TOKENS    tokens the draft model proposes per verification pass (5)
+#   PIPABLE_DRAFT_SCHEDULE  "constant", or "heuristic" to adapt the number of proposed
+#                           tokens to the acceptance of the previous pass
+DRAFT_MODEL_ENV = "PIPABLE_DRAFT_MODEL_PATH"
+DRAFT_TOKENS_ENV = "PIPABLE_DRAFT_TOKENS"
+DRAFT_SCHEDULE_ENV = "PIPABLE_DRAFT_SCHEDULE"
+
+
+class _ForwardCounter:
+    """
+    Count the forward passes a model makes in the current thread.
+
+    The hook sits on the output embedding layer, which runs exactly once per forward
+    pass whether the model is wrapped by PEFT or quantized.
+    """
+
+    def __init__(self, model):
+        self.count = 0
+        self.thread = threading.get_ident()
+        self.handle = model.get_output_embeddings().register_forward_hook(self._hook)
+
+    def _hook(self, module, inputs, output):
+        if threading.get_ident() == self.thread:
+            self.count += 1
+
+    def remove(self):
+        self.handle.remove()
+
+
+class SpeculativeDecoder:
+    """
+    Generate with assisted decoding: the draft model proposes num_draft_tokens tokens,
+    the main model verifies all of them in a single forward pass and keeps the
+    longest prefix it agrees with, plus one token of its own. With greedy decoding
+    the output is the one the main model produces alone.
+
+    Every verification pass yields the accepted draft tokens plus one, so the
+    accepted draft tokens are the generated tokens minus the main model passes, and
+    the proposed draft tokens are the draft model passes.
+    """
+
+    def __init__(self, draft_model, num_draft_tokens=5, schedule="constant"):
+        self.draft_model = draft_model
+        self.num_draft_tokens = num_draft_tokens
+        self.schedule = schedule
+        self.lock = threading.Lock()
+        self.totals = {
+            "requests": 0,
+            "generated_tokens": 0,
+            "verification_passes": 0,
+            "draft_tokens": 0,
+            "accepted_tokens": 0,
+        }
+
+    def generate(self, model, inputs, **kwargs):
+        """
+        Generate with the draft model's help and return the generated ids and the
+        acceptance metrics of this request.
+        """
+        self.draft_model.generation_config.num_assistant_tokens = self.num_draft_tokens
+        self.draft_model.generation_config.num_assistant_tokens_schedule = self.schedule
+        main_passes = _ForwardCounter(model)
+        draft_passes = _ForwardCounter(self.draft_model)
+        try:
+            generated_ids = model.generate(**inputs, assistant_model=self.draft_model, **kwargs)
+        finally:
+            main_passes.remove()
+            draft_passes.remove()
+
+        generated_tokens = generated_ids.shape[1] - inputs["input_ids"].shape[1]
+        accepted = max(0, generated_tokens - main_passes.count)
+        metrics = {
+            "generated_tokens": generated_tokens,
+            "verification_passes": main_passes.count,
+            "draft_tokens": draft_passes.count,
+            "accepted_tokens": accepted,
+            "acceptance_rate": accepted / draft_passes.count if draft_passes.count else None,
+        }
+        with self.lock:
+            self.totals["requests"] += 1
+            for key in ("generated_tokens", "verification_passes", "draft_tokens", "accepted_tokens"):
+                self.totals[key] += metrics[key]
+        return generated_ids, metrics
+
+    def summary(self):
+        """
+        Return the acceptance metrics accumulated over all requests.
+        """
+        with self.lock:
+            totals = dict(self.totals)
+        totals["num_draft_tokens"] = self.num_draft_tokens
+        totals["schedule"] = self.schedule
+        totals["acceptance_rate"] = (
+            totals["accepted_tokens"] / totals["draft_tokens"] if totals["draft_tokens"] else None
+        )
+        totals["tokens_per_verification_pass"] = (
+            totals["generated_tokens"] / totals["verification_passes"]
+            if totals["verification_passes"]
+            else None
+        )
+        return totals
+
+
+def create_speculative_decoder(backend):
+    """
+    Load the draft model configured by PIPABLE_DRAFT_MODEL_PATH with the server's
+    inference backend, or return None when speculative decoding is not configured.
+    """
+    draft_model_path = os.environ.get(DRAFT_MODEL_ENV)
+    if not draft_model_path:
+        return None
+    schedule = os.environ.get(DRAFT_SCHEDULE_ENV, "constant")
+    if schedule not in ("constant", "heuristic"):
+        raise ValueError(f"{DRAFT_SCHEDULE_ENV} must be constant or heuristic, not {schedule!r}")
+    return SpeculativeDecoder(
+        backend.load_model(draft_model_path),
+        num_draft_tokens=int(os.environ.get(DRAFT_TOKENS_ENV, 5)),
+        schedule=schedule,
+    )
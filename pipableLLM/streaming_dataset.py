@@ -0,0 +1,138 @@
+import glob
+import json
+import os
+import random
+
+import torch
+import torch.distributed as dist
+from torch.utils.data import IterableDataset, get_worker_info
+
+
+def dataset_files(dataset_path):
+    """
+    Expand a dataset path into its JSON Lines shards.
+
+    The path can be a single file, a directory, whose *.json and *.jsonl files are
+    used, or a glob pattern.
+    """
+    if os.path.isdir(dataset_path):
+        files = glob.glob(os.path.join(dataset_path, "*.jsonl"))
+        files += glob.glob(os.path.join(dataset_path, "*.json"))
+    else:
+        files = glob.glob(dataset_path)
+    if not files:
+        raise ValueError(f"No dataset files found at {dataset_path}")
+    return sorted(files)
+
+
+class StreamingPackedDataset(IterableDataset):
+    """
+    Fixed length training sequences streamed from JSON Lines shards.
+
+    Examples are read lazily line by line, rendered and tokenized in small batches
+    and packed into seq_length blocks, so host memory stays bounded by the batch and
+    shuffle buffers whatever the size of the corpus. The stream is split between
+    training processes and dataloader workers: by whole files when there are at
+    least as many files as readers, by lines otherwise.
+
+    Yields the same {"input_ids", "labels"} samples as trl's ConstantLengthDataset.
+    """
+
+    def __init__(
+        self,
+        files,
+        tokenizer,
+        formatting_func,
+        seq_length=1024,
+        batch_size=256,
+        shuffle_buffer=1000,
+        infinite=True,
+        seed=0,
+    ):
+        self.files = list(files)
+        self.tokenizer = tokenizer
+        self.formatting_func = formatting_func
+        self.seq_length = seq_length
+        self.batch_size = batch_size
+        self.shuffle_buffer = shuffle_buffer
+        self.infinite = infinite
+        self.seed = seed
+
+    def _reader(self):
+        """
+        Return the index of this reader and the total number of readers.
+        """
+        rank, world_size = 0, 1
+        if dist.is_available() and dist.is_initialized():
+            rank, world_size = dist.get_rank(), dist.get_world_size()
+        worker = get_worker_info()
+        worker_id, num_workers = (worker.id, worker.num_workers) if worker else (0, 1)
+        return rank * num_workers + worker_id, world_size * num_workers
+
+    def _examples(self, epoch):
+        reader, n_readers = self._reader()
+        files = list(self.files)
+        random.Random(self.seed + epoch).shuffle(files)
+        split_files = len(files) >= n_readers
+        if split_files:
+            files = files[reader::n_readers]
+
+        line_index = 0
+        for path in files:
+            with open(path) as f:
+                for line in f:
+                    if not split_files:
+                        line_index += 1
+                        if line_index % n_readers != reader:
+                            continue
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
+
+    def _blocks(self, epoch):
+        eos_token_id = self.tokenizer.eos_token_id
+        stream = []
+        batch = []
+        examples = self._examples(epoch)
+        while True:
+            example = next(examples, None)
+            if example is not None:
+                batch.append(self.formatting_func(example))
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                for ids in self.tokenizer(batch, truncation=False)["input_ids"]:
+                    stream.extend(ids)
+                    stream.append(eos_token_id)
+                batch = []
+            n_blocks = len(stream) // self.seq_length
+            for i in range(n_blocks):
+                yield stream[i * self.seq_length : (i + 1) * self.seq_length]
+            stream = stream[n_blocks * self.seq_length :]
+            if example is None:
+                return
+
+    def __iter__(self):
+        epoch = 0
+        rng = random.Random(self.seed + self._reader()[0])
+        buffer = []
+        while True:
+            n_blocks = 0
+            for block in self._blocks(epoch):
+                n_blocks += 1
+                if len(buffer) < self.shuffle_buffer:
+                    buffer.append(block)
+                    continue
+                index = rng.randrange(len(buffer))
+                block, buffer[index] = buffer[index], block
+                yield self._sample(block)
+            epoch += 1
+            if not self.infinite or n_blocks == 0:
+                break
+        rng.shuffle(buffer)
+        for block in buffer:
+            yield self._sample(block)
+
+    def _sample(self, block):
+        input_ids = torch.LongTensor(block)
+        return {"input_ids": input_ids, "labels": input_ids.clone()}
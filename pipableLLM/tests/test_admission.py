@@ -0,0 +1,122 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import AdmissionController, DeadlineExceeded, Rejected, remaining_seconds
+
+
+class TestAdmissionController(unittest.TestCase):
+    def setUp(self):
+        self.admission = AdmissionController(max_queue=1, max_client_concurrency=2)
+        self.release = threading.Event()
+        self.threads = []
+        # Cleanups run last in first: the held requests are released, then joined
+        self.addCleanup(self.join)
+        self.addCleanup(self.release.set)
+
+    def join(self):
+        for thread in self.threads:
+            thread.join(5)
+
+    def hold(self, client_id):
+        """
+        Start a request of client_id which, once admitted, holds the model until self.release is set.
+        """
+
+        def run():
+            try:
+                with self.admission.admit(client_id):
+                    self.release.wait(5)
+            except Rejected:
+                pass
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def wait_for(self, waiting, running):
+        for _ in range(500):
+            stats = self.admission.stats()
+            if (stats["waiting"], stats["running"]) == (waiting, running):
+                return
+            time.sleep(0.01)
+        self.fail(f"Expected {waiting} waiting and {running} running requests, got {stats}")
+
+    def test_client_over_its_limit_is_rejected_with_429(self):
+        self.hold("a")
+        self.wait_for(waiting=0, running=1)
+        self.hold("a")
+        self.wait_for(waiting=1, running=1)
+
+        with self.assertRaises(Rejected) as raised:
+            with self.admission.admit("a"):
+                pass
+
+        self.assertEqual(raised.exception.status, 429)
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        self.assertEqual(self.admission.stats()["rejected_client_limit"], 1)
+
+    def test_full_queue_is_rejected_with_503(self):
+        self.hold("a")
+        self.wait_for(waiting=0, running=1)
+        self.hold("b")
+        self.wait_for(waiting=1, running=1)
+
+        with self.assertRaises(Rejected) as raised:
+            with self.admission.admit("c"):
+                pass
+
+        self.assertEqual(raised.exception.status, 503)
+        self.assertEqual(self.admission.stats()["rejected_queue_full"], 1)
+
+        # The queue has room again once the model is free
+        self.release.set()
+        self.wait_for(waiting=0, running=0)
+        with self.admission.admit("c"):
+            self.assertEqual(self.admission.stats()["running"], 1)
+
+    def test_deadline_passes_while_queued(self):
+        self.hold("a")
+        self.wait_for(waiting=0, running=1)
+
+        with self.assertRaises(DeadlineExceeded):
+            with self.admission.admit("b", deadline=time.monotonic() + 0.05):
+                self.fail("The request ran after its deadline")
+
+        stats = self.admission.stats()
+        self.assertEqual(stats["expired_in_queue"], 1)
+        self.assertEqual((stats["waiting"], stats["running"]), (0, 1))
+        self.assertNotIn("b", self.admission.client_requests)
+
+    def test_remaining_seconds(self):
+        self.assertGreater(remaining_seconds(time.monotonic() + 10), 9)
+        with self.assertRaises(DeadlineExceeded):
+            remaining_seconds(time.monotonic() - 1)
+
+    def test_drain_waits_for_the_request_in_flight(self):
+        self.hold("a")
+        self.wait_for(waiting=0, running=1)
+        threading.Timer(0.1, self.release.set).start()
+
+        self.assertTrue(self.admission.drain(timeout=5))
+
+        self.assertEqual(self.admission.stats()["running"], 0)
+        with self.assertRaises(Rejected) as raised:
+            with self.admission.admit("b"):
+                pass
+        self.assertEqual(raised.exception.status, 503)
+
+    def test_drain_timeout(self):
+        self.hold("a")
+        self.wait_for(waiting=0, running=1)
+
+        self.assertFalse(self.admission.drain(timeout=0.05))
+        self.assertTrue(self.admission.draining)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import string
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import torch
+    from constrained_decoding import ConstrainedDecoding, SchemaTries
+except ImportError:
+    torch = None
+
+CONTEXT = "CREATE TABLE orders (id INT, amount NUMERIC, created_at DATE);CREATE TABLE customers (id INT, name TEXT)"
+
+
+class CharacterTokenizer:
+    """
+    A tokenizer with one token per printable character.
+
+    Identifiers then directly follow their trigger, as the words of a sentencepiece
+    tokenizer whose tokens carry the space before them.
+    """
+
+    vocabulary = list(string.printable)
+    all_special_ids = []
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+    def encode(self, text, add_special_tokens=True):
+        return [self.vocabulary.index(char) for char in text]
+
+    def convert_ids_to_tokens(self, ids):
+        return [self.vocabulary[token_id] for token_id in ids]
+
+
+@unittest.skipIf(torch is None, "torch and transformers are not installed")
+class TestSchemaTries(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = CharacterTokenizer()
+        self.tries = SchemaTries(self.tokenizer, CONTEXT)
+
+    def allows(self, trie, name):
+        node = trie
+        for token_id in self.tokenizer.encode(name):
+            node = node.get(token_id)
+            if node is None:
+                return False
+        return bool(node.get(None))
+
+    def test_table_positions(self):
+        for text in ("SELECT * FROM", "SELECT * FROM orders JOIN", "INSERT INTO"):
+            trie = self.tries.trie_for(text)
+            self.assertTrue(self.allows(trie, "orders"), text)
+            self.assertFalse(self.allows(trie, "invoices"), text)
+
+    def test_from_in_function_arguments_is_not_a_table_position(self):
+        for text in (
+            "SELECT EXTRACT(YEAR FROM",
+            "SELECT SUBSTRING(name FROM",
+            "SELECT TRIM(BOTH ' ' FROM",
+            "SELECT * FROM orders WHERE COALESCE(EXTRACT(MONTH FROM",
+        ):
+            self.assertIsNone(self.tries.trie_for(text), text)
+
+    def test_distinct_from_is_not_a_table_position(self):
+        self.assertIsNone(self.tries.trie_for("SELECT * FROM orders WHERE amount IS DISTINCT FROM"))
+        self.assertIsNone(self.tries.trie_for("SELECT * FROM orders WHERE amount IS NOT DISTINCT FROM"))
+
+    def test_from_in_string_literal_is_not_a_table_position(self):
+        self.assertIsNone(self.tries.trie_for("SELECT 'FROM"))
+
+    def test_subqueries_are_table_positions(self):
+        for text in (
+            "SELECT * FROM (SELECT id FROM",
+            "SELECT * FROM orders WHERE id IN (SELECT id FROM",
+            "SELECT COUNT(*) FROM",
+            "SELECT EXTRACT(YEAR FROM created_at) FROM",
+        ):
+            self.assertTrue(self.allows(self.tries.trie_for(text), "orders"), text)
+
+    def test_common_table_expressions_are_allowed(self):
+        text = "WITH totals AS (SELECT id, SUM(amount) AS total FROM orders GROUP BY id) SELECT * FROM"
+
+        trie = self.tries.trie_for(text)
+
+        self.assertTrue(self.allows(trie, "totals"))
+        self.assertTrue(self.allows(trie, "orders"))
+        self.assertFalse(self.allows(self.tries.table_trie, "totals"))
+        # The columns of a common table expression are defined by the query
+        self.assertIsNone(self.tries.trie_for(text + "totals WHERE totals."))
+
+    def test_subquery_aliases_are_allowed(self):
+        text = "SELECT * FROM (SELECT id FROM orders) AS recent JOIN"
+
+        self.assertTrue(self.allows(self.tries.trie_for(text), "recent"))
+
+    def test_column_positions(self):
+        trie = self.tries.trie_for("SELECT orders.")
+
+        self.assertTrue(self.allows(trie, "amount"))
+        self.assertFalse(self.allows(trie, "name"))
+
+
+@unittest.skipIf(torch is None, "torch and transformers are not installed")
+class TestSchemaLogitsProcessor(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = CharacterTokenizer()
+        self.decoding = ConstrainedDecoding(self.tokenizer)
+
+    def allowed_after(self, text):
+        input_ids = torch.tensor([self.tokenizer.encode(text)])
+        scores = torch.zeros((1, len(self.tokenizer)))
+        scores = self.decoding.logits_processor(CONTEXT, 0)(input_ids, scores)
+        return {self.tokenizer.vocabulary[i] for i in range(len(self.tokenizer)) if scores[0, i] == 0}
+
+    def test_table_position_masks_unknown_tables(self):
+        allowed = self.allowed_after("SELECT * FROM")
+
+        self.assertIn("o", allowed)
+        self.assertIn("c", allowed)
+        self.assertNotIn("i", allowed)
+
+    def test_function_arguments_are_not_masked(self):
+        self.assertEqual(len(self.allowed_after("SELECT EXTRACT(YEAR FROM")), len(self.tokenizer))
+
+    def test_common_table_expression_continues(self):
+        allowed = self.allowed_after("WITH t AS (SELECT id FROM orders) SELECT * FROM")
+
+        self.assertIn("t", allowed)
+
+
+if __name__ == "__main__":
+    unittest.main()
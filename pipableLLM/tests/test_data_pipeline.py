@@ -0,0 +1,110 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_pipeline import (
+    MinHash,
+    deduplicate_examples,
+    length_grouped_batches,
+    normalize_question,
+    normalize_sql,
+    padding_tokens,
+)
+
+CONTEXT = "CREATE TABLE orders (id INT, amount NUMERIC)"
+
+
+def example(question, answer="SELECT count(*) FROM orders", context=CONTEXT):
+    return {"context": context, "question": question, "answer": answer}
+
+
+class TestNormalize(unittest.TestCase):
+    def test_sql_formatting_is_ignored_but_literals_are_kept(self):
+        self.assertEqual(
+            normalize_sql("SELECT  Amount\nFROM orders WHERE name = 'Bob';"),
+            normalize_sql("select amount from ORDERS where name = 'Bob'"),
+        )
+        self.assertNotEqual(
+            normalize_sql("SELECT * FROM orders WHERE name = 'Bob'"),
+            normalize_sql("SELECT * FROM orders WHERE name = 'bob'"),
+        )
+
+    def test_question(self):
+        self.assertEqual(normalize_question("How many  Orders?"), "how many orders")
+
+
+class TestDeduplicateExamples(unittest.TestCase):
+    def test_exact_duplicates(self):
+        dataset = [
+            example("How many orders are there?"),
+            example("how many orders are there", answer="select COUNT(*) from orders;"),
+            example("What is the total amount?", answer="SELECT sum(amount) FROM orders"),
+        ]
+
+        keep, stats = deduplicate_examples(dataset)
+
+        self.assertEqual(keep, [0, 2])
+        self.assertEqual(stats, {"exact_duplicates": 1, "near_duplicates": 0})
+
+    def test_near_duplicates(self):
+        dataset = [
+            example("How many orders are there in the orders table in total?"),
+            example("How many orders are there in the orders table in total??!"),
+            example("How many orders are there in the order table in total?"),
+        ]
+
+        keep, stats = deduplicate_examples(dataset)
+
+        self.assertEqual(keep, [0])
+        self.assertEqual(stats, {"exact_duplicates": 1, "near_duplicates": 1})
+
+    def test_similar_questions_with_other_answers_or_contexts_are_kept(self):
+        question = "How many orders are there in the orders table in total?"
+        dataset = [
+            example(question),
+            example(question, answer="SELECT count(id) FROM orders"),
+            example(question, context="CREATE TABLE orders (id INT)"),
+            example("Which customers placed no orders at all last year?"),
+        ]
+
+        keep, stats = deduplicate_examples(dataset)
+
+        self.assertEqual(keep, [0, 1, 2, 3])
+        self.assertEqual(stats, {"exact_duplicates": 0, "near_duplicates": 0})
+
+    def test_minhash_estimates_the_jaccard_similarity(self):
+        min_hash = MinHash(num_perm=256)
+        text = "how many orders are there in the orders table"
+
+        self.assertEqual((min_hash.signature(text) == min_hash.signature(text)).mean(), 1.0)
+        self.assertLess(
+            (min_hash.signature(text) == min_hash.signature("list every customer by name")).mean(),
+            0.2,
+        )
+
+
+class TestLengthGroupedBatches(unittest.TestCase):
+    def test_every_example_is_batched_once(self):
+        lengths = [(i * 37) % 101 + 1 for i in range(250)]
+
+        batches = length_grouped_batches(lengths, batch_size=8, megabatch_mult=4)
+
+        self.assertEqual(sorted(i for batch in batches for i in batch), list(range(250)))
+        self.assertTrue(all(len(batch) <= 8 for batch in batches))
+
+    def test_grouping_reduces_padding(self):
+        lengths = [(i * 37) % 101 + 1 for i in range(250)]
+        random_batches = [list(range(i, min(i + 8, 250))) for i in range(0, 250, 8)]
+
+        grouped = padding_tokens(lengths, length_grouped_batches(lengths, batch_size=8))
+
+        self.assertLess(grouped, padding_tokens(lengths, random_batches))
+
+    def test_padding_tokens(self):
+        self.assertEqual(padding_tokens([3, 1, 2, 2], [[0, 1], [2, 3]]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
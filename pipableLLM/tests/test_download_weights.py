@@ -0,0 +1,145 @@
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utilities"))
+
+from download_weights import WeightCache, download, validate_url
+
+CONTENT = bytes(range(256)) * 40
+CHUNK_SIZE = 1000
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    """
+    Serve CONTENT, with or without range requests, optionally failing some ranges.
+    """
+
+    ranges = True
+    # Start offset of a range -> number of times it is answered with an error
+    failures = {}
+    requested = []
+
+    def do_GET(self):
+        match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        if not self.ranges or match is None:
+            FileHandler.requested.append(None)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(CONTENT)))
+            self.end_headers()
+            self.wfile.write(CONTENT)
+            return
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else len(CONTENT) - 1
+        FileHandler.requested.append(start)
+        if FileHandler.failures.get(start):
+            FileHandler.failures[start] -= 1
+            self.send_error(500)
+            return
+        body = CONTENT[start : end + 1]
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{len(CONTENT)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDownload(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FileHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/weights.zip"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FileHandler.ranges = True
+        FileHandler.failures = {}
+        FileHandler.requested = []
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = cache_dir.name
+        self.sha256 = hashlib.sha256(CONTENT).hexdigest()
+
+    def download(self, workers=2, **kwargs):
+        return download(self.url, cache_dir=self.cache_dir, workers=workers, chunk_size=CHUNK_SIZE, **kwargs)
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_ranged_download_is_verified_and_cached(self):
+        path = self.download(sha256=self.sha256)
+
+        self.assertEqual(self.read(path), CONTENT)
+        self.assertEqual(os.path.basename(path), self.sha256)
+        requests_made = len(FileHandler.requested)
+        self.assertEqual(self.download(sha256=self.sha256), path)
+        self.assertEqual(len(FileHandler.requested), requests_made)
+
+    def test_interrupted_download_resumes_with_the_missing_chunks(self):
+        # Each of the 3 attempts at the third chunk fails, the chunks after it are cancelled
+        FileHandler.failures = {2 * CHUNK_SIZE: 3}
+        with self.assertRaises(IOError):
+            self.download(workers=1)
+        partial_path = WeightCache(self.cache_dir).partial_path(self.url)
+        self.assertTrue(os.path.exists(f"{partial_path}.json"))
+
+        FileHandler.requested = []
+        path = self.download(sha256=self.sha256)
+
+        self.assertEqual(self.read(path), CONTENT)
+        # The probe, then the missing chunks only, which include the failed one
+        probe, chunks = FileHandler.requested[0], FileHandler.requested[1:]
+        self.assertEqual(probe, 0)
+        self.assertIn(2 * CHUNK_SIZE, chunks)
+        self.assertNotIn(0, chunks)
+        self.assertNotIn(CHUNK_SIZE, chunks)
+        self.assertFalse(os.path.exists(f"{partial_path}.json"))
+
+    def test_sha256_mismatch(self):
+        with self.assertRaises(ValueError):
+            self.download(sha256="0" * 64)
+
+        cache = WeightCache(self.cache_dir)
+        self.assertIsNone(cache.lookup(self.url))
+        self.assertFalse(os.path.exists(cache.partial_path(self.url)))
+
+    def test_server_without_range_support(self):
+        FileHandler.ranges = False
+
+        path = self.download(sha256=self.sha256)
+
+        self.assertEqual(self.read(path), CONTENT)
+        self.assertEqual(FileHandler.requested, [None, None])
+
+
+class TestValidateUrl(unittest.TestCase):
+    def test_accepted_urls(self):
+        for url in (
+            "https://drive.google.com/file/d/abc123/view?usp=sharing",
+            "https://example.com/weights.zip",
+            "http://127.0.0.1:8000/weights.zip",
+        ):
+            self.assertEqual(validate_url(url), url)
+
+    def test_rejected_urls(self):
+        for url in ("ftp://example.com/weights.zip", "drive.google.com/file/d/abc123/view", "weights.zip"):
+            with self.assertRaises(ValueError):
+                validate_url(url)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from evaluation import FixtureDatabases, evaluate, percentile, results_match
+
+CONTEXT = "CREATE TABLE orders (id INTEGER, customer TEXT, amount REAL)"
+SETUP = [
+    "INSERT INTO orders VALUES (1, 'ann', 10.0), (2, 'bob', 5.5), (3, 'ann', 2.25)",
+]
+
+
+def example(question, answer):
+    return {"context": CONTEXT, "setup": SETUP, "question": question, "answer": answer}
+
+
+class FixedGenerator:
+    """
+    Answer every question with a fixed prediction, or fail for a missing one.
+    """
+
+    def __init__(self, predictions):
+        self.predictions = predictions
+
+    def __call__(self, context, question):
+        prediction = self.predictions[question]
+        if prediction is None:
+            raise RuntimeError("the model is unavailable")
+        return prediction, 4
+
+
+class TestScoring(unittest.TestCase):
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(percentile([3, 1, 2], 50), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2.5)
+        self.assertAlmostEqual(percentile(list(range(1, 101)), 95), 95.05)
+
+    def test_results_match(self):
+        self.assertTrue(results_match([(1,), (2,)], [(2,), (1,)], ordered=False))
+        self.assertFalse(results_match([(1,), (2,)], [(2,), (1,)], ordered=True))
+        # Duplicated rows count
+        self.assertFalse(results_match([(1,), (1,)], [(1,)], ordered=False))
+
+    def test_evaluate(self):
+        examples = [
+            # Formatted differently, same SQL
+            example("Total per customer?", "SELECT customer, sum(amount) FROM orders GROUP BY customer"),
+            # Other SQL, same rows
+            example("Largest order?", "SELECT max(amount) FROM orders"),
+            # Wrong order of an ordered result
+            example("Order ids by amount?", "SELECT id FROM orders ORDER BY amount"),
+            example("Broken prediction?", "SELECT count(*) FROM orders"),
+            example("Model down?", "SELECT count(*) FROM orders"),
+            example("Broken gold?", "SELECT missing FROM orders"),
+        ]
+        generator = FixedGenerator(
+            {
+                "Total per customer?": "select customer, SUM(amount)\nfrom orders group by customer;",
+                "Largest order?": "SELECT amount FROM orders ORDER BY amount DESC LIMIT 1",
+                "Order ids by amount?": "SELECT id FROM orders ORDER BY amount DESC",
+                "Broken prediction?": "SELECT count(*) FROM order",
+                "Model down?": None,
+                "Broken gold?": "SELECT 1",
+            }
+        )
+
+        summary, results = evaluate(examples, generator, FixtureDatabases(), concurrency=2)
+
+        self.assertEqual(
+            [(r["exact_match"], r["execution_match"]) for r in results],
+            [(True, True), (False, True), (False, False), (False, False), (False, False), (False, False)],
+        )
+        self.assertIn("predicted query failed", results[3]["error"])
+        self.assertIn("generation failed", results[4]["error"])
+        self.assertTrue(results[5]["invalid_gold"])
+        self.assertEqual(summary["examples"], 6)
+        self.assertEqual(summary["scored_examples"], 5)
+        self.assertEqual(summary["invalid_gold"], 1)
+        self.assertEqual(summary["errors"], 2)
+        self.assertAlmostEqual(summary["execution_accuracy"], 2 / 5)
+        self.assertAlmostEqual(summary["exact_match"], 1 / 5)
+        self.assertIsNotNone(summary["latency_p95_seconds"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import os
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_renderer import (
+    PromptBudget,
+    extract_answer,
+    parse_schema,
+    render_prompt,
+    render_training_text,
+)
+
+QUESTION = "How many orders did each customer place?"
+
+
+def parse_create_table(query):
+    # The prompt rendering of the original server, which prompt_renderer must reproduce
+    table_name_match = re.search(r'CREATE TABLE ([\w.]+) \((.*?)\)', query)
+
+    if table_name_match:
+        table_name = table_name_match.group(1)
+        column_defs = table_name_match.group(2)
+
+        columns = [col.strip() for col in column_defs.split(',')]
+
+        schema = f"table schema: {table_name}:"
+        for col in columns:
+            col_match = re.match(r'(\w+) (\w+)', col)
+            if col_match:
+                col_name = col_match.group(1)
+                col_type = col_match.group(2)
+                schema += f' "{col_name}" [ {col_type.upper()}]'
+
+        return schema
+
+
+def parse_prompt(context, question):
+    llm_input = "[INST] Here is a database schema: "
+    for table in context.split(';'):
+        llm_input += parse_create_table(table) + " "
+
+    llm_input += "Please write me a syntactically correct SQL statement that answers the following question:"
+    llm_input += question + "[/INST]"
+
+    return llm_input
+
+
+class WordTokenizer:
+    """
+    A tokenizer with one token per whitespace separated word.
+    """
+
+    def __call__(self, text, add_special_tokens=True):
+        return {"input_ids": text.split()}
+
+
+class TestRenderPrompt(unittest.TestCase):
+    def test_matches_the_original_prompt(self):
+        for context in (
+            "CREATE TABLE orders (id INT, amount numeric)",
+            "CREATE TABLE orders (id INT, customer_id INT);CREATE TABLE customers (id INT, name varchar(255))",
+            # Schema qualified names and types with arguments or several words
+            "CREATE TABLE sales.orders (id INT, created_at timestamp with time zone, price NUMERIC(10, 2))",
+            # Quoted column names are left out, as the original server did
+            'CREATE TABLE orders (id INT, "Order Date" DATE, Amount Float)',
+            "CREATE TABLE a (x INT); CREATE TABLE public.b (y TEXT);CREATE TABLE c (z BOOL)",
+        ):
+            with self.subTest(context=context):
+                self.assertEqual(render_prompt(context, QUESTION), parse_prompt(context, QUESTION))
+
+    def test_segments_without_a_table_are_skipped(self):
+        # The original server failed on these
+        context = 'CREATE TABLE orders (id INT);CREATE TABLE "Order Items" (id INT);'
+
+        self.assertEqual(
+            render_prompt(context, QUESTION),
+            parse_prompt("CREATE TABLE orders (id INT)", QUESTION),
+        )
+
+    def test_like_column_list(self):
+        context = "CREATE TABLE sales_2021 (id INT, amount NUMERIC);CREATE TABLE sales_2022 (LIKE sales_2021)"
+
+        self.assertEqual(
+            render_prompt(context, QUESTION),
+            parse_prompt(
+                "CREATE TABLE sales_2021 (id INT, amount NUMERIC);"
+                "CREATE TABLE sales_2022 (id INT, amount NUMERIC)",
+                QUESTION,
+            ),
+        )
+
+    def test_training_text_and_answer(self):
+        example = {"context": "CREATE TABLE orders (id INT)", "question": QUESTION, "answer": "SELECT 1"}
+
+        text = render_training_text(example)
+
+        self.assertEqual(text, f"{parse_prompt(example['context'], QUESTION)} SELECT 1")
+        self.assertEqual(extract_answer(text).strip(), "SELECT 1")
+
+
+class TestParseSchema(unittest.TestCase):
+    def test_tables_and_columns(self):
+        context = (
+            "CREATE TABLE sales.orders (id INT, customer_id INT, \"Order Date\" DATE);"
+            "CREATE TABLE customers (id INT, name TEXT);"
+            "CREATE TABLE customers_archive (LIKE customers);"
+        )
+
+        self.assertEqual(
+            parse_schema(context),
+            (
+                ("sales.orders", ("id", "customer_id")),
+                ("customers", ("id", "name")),
+                ("customers_archive", ("id", "name")),
+            ),
+        )
+
+    def test_context_without_tables(self):
+        self.assertEqual(parse_schema("SELECT 1;"), ())
+
+
+class TestPromptBudget(unittest.TestCase):
+    def test_prompt_within_the_budget_is_unchanged(self):
+        context = "CREATE TABLE orders (id INT);CREATE TABLE customers (id INT)"
+        budget = PromptBudget(WordTokenizer(), max_tokens=1000)
+
+        self.assertEqual(budget.render_prompt(context, QUESTION), render_prompt(context, QUESTION))
+
+    def test_most_relevant_tables_are_kept_in_order(self):
+        context = (
+            "CREATE TABLE customers (id INT, name TEXT);"
+            "CREATE TABLE invoices (id INT, total NUMERIC);"
+            "CREATE TABLE orders (id INT, customer_id INT)"
+        )
+        full = render_prompt(context, QUESTION)
+        # Room for two of the three tables
+        budget = PromptBudget(WordTokenizer(), max_tokens=len(full.split()) - 3)
+
+        self.assertEqual(
+            budget.render_prompt(context, QUESTION),
+            render_prompt(
+                "CREATE TABLE customers (id INT, name TEXT);CREATE TABLE orders (id INT, customer_id INT)",
+                QUESTION,
+            ),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import gzip
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from transport import MAX_BODY_BYTES_ENV, BodyTooLarge, UnsupportedBody, decompress, read_body
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BODY = json.dumps({"context": "CREATE TABLE t (id INT)", "question": "How many?"}).encode("utf-8")
+
+
+class TestDecompress(unittest.TestCase):
+    def test_gzip(self):
+        self.assertEqual(decompress(gzip.compress(BODY), "gzip", len(BODY)), BODY)
+
+    def test_multi_member_gzip(self):
+        body = gzip.compress(BODY) + gzip.compress(BODY)
+        self.assertEqual(decompress(body, "gzip", 2 * len(BODY)), BODY + BODY)
+
+    def test_truncated_gzip(self):
+        with self.assertRaises(Exception) as raised:
+            decompress(gzip.compress(BODY)[:-12], "gzip", len(BODY))
+        self.assertNotIsInstance(raised.exception, BodyTooLarge)
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        body = zstandard.ZstdCompressor().compress(BODY)
+        self.assertEqual(decompress(body, "zstd", len(BODY)), BODY)
+
+    def test_output_size_is_bounded(self):
+        # About 10 KB which expand to 10 MB
+        bomb = gzip.compress(b"\0" * 10 * 1024 * 1024)
+        with self.assertRaises(BodyTooLarge):
+            decompress(bomb, "gzip", 1024 * 1024)
+
+        if zstandard is not None:
+            bomb = zstandard.ZstdCompressor().compress(b"\0" * 10 * 1024 * 1024)
+            with self.assertRaises(BodyTooLarge):
+                decompress(bomb, "zstd", 1024 * 1024)
+
+
+class TestReadBody(unittest.TestCase):
+    def setUp(self):
+        app = Flask(__name__)
+
+        @app.route("/echo", methods=["POST"])
+        def echo():
+            return read_body()
+
+        @app.errorhandler(UnsupportedBody)
+        def unsupported_body(error):
+            return {"message": str(error)}, error.status
+
+        self.client = app.test_client()
+
+    def post(self, body, encoding):
+        headers = {"Content-Type": "application/json", "Content-Encoding": encoding}
+        with mock.patch.dict(os.environ, {MAX_BODY_BYTES_ENV: "1024"}):
+            return self.client.post("/echo", data=body, headers=headers)
+
+    def test_compressed_body_within_the_limit(self):
+        response = self.post(gzip.compress(BODY), "gzip")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["question"], "How many?")
+
+    def test_body_decompressing_past_the_limit_is_rejected_with_413(self):
+        body = json.dumps({"context": " " * 4096}).encode("utf-8")
+
+        response = self.post(gzip.compress(body), "gzip")
+
+        self.assertEqual(response.status_code, 413)
+
+    def test_undecodable_body_is_rejected_with_415(self):
+        response = self.post(b"not gzip", "gzip")
+
+        self.assertEqual(response.status_code, 415)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import json
+import os
+
+# Named sets of fine-tuning hyperparameters, selected with "profile" in a /train request.
+# "default" holds the values the server has always trained with.
+PROFILES = {
+    "default": {
+        "per_device_train_batch_size": 4,
+        "gradient_accumulation_steps": 2,
+        "seq_length": 1024,
+        "learning_rate": 1e-4,
+        "max_steps": 500,
+        "warmup_steps": 100,
+        "lora_r": 8,
+        "lora_alpha": 16,
+        "lora_dropout": 0.05,
+        "lora_target_modules": ["q_proj", "v_proj"],
+        "precision": "bf16",
+        "optim": "paged_adamw_32bit",
+        "device": "cuda",
+    },
+    "quick": {
+        "per_device_train_batch_size": 8,
+        "gradient_accumulation_steps": 1,
+        "seq_length": 512,
+        "learning_rate": 2e-4,
+        "max_steps": 100,
+        "warmup_steps": 10,
+        "lora_r": 8,
+        "lora_alpha": 16,
+        "lora_dropout": 0.05,
+        "lora_target_modules": ["q_proj", "v_proj"],
+        "precision": "bf16",
+        "optim": "paged_adamw_32bit",
+        "device": "cuda",
+    },
+    "high_capacity": {
+        "per_device_train_batch_size": 2,
+        "gradient_accumulation_steps": 8,
+        "seq_length": 2048,
+        "learning_rate": 1e-4,
+        "max_steps": 1000,
+        "warmup_steps": 100,
+        "lora_r": 32,
+        "lora_alpha": 64,
+        "lora_dropout": 0.05,
+        "lora_target_modules": ["q_proj", "k_proj", "v_proj", "o_proj"],
+        "precision": "bf16",
+        "optim": "paged_adamw_32bit",
+        "device": "cuda",
+    },
+    "fp16": {
+        "per_device_train_batch_size": 4,
+        "gradient_accumulation_steps": 2,
+        "seq_length": 1024,
+        "learning_rate": 1e-4,
+        "max_steps": 500,
+        "warmup_steps": 100,
+        "lora_r": 8,
+        "lora_alpha": 16,
+        "lora_dropout": 0.05,
+        "lora_target_modules": ["q_proj", "v_proj"],
+        "precision": "fp16",
+        "optim": "paged_adamw_32bit",
+        "device": "cuda",
+    },
+    # Used by benchmarks/training_throughput.py with a tiny model, no GPU needed
+    "cpu_smoke": {
+        "per_device_train_batch_size": 2,
+        "gradient_accumulation_steps": 1,
+        "seq_length": 128,
+        "learning_rate": 1e-3,
+        "max_steps": 20,
+        "warmup_steps": 0,
+        "lora_r": 4,
+        "lora_alpha": 8,
+        "lora_dropout": 0.0,
+        "lora_target_modules": ["q_proj", "v_proj"],
+        "precision": "fp32",
+        "optim": "adamw_torch",
+        "device": "cpu",
+    },
+}
+
+PRECISIONS = ("bf16", "fp16", "fp32")
+
+# Extra profiles can be defined in a JSON file {"<name>": {<settings>}}, settings which
+# are left out are taken from the default profile.
+PROFILES_PATH = os.environ.get("PIPABLE_TRAINING_PROFILES", "./training_profiles.json")
+
+
+def load_profiles(path=PROFILES_PATH):
+    profiles = dict(PROFILES)
+    if os.path.exists(path):
+        with open(path) as f:
+            for name, settings in json.load(f).items():
+                profiles[name] = {**PROFILES["default"], **settings}
+    return profiles
+
+
+def get_profile(name="default", path=PROFILES_PATH):
+    """
+    Return the settings of a named training profile.
+
+    Raises ValueError for unknown profiles and for invalid settings.
+    """
+    profiles = load_profiles(path)
+    if name not in profiles:
+        raise ValueError(f"Unknown training profile {name!r}, choose one of {sorted(profiles)}")
+    profile = profiles[name]
+    unknown = set(profile) - set(PROFILES["default"])
+    if unknown:
+        raise ValueError(f"Unknown settings in training profile {name!r}: {sorted(unknown)}")
+    if profile["precision"] not in PRECISIONS:
+        raise ValueError(f"Precision of training profile {name!r} must be one of {PRECISIONS}")
+    return dict(profile)
@@ -0,0 +1,158 @@
+import gzip
+import json
+import os
+import zlib
+
+from flask import Response, request
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Request and response bodies are JSON or msgpack, optionally compressed with zstd or
+# gzip. Requests say what they send with Content-Type and Content-Encoding and what they
+# accept with Accept and Accept-Encoding, clients which send neither get plain JSON.
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+GZIP = "gzip"
+ZSTD = "zstd"
+
+# Responses smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+# PIPABLE_MAX_BODY_BYTES bounds request bodies, both as sent and once decompressed,
+# larger ones are rejected with 413 (64 MiB)
+MAX_BODY_BYTES_ENV = "PIPABLE_MAX_BODY_BYTES"
+DECOMPRESS_CHUNK_BYTES = 64 * 1024
+
+
+class UnsupportedBody(Exception):
+    """
+    A request body in a format or compression the server cannot decode.
+    """
+
+    status = 415
+
+
+class BodyTooLarge(UnsupportedBody):
+    """
+    A request body which decompresses to more than the largest accepted body.
+    """
+
+    status = 413
+
+
+def max_body_bytes():
+    return int(os.environ.get(MAX_BODY_BYTES_ENV, 64 * 1024 * 1024))
+
+
+def content_types():
+    return ([MSGPACK] if msgpack is not None else []) + [JSON]
+
+
+def content_encodings():
+    return ([ZSTD] if zstandard is not None else []) + [GZIP]
+
+
+def serialize(data, content_type):
+    if content_type == MSGPACK:
+        return msgpack.packb(data, use_bin_type=True)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def deserialize(body, content_type):
+    if content_type == MSGPACK:
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+
+def compress(body, encoding):
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return gzip.compress(body, compresslevel=5)
+
+
+def _gunzip_chunks(body):
+    # Every member of a multi-member gzip body, as gzip.decompress reads them
+    while body:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        while not decompressor.eof:
+            chunk = decompressor.decompress(body, DECOMPRESS_CHUNK_BYTES)
+            body = decompressor.unconsumed_tail
+            if not chunk and not body:
+                raise ValueError("Compressed data ended before the end-of-stream marker was reached")
+            yield chunk
+        body = decompressor.unused_data
+
+
+def _unzstd_chunks(body):
+    with zstandard.ZstdDecompressor().stream_reader(body) as reader:
+        while True:
+            chunk = reader.read(DECOMPRESS_CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+
+
+def decompress(body, encoding, max_output_size):
+    """
+    Decompress body chunk by chunk, raising BodyTooLarge once it exceeds max_output_size bytes.
+    """
+    chunks = []
+    size = 0
+    for chunk in _unzstd_chunks(body) if encoding == ZSTD else _gunzip_chunks(body):
+        size += len(chunk)
+        if size > max_output_size:
+            raise BodyTooLarge(f"The decompressed body is larger than {max_output_size} bytes.")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def read_body():
+    """
+    Decode the body of the current request.
+
+    Raises UnsupportedBody for content types and encodings the server cannot decode,
+    and BodyTooLarge for bodies which decompress to more than PIPABLE_MAX_BODY_BYTES.
+    """
+    content_type = request.mimetype or JSON
+    encoding = request.headers.get("Content-Encoding", "identity").strip().lower()
+    if content_type not in content_types():
+        raise UnsupportedBody(f"Unsupported Content-Type {content_type}, use one of {content_types()}.")
+    if encoding not in content_encodings() + ["identity"]:
+        raise UnsupportedBody(f"Unsupported Content-Encoding {encoding}, use one of {content_encodings()}.")
+
+    body = request.get_data()
+    try:
+        if encoding != "identity":
+            body = decompress(body, encoding, max_body_bytes())
+        return deserialize(body, content_type)
+    except BodyTooLarge:
+        raise
+    except Exception as e:
+        raise UnsupportedBody(f"Could not decode the {content_type} body: {e}")
+
+
+def respond(data, status=200, headers=None):
+    """
+    Encode a response in the most compact format and compression the client accepts.
+    """
+    # Formats are only used when named by the client, "*/*" still means JSON
+    accepted_types = {value for value, quality in request.accept_mimetypes if quality > 0}
+    accepted_encodings = {value for value, quality in request.accept_encodings if quality > 0}
+    content_type = next((t for t in content_types() if t in accepted_types), JSON)
+    encoding = next((e for e in content_encodings() if e in accepted_encodings), None)
+
+    body = serialize(data, content_type)
+    response = Response(body, status=status, headers=headers, content_type=content_type)
+    if encoding and len(body) >= MIN_COMPRESS_BYTES:
+        response.set_data(compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+    response.vary.update(("Accept", "Accept-Encoding"))
+    return response
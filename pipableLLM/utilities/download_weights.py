@@ -1,28 +1,277 @@
-import gdown
 import argparse
+import hashlib
+import json
+import os
 import re
+import shutil
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pipable", "weights")
+CHUNK_SIZE = 64 * 1024 * 1024
+STREAM_BLOCK_SIZE = 1024 * 1024
+
 
 def extract_file_id(url):
     pattern = r'/d/(.*?)/view'
     match = re.search(pattern, url)
     extracted_string = match.group(1)
-    final_url = f"https://drive.google.com/uc?id={extracted_string}"
+    # The usercontent endpoint serves large files without the virus scan page and supports ranges
+    final_url = f"https://drive.usercontent.google.com/download?id={extracted_string}&export=download&confirm=t"
 
     return final_url
 
 def validate_url(url):
-    pattern = r'^https://drive\.google\.com/file/d/[^/]+/view.*$'
-
-    if re.match(pattern, url):
+    if re.match(r'^https://drive\.google\.com/file/d/[^/]+/view.*$', url):
+        return url
+    if re.match(r'^https?://', url):
         return url
+    raise ValueError(f"Not a Google Drive share link or HTTP(S) URL: {url}")
+
+def download_url(url):
+    if "drive.google.com/file/d/" in url:
+        return extract_file_id(url)
+    return url
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(STREAM_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class WeightCache:
+    """
+    Content-addressed store of downloaded archives.
+
+    Archives are kept as blobs/<sha256>, and an index remembers the digest each URL
+    resolved to, so an archive is downloaded at most once per machine. Partial
+    downloads live in partial/ until they are complete and verified.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.partial_dir = os.path.join(cache_dir, "partial")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.partial_dir, exist_ok=True)
+        self.lock = threading.Lock()
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest)
+
+    def partial_path(self, url):
+        return os.path.join(self.partial_dir, hashlib.sha256(url.encode()).hexdigest())
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def lookup(self, url=None, sha256=None):
+        """
+        Return the cached blob for a digest, or for the digest a URL resolved to before.
+        """
+        digest = sha256 or self._read_index().get(url)
+        if digest and os.path.exists(self.blob_path(digest)):
+            return self.blob_path(digest)
+        return None
+
+    def store(self, url, path, digest):
+        os.replace(path, self.blob_path(digest))
+        with self.lock:
+            index = self._read_index()
+            index[url] = digest
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp_path, self.index_path)
+        return self.blob_path(digest)
+
+
+class RangedDownload:
+    """
+    Download a file in fixed size chunks fetched in parallel with HTTP range requests.
+
+    Chunks are written at their offset into a preallocated partial file, and the
+    indices of the completed chunks are recorded next to it, so an interrupted
+    download resumes with the missing chunks only.
+    """
+
+    def __init__(self, session, url, path, size, chunk_size=CHUNK_SIZE, workers=8, retries=3):
+        self.session = session
+        self.url = url
+        self.path = path
+        self.size = size
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.retries = retries
+        self.state_path = f"{path}.json"
+        self.lock = threading.Lock()
+
+    def _load_done(self):
+        if not (os.path.exists(self.path) and os.path.exists(self.state_path)):
+            return set()
+        with open(self.state_path) as f:
+            state = json.load(f)
+        if state.get("size") != self.size or state.get("chunk_size") != self.chunk_size:
+            return set()
+        return set(state["done"])
+
+    def _save_done(self, done):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"size": self.size, "chunk_size": self.chunk_size, "done": sorted(done)}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _fetch(self, fd, index):
+        start = index * self.chunk_size
+        end = min(start + self.chunk_size, self.size) - 1
+        for attempt in range(self.retries):
+            try:
+                # Closed on every path, so a failed attempt does not hold on to its connection
+                with self.session.get(
+                    self.url, headers={"Range": f"bytes={start}-{end}"}, stream=True, timeout=60
+                ) as response:
+                    if response.status_code != 206:
+                        raise IOError(f"Expected a partial response, got {response.status_code}")
+                    offset = start
+                    for block in response.iter_content(STREAM_BLOCK_SIZE):
+                        os.pwrite(fd, block, offset)
+                        offset += len(block)
+                    if offset != end + 1:
+                        raise IOError(f"Chunk {index} ended after {offset - start} bytes")
+                return
+            except (IOError, requests.RequestException):
+                if attempt == self.retries - 1:
+                    raise
+
+    def run(self):
+        done = self._load_done()
+        if not done:
+            with open(self.path, "wb") as f:
+                f.truncate(self.size)
+        n_chunks = -(-self.size // self.chunk_size)
+        missing = [index for index in range(n_chunks) if index not in done]
+        if done:
+            print(f"Resuming download, {len(missing)} of {n_chunks} chunks left")
+
+        fd = os.open(self.path, os.O_WRONLY)
+        try:
+
+            def fetch(index):
+                self._fetch(fd, index)
+                with self.lock:
+                    done.add(index)
+                    self._save_done(done)
+
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for _ in executor.map(fetch, missing):
+                    pass
+        finally:
+            os.close(fd)
+        os.remove(self.state_path)
+
+
+def stream_download(session, url, path):
+    """
+    Download a file in a single stream, continuing a partial file when the server
+    supports range requests.
+    """
+    offset = os.path.getsize(path) if os.path.exists(path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with session.get(url, headers=headers, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        mode = "ab" if offset and response.status_code == 206 else "wb"
+        with open(path, mode) as f:
+            for block in response.iter_content(STREAM_BLOCK_SIZE):
+                f.write(block)
+
+
+def probe(session, url):
+    """
+    Return the size of the file behind a URL and whether it can be fetched in ranges.
+    """
+    response = session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=60)
+    response.close()
+    response.raise_for_status()
+    content_range = response.headers.get("Content-Range", "")
+    match = re.match(r"bytes 0-0/(\d+)$", content_range)
+    if response.status_code == 206 and match:
+        return int(match.group(1)), True
+    size = response.headers.get("Content-Length")
+    return (int(size) if size else None), False
+
+
+def download(url, sha256=None, cache_dir=DEFAULT_CACHE_DIR, workers=8, chunk_size=CHUNK_SIZE):
+    """
+    Download a file into the content-addressed cache and return its path there.
+
+    The download is skipped when the cache already holds the file, by its expected
+    SHA-256 or by the digest the URL resolved to before. Raises ValueError when the
+    downloaded file does not match the expected SHA-256.
+    """
+    cache = WeightCache(cache_dir)
+    cached = cache.lookup(url, sha256)
+    if cached is not None:
+        print(f"Using cached {cached}")
+        return cached
+
+    session = requests.Session()
+    fetch_url = download_url(url)
+    partial_path = cache.partial_path(fetch_url)
+    size, ranges = probe(session, fetch_url)
+    if ranges and size:
+        RangedDownload(session, fetch_url, partial_path, size, chunk_size, workers).run()
     else:
-        return ValueError
+        stream_download(session, fetch_url, partial_path)
+
+    digest = file_sha256(partial_path)
+    if sha256 is not None and digest != sha256.lower():
+        os.remove(partial_path)
+        raise ValueError(f"SHA-256 mismatch for {url}: expected {sha256}, got {digest}")
+    return cache.store(url, partial_path, digest)
+
+
+def extract(archive_path, destination):
+    """
+    Extract a zip archive into a directory, once per archive content.
+    """
+    digest = os.path.basename(archive_path)
+    marker = os.path.join(destination, f".extracted-{digest}")
+    if os.path.exists(marker):
+        print(f"{archive_path} is already extracted to {destination}")
+        return destination
+    os.makedirs(destination, exist_ok=True)
+    with zipfile.ZipFile(archive_path) as archive:
+        archive.extractall(destination)
+    open(marker, "w").close()
+    return destination
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Download the weights for the LLM')
     parser.add_argument('--url', required=True, help="Enter the URL of the zip file to download the weights.You can get it by sharing, the file on google drive and copying the link with the permission open 'Anyone can view'", type=validate_url)
     parser.add_argument('--output', help="The name of the file you want the downloaded zip to be saved as.")
+    parser.add_argument('--sha256', help="Expected SHA-256 of the zip file, the download fails if it does not match.")
+    parser.add_argument('--extract-to', help="Directory to extract the downloaded zip file into.")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Directory of the local download cache.")
+    parser.add_argument('--workers', type=int, default=8, help="Number of chunks downloaded in parallel.")
     args = parser.parse_args()
     print(args)
 
-    gdown.download(extract_file_id(args.url), args.output, quiet=False)
+    archive_path = download(args.url, args.sha256, args.cache_dir, args.workers)
+    if args.output:
+        try:
+            os.link(archive_path, args.output)
+        except OSError:
+            shutil.copyfile(archive_path, args.output)
+    if args.extract_to:
+        extract(archive_path, args.extract_to)
@@ -0,0 +1,228 @@
+import os
+import threading
+import time
+
+import torch
+
+from prompt_renderer import render_prompt
+
+# Startup warmup and compiled generation, configured with environment variables:
+#   PIPABLE_WARMUP              run representative generations before the server reports
+#                               ready, 0 to report ready right away (1)
+#   PIPABLE_WARMUP_LENGTHS      prompt lengths in tokens of the warmup generations (64,256,1024)
+#   PIPABLE_WARMUP_BATCH_SIZES  batch sizes of the warmup generations (1)
+#   PIPABLE_COMPILE             torch.compile the model and decode with a static KV cache (0)
+#   PIPABLE_LENGTH_BUCKETS      prompt lengths prompts are left-padded to in compiled mode, so
+#                               the compiled graphs only see these shapes; the warmup then
+#                               runs every bucket (128,256,512,1024,2048)
+WARMUP_ENV = "PIPABLE_WARMUP"
+WARMUP_LENGTHS_ENV = "PIPABLE_WARMUP_LENGTHS"
+WARMUP_BATCH_SIZES_ENV = "PIPABLE_WARMUP_BATCH_SIZES"
+COMPILE_ENV = "PIPABLE_COMPILE"
+LENGTH_BUCKETS_ENV = "PIPABLE_LENGTH_BUCKETS"
+
+DEFAULT_LENGTH_BUCKETS = "128,256,512,1024,2048"
+WARMUP_QUESTION = "What is the total amount per customer over the last month?"
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def compile_enabled():
+    return os.environ.get(COMPILE_ENV, "0") == "1"
+
+
+def compile_model(model):
+    """
+    Compile the forward pass of a model for decoding with a static KV cache.
+
+    The cache then keeps the same shapes from one step to the next, so the compiled
+    graph is replayed instead of traced again. Models which are already compiled are
+    returned unchanged. The original forward pass is kept for uncompile_model.
+    """
+    if not getattr(model, "pipable_compiled", False):
+        model.pipable_eager_forward = model.forward
+        model.forward = torch.compile(model.forward, mode="reduce-overhead", fullgraph=True)
+        model.pipable_compiled = True
+    return model
+
+
+def uncompile_model(model):
+    """
+    Restore the original forward pass of a model compiled by compile_model.
+    """
+    if getattr(model, "pipable_compiled", False):
+        model.forward = model.pipable_eager_forward
+        del model.pipable_eager_forward
+        model.pipable_compiled = False
+    return model
+
+
+class LengthBuckets:
+    """
+    Left-pad prompts to the next of a few fixed lengths.
+
+    Prompts longer than the largest bucket are left as they are.
+    """
+
+    def __init__(self, sizes, pad_token_id):
+        self.sizes = sorted(sizes)
+        self.pad_token_id = pad_token_id
+
+    def bucket(self, length):
+        return next((size for size in self.sizes if size >= length), length)
+
+    def pad(self, inputs):
+        input_ids = inputs["input_ids"]
+        padding = self.bucket(input_ids.shape[1]) - input_ids.shape[1]
+        if padding == 0:
+            return inputs
+        attention_mask = inputs.get("attention_mask", torch.ones_like(input_ids))
+        batch_size = input_ids.shape[0]
+        return {
+            "input_ids": torch.cat(
+                [input_ids.new_full((batch_size, padding), self.pad_token_id), input_ids], dim=1
+            ),
+            "attention_mask": torch.cat(
+                [attention_mask.new_zeros((batch_size, padding)), attention_mask], dim=1
+            ),
+        }
+
+
+def create_length_buckets(tokenizer):
+    """
+    Create the length buckets of compiled mode, None when PIPABLE_COMPILE is not set.
+    """
+    if not compile_enabled():
+        return None
+    sizes = int_list(os.environ.get(LENGTH_BUCKETS_ENV, DEFAULT_LENGTH_BUCKETS))
+    return LengthBuckets(sizes, tokenizer.pad_token_id)
+
+
+def warmup_inputs(tokenizer, length, batch_size, device):
+    """
+    Tokenize a text-to-SQL prompt of exactly length tokens, repeated batch_size times.
+
+    The schema of the prompt grows until it is long enough and is then cut at the
+    front, so the end of the prompt keeps the question and the instruction tags.
+    """
+    tables = 1
+    while True:
+        context = ";".join(
+            f"CREATE TABLE table_{t} (id integer, customer_id integer, amount numeric, "
+            f"created_at timestamp, status varchar)"
+            for t in range(tables)
+        )
+        input_ids = tokenizer(render_prompt(context, WARMUP_QUESTION), return_tensors="pt")["input_ids"]
+        if input_ids.shape[1] >= length:
+            break
+        tables *= 2
+    input_ids = input_ids[:, -length:].repeat(batch_size, 1).to(device)
+    return {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+
+
+class Warmup:
+    """
+    Run representative generations once before the server reports ready.
+
+    The first generations after boot pay for the lazy CUDA context and kernel
+    initialization, the growth of the memory allocator and, in compiled mode, the
+    compilation of every length bucket. Running them at startup moves that cost out
+    of the first requests.
+    """
+
+    def __init__(self, lengths, batch_sizes, enabled=True):
+        self.lengths = lengths
+        self.batch_sizes = batch_sizes
+        self.enabled = enabled
+        self.ready = threading.Event()
+        self.results = []
+        self.error = None
+        # Error of a first warmup which was retried after its fallback
+        self.fallback_error = None
+        self.seconds = None
+        if not enabled:
+            self.ready.set()
+
+    def _generate_all(self, generate, tokenizer, device):
+        self.results = []
+        for batch_size in self.batch_sizes:
+            for length in self.lengths:
+                inputs = warmup_inputs(tokenizer, length, batch_size, device)
+                generation_start = time.perf_counter()
+                generate(inputs)
+                self.results.append(
+                    {
+                        "length": length,
+                        "batch_size": batch_size,
+                        "seconds": round(time.perf_counter() - generation_start, 3),
+                    }
+                )
+                print(f"Warmup generation of {batch_size} x {length} tokens: {self.results[-1]['seconds']}s")
+
+    def run(self, generate, tokenizer, device, fallback=None):
+        """
+        Call generate(inputs) for every warmup length and batch size, then mark the server ready.
+
+        When a warmup generation fails, fallback(), e.g. a switch to the uncompiled model,
+        is called and the warmup runs again. A warmup which still fails leaves the server
+        not ready, with the error in stats().
+        """
+        start = time.perf_counter()
+        self.error = None
+        self.fallback_error = None
+        try:
+            try:
+                self._generate_all(generate, tokenizer, device)
+            except Exception as e:
+                if fallback is None:
+                    raise
+                self.fallback_error = str(e)
+                print(f"Warmup failed: {e}, retrying after {fallback.__name__}")
+                fallback()
+                self._generate_all(generate, tokenizer, device)
+            self.ready.set()
+        except Exception as e:
+            self.error = str(e)
+            print(f"Warmup failed, the server is not ready: {e}")
+        finally:
+            self.seconds = round(time.perf_counter() - start, 3)
+
+    def start(self, generate, tokenizer, device, fallback=None):
+        """
+        Run the warmup in a background thread, so the server answers readiness checks meanwhile.
+        """
+        if not self.enabled:
+            return
+        threading.Thread(
+            target=self.run, args=(generate, tokenizer, device, fallback), daemon=True
+        ).start()
+
+    def stats(self):
+        return {
+            "ready": self.ready.is_set(),
+            "enabled": self.enabled,
+            "seconds": self.seconds,
+            "error": self.error,
+            "fallback_error": self.fallback_error,
+            "generations": list(self.results),
+        }
+
+
+def create_warmup():
+    """
+    Create the warmup configured by the PIPABLE_WARMUP* variables.
+
+    In compiled mode the warmup runs every length bucket, since each one is compiled
+    on its first use.
+    """
+    if compile_enabled():
+        lengths = int_list(os.environ.get(LENGTH_BUCKETS_ENV, DEFAULT_LENGTH_BUCKETS))
+    else:
+        lengths = int_list(os.environ.get(WARMUP_LENGTHS_ENV, "64,256,1024"))
+    return Warmup(
+        lengths,
+        int_list(os.environ.get(WARMUP_BATCH_SIZES_ENV, "1")),
+        enabled=os.environ.get(WARMUP_ENV, "1") == "1",
+    )